@@ -25,32 +25,56 @@ import datetime
 import time
 import re
 import logging
-from functools import wraps
+import hashlib
+import calendar
+import itertools
+import threading
+import fcntl
+import collections.abc
+from functools import wraps, lru_cache
 from inspect import isfunction
 # non stdlib
 import yaml
-from flask import Flask, url_for, Response, request, jsonify
+from flask import Flask, url_for, Response, request, jsonify, g
 # from flask_cors import CORS
 from werkzeug.contrib.cache import FileSystemCache, SimpleCache
 # own modules
-from datalogger4 import DataLogger, DataLoggerLiveDataError, b64eval, b64encode, b64decode
+from datalogger4 import DataLogger, DataLoggerLiveDataError, DataFormatError, LiveStats, b64eval, b64encode, b64decode
+from datalogger4.Downsample import downsample
+from datalogger4.Rollup import get_matrix
+from datalogger4.JsonStream import iter_envelope
 
 # this must be placed at TOP
 app = Flask(__name__)
 # CORS(app) # enable CORS
 #_fs_cache = FileSystemCache("/web/rest-apis.tirol-kliniken.cc/datalogger/v4/.cache", threshold=20000, default_timeout=0)
 #_s_cache = SimpleCache(threshold=1000, default_timeout=5*60)
+DOWNSAMPLE_CACHE_SIZE = 1024 # number of downsampled Timeseries held in memory
 # include some commons sourceode
 # import does not work in flask with global app ...
 #exec(open("/web/rest-apis.tirol-kliniken.cc/commons.py").read())
 
 # also on TOP to use it further down
 def apihandler(func):
+    """
+    wrap result of endpoint in json envelope with duration and timestamp,
+    if the endpoint returns an iterator like a generator, results are
+    streamed while consumed, the first element is fetched before, so
+    errors in preparation are reported like for other endpoints.
+    errors while streaming are reported in the envelope, or abort the
+    transfer if the response is validated by conditional
+    """
     @wraps(func)
     def decorated_function(*args, **kwds):
         try:
             starttime = time.time()
             ret = func(*args, **kwds)
+            if isinstance(ret, collections.abc.Iterator):
+                try:
+                    ret = itertools.chain((next(ret), ), ret)
+                except StopIteration:
+                    ret = iter(())
+                return Response(iter_envelope(ret, starttime, raise_errors=g.get("validated", False)), mimetype="application/json")
             return jsonify({
                 "duration": time.time() - starttime,
                 "results": ret,
@@ -58,20 +82,28 @@ def apihandler(func):
             })
         except (KeyError, IndexError) as exc:
             logger.error(exc)
-            return jsonify({"error": str(exc), "status_code": 404})
+            return _error_response(exc, 404)
         except AttributeError as exc:
             logger.error(exc)
-            return jsonify({"error": str(exc), "status_code": 400})
+            return _error_response(exc, 400)
         except Exception as exc:
             logger.exception(exc)
-            return jsonify({"error": str(exc), "status_code": 500})
+            return _error_response(exc, 500)
     return decorated_function
 
+def _error_response(exc, status_code):
+    """return json error message, marked to be neither cached nor validated"""
+    resp = jsonify({"error": str(exc), "status_code": status_code})
+    resp.api_error = True
+    return resp
+
 # use this decorator to fine tune cache-control setting for some endpoints
 def cache_control(*args, **kwds):
     """
     using first positional argument arsg[0] to set in Cache-Control Header
-    if not present set to no-store
+    if not present set to no-store.
+    streamed responses could still end in an error after status 200 was
+    sent, they are never cached without revalidation
     """
     if not args:
         value = "no-store"
@@ -81,11 +113,53 @@ def cache_control(*args, **kwds):
         @wraps(func)
         def decorated_function(*args, **kwds):
             resp = func(*args, **kwds) # should return response
-            resp.headers["Cache-Control"] = value
+            if kwds.get("datestring") == datetime.date.today().isoformat() or getattr(resp, "api_error", False):
+                resp.headers["Cache-Control"] = "no-store" # live data changes
+            elif resp.is_streamed:
+                resp.headers["Cache-Control"] = "no-cache"
+            else:
+                resp.headers["Cache-Control"] = value
             return resp
         return decorated_function
     return outer
 
+# use this decorator for endpoints returning data derived from cache files
+def conditional(func):
+    """
+    answer conditional GET with 304 Not Modified, if cache files of
+    project/tablename/datestring or every day of datestring1 to
+    datestring2 did not change, without loading any data.
+    ETag and Last-Modified are derived from modification times of the
+    cache directories, place between cache_control and apihandler.
+    streamed responses get ETag and Last-Modified up front, an error
+    while streaming aborts the transfer, so the partial body is discarded
+    """
+    @wraps(func)
+    def decorated_function(*args, **kwds):
+        try:
+            versions = _get_cache_versions(kwds)
+        except (KeyError, ValueError, AttributeError): # invalid request, reported by endpoint
+            versions = None
+        if versions is None: # live data or caches not generated yet
+            return func(*args, **kwds)
+        etag = hashlib.sha1(("%s %s" % (request.full_path, versions)).encode("utf-8")).hexdigest()
+        last_modified = max((version for version in versions if version is not None)) // 1000000000
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = request.if_modified_since is not None and calendar.timegm(request.if_modified_since.utctimetuple()) >= last_modified
+        if not_modified:
+            resp = Response(status=304)
+        else:
+            g.validated = True # see apihandler
+            resp = func(*args, **kwds)
+            if getattr(resp, "api_error", False):
+                return resp
+        resp.set_etag(etag)
+        resp.last_modified = last_modified
+        return resp
+    return decorated_function
+
 # use this decorator to fine tune cache-control setting for some endpoints
 def dummy(*args, **kwds):
     def outer(func):
@@ -119,6 +193,15 @@ def get_hello():
     """
     return "hello"
 
+@app.route("/object_cache", methods=["GET"])
+@cache_control("no-store")
+@apihandler
+def get_object_cache():
+    """
+    summary: return usage and hit/miss/eviction counters of in memory object cache
+    """
+    return _dl.object_cache.stats()
+
 ######################## OK custom API begins below ##############################
 
 @app.route("/ts_for_datestring/<datestring>")
@@ -232,8 +315,7 @@ def get_desc(project, tablename):
           type: string
     description: example /desc/cmdb/vicenterVms
     """
-    _dl.setup(project, tablename, "1970-01-01")
-    return _dl.meta
+    return _get_table(project, tablename, "1970-01-01").meta
 
 @app.route("/exists/<project>/<tablename>/<datestring>", methods=["GET"])
 @cache_control("no-store")
@@ -270,6 +352,7 @@ def get_exists(project, tablename, datestring):
 
 @app.route("/index/<project>/<tablename>/<datestring>", methods=["GET"])
 @cache_control("public, max-age=31536000")
+@conditional
 @apihandler
 def get_index(project, tablename, datestring):
     """
@@ -296,7 +379,7 @@ def get_index(project, tablename, datestring):
     description: "example /index/cmdb/vicenterVms/2019-08-01
         this endpoint is useful to find the stored index_keys in either base64 or str representation"
     """
-    return list(_get_table_index(project, tablename, datestring))
+    return _get_table_index(project, tablename, datestring)
 
 @app.route("/search/<datestring>/<pattern>", methods=["GET"])
 @cache_control("no-store")
@@ -317,20 +400,37 @@ def get_search(datestring, pattern):
         description: portion of string to search for, at least 3 characters long
         schema:
           type: string
-    description: example /search/2019-08-01/srvmghomer
+      - name: limit
+        in: query
+        required: false
+        description: return only this number of best matches
+        schema:
+          type: integer
+    description: "example /search/2019-08-01/srvmghomer
+        answered from trigram index of this datestring, best matches first,
+        exact matches of one index value, then matches at the beginning of one index value"
     """
+    limit = request.args.get("limit", None, type=int)
     ret_data = []
-    if len(pattern) < 4:
-        raise AttributerError("pattern must be at least 3 charcaters long")
-    for project in list(_dl.get_projects()):
-        for tablename in list(_dl.get_tablenames(project)):
-            for entry in _get_table_index(project, tablename, datestring):
-                if pattern in entry["_str_key"]:
-                    ret_data.append(entry)
+    for project, tablename, index_keynames, index_key in _dl.load_search_index(datestring).search(pattern, limit):
+        b64_key = b64encode(index_key)
+        ret_data.append({
+            "_project": project,
+            "_tablename": tablename,
+            "_datestring": datestring,
+            "_key": dict(zip(index_keynames, index_key)),
+            "_str_key": str(index_key),
+            "_b64_key": b64_key,
+            "_links": {
+                "ts": "/".join(("ts", project, tablename, datestring, b64_key)),
+                "tsstat": "/".join(("tsstat", project, tablename, datestring, b64_key))
+            }
+        })
     return ret_data
 
 @app.route("/stats_by_value_keyname/<project>/<tablename>/<datestring>/<value_keyname>", methods=["GET"])
 @cache_control("public, max-age=86400")
+@conditional
 @apihandler
 def get_stats_by_value_keyname(project, tablename, datestring, value_keyname):
     """
@@ -356,26 +456,24 @@ def get_stats_by_value_keyname(project, tablename, datestring, value_keyname):
           type: string
     description: "example /datalogger/v4/stats_by_value_keyname/vicenter/virtualMachineMemoryStats/2019-10-28/mem.active.average"
     """
-    _dl.setup(project, tablename, datestring)
-    tsastats = _dl["tsastats"]
-    ret_data = []
-    for index_key, stats in tsastats.stats.items():
+    dl = _get_table(project, tablename) # meta informations only
+    for index_key, stats in _get_stats(project, tablename, datestring).items():
         row_data = {
             "_project": project,
             "_tablename": tablename,
             "_datestring": datestring,
-            "_key": dict(zip(_dl.meta["index_keynames"], index_key)),
+            "_key": dict(zip(dl.index_keynames, index_key)),
             "_str_key": str(index_key),
             "_b64_key": b64encode(index_key),
             "_value_keyname": value_keyname,
         }
         for stat_func_name in _dl.stat_func_names:
             row_data[stat_func_name] = stats[value_keyname][stat_func_name]
-        ret_data.append(row_data)
-    return ret_data
+        yield row_data
 
 @app.route("/stats_by_func/<project>/<tablename>/<datestring>/<stat_func_name>", methods=["GET"])
 @cache_control("public, max-age=86400")
+@conditional
 @apihandler
 def get_stats_by_func(project, tablename, datestring, stat_func_name):
     """
@@ -407,26 +505,24 @@ def get_stats_by_func(project, tablename, datestring, stat_func_name):
           type: string
     description: "example /datalogger/v4/stats_by_func/vicenter/virtualMachineMemoryStats/2019-10-28/sum"
     """
-    _dl.setup(project, tablename, datestring)
-    tsastats = _dl["tsastats"]
-    ret_data = []
-    for index_key, stats in tsastats.stats.items():
+    dl = _get_table(project, tablename) # meta informations only
+    for index_key, stats in _get_stats(project, tablename, datestring).items():
         row_data = {
             "_project": project,
             "_tablename": tablename,
             "_datestring": datestring,
-            "_key": dict(zip(_dl.meta["index_keynames"], index_key)),
+            "_key": dict(zip(dl.index_keynames, index_key)),
             "_str_key": str(index_key),
             "_b64_key": b64encode(index_key),
             "_stat_func_name": stat_func_name,
         }
-        for value_keyname in _dl.value_keynames:
+        for value_keyname in dl.value_keynames:
             row_data[value_keyname] = stats[value_keyname][stat_func_name]
-        ret_data.append(row_data)
-    return ret_data
+        yield row_data
 
 @app.route("/quantile/<project>/<tablename>/<datestring>", methods=["GET"])
 @cache_control("public, max-age=31536000")
+@conditional
 @apihandler
 def get_quantile(project, tablename, datestring):
     """
@@ -452,11 +548,11 @@ def get_quantile(project, tablename, datestring):
           type: string
     description: example /quantile/cmdb/vicenterVms/2019-08-01
     """
-    _dl.setup(project, tablename, datestring)
-    return _dl["qa"].to_data()
+    return _get_table(project, tablename, datestring)["qa"].to_data()
 
 @app.route("/total_stats/<project>/<tablename>/<datestring>")
 @cache_control("public, max-age=31536000")
+@conditional
 @apihandler
 def get_total_stats(project, tablename, datestring):
     """
@@ -482,11 +578,13 @@ def get_total_stats(project, tablename, datestring):
           type: string
     description: example /total_stats/cmdb/vicenterVms/2019-08-01
     """
-    _dl.setup(project, tablename, datestring)
-    return _dl["total_stats"]
+    if datestring == datetime.date.today().isoformat():
+        return _read_livestats(project, tablename, lambda livestats: livestats.total_stats())
+    return _get_table(project, tablename, datestring)["total_stats"]
 
 @app.route("/ts/<project>/<tablename>/<datestring>/<b64index>", methods=["GET"])
 @cache_control("public, max-age=31536000")
+@conditional
 @apihandler
 def get_ts(project, tablename, datestring, b64index):
     """
@@ -525,15 +623,84 @@ def get_ts(project, tablename, datestring, b64index):
     """
     index_key = b64eval(b64index) # eval is not secure
     data = dict(request.values)
-    result = {}
-    _dl.setup(project, tablename, datestring)
+    dl = _get_table(project, tablename, datestring)
     if data.get("value_keynames"):
-        return list(_dl["tsa", index_key].to_data(data.get("value_keynames")))
-    return list(_dl["tsa", index_key].to_data())
+        return dl["tsa", index_key].to_data(data.get("value_keynames"))
+    return dl["tsa", index_key].to_data()
+
+@app.route("/ts_many/<project>/<tablename>/<datestring>", methods=["POST"])
+@cache_control("no-store")
+@apihandler
+def post_ts_many(project, tablename, datestring):
+    """
+    summary: return many Timeseries for table in project on datestring in one response
+    parameters:
+      - name: project
+        in: path
+        required: true
+        description: name of project
+        schema:
+          type: string
+      - name: tablename
+        in: path
+        required: true
+        description: name of table
+        schema:
+          type: string
+      - name: datestring
+        in: path
+        required: true
+        description: datestring like 2019-12-31
+        schema:
+          type: string
+    requestBody:
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              index_keys:
+                type: array
+                description: list of index keys, every one a list of index values
+              filterkeys:
+                type: object
+                description: used if index_keys is not given, index_keyname -> value, list of values, {"prefix": ..} or {"regex": ..}
+              matchtype:
+                type: string
+                description: and (default) or or, to combine filterkeys
+              value_keynames:
+                type: array
+                description: value_keynames to return, default all
+              stream:
+                type: boolean
+                description: stream results while loading, default true
+    description: "example /ts_many/cmdb/vicenterVms/2019-08-01 with body {\"filterkeys\": {\"hostname\": {\"prefix\": \"srv\"}}, \"value_keynames\": [\"cpu.used\"]}
+        Timeseries files are loaded concurrently by a bounded pool of threads"
+    """
+    data = request.get_json() or {}
+    dl = _get_table(project, tablename, datestring)
+    value_keynames = data.get("value_keynames") or dl.value_keynames
+    unknown = [value_keyname for value_keyname in value_keynames if value_keyname not in dl.value_keynames]
+    if unknown:
+        raise AttributeError("unknown value_keynames %s" % unknown)
+    if data.get("index_keys") is not None:
+        loaded = dl.load_ts_many(keys=data["index_keys"])
+    else:
+        loaded = dl.load_ts_many(filterkeys=data.get("filterkeys"), matchtype=data.get("matchtype", "and"))
+    results = ({
+        "_key": dict(zip(dl.index_keynames, index_key)),
+        "_str_key": str(index_key),
+        "_b64_key": b64encode(index_key),
+        "data": timeseries.to_data(value_keynames)
+    } for index_key, timeseries in loaded)
+    if data.get("stream", True):
+        return results
+    return [dict(result, data=list(result["data"])) for result in results]
 
 @app.route("/graph/ts/<project>/<tablename>/<datestring>/<b64index>", methods=["GET"])
 @app.route("/graph/ts/<project>/<tablename>/<datestring>/<b64index>/<value_keyname>", methods=["GET"])
 @cache_control("public, max-age=31536000")
+@conditional
 @apihandler
 def get_graph_ts(project, tablename, datestring, b64index, value_keyname=None):
     """
@@ -569,31 +736,118 @@ def get_graph_ts(project, tablename, datestring, b64index, value_keyname=None):
         description: if given one value_keyname of this TimeSeries
         schema:
           type: string
-    description: example /graph/ts/cmdb/vicenterVms/2019-08-01/asdhfkasdhkajshd==
+      - name: max_points
+        in: query
+        required: false
+        description: if given, every series is downsampled to not more than max_points points
+        schema:
+          type: integer
+      - name: method
+        in: query
+        required: false
+        description: downsampling method, lttb (default) keeps the shape, minmax keeps every peak
+        schema:
+          type: string
+    description: example /graph/ts/cmdb/vicenterVms/2019-08-01/asdhfkasdhkajshd==?max_points=800
     """
+    max_points = request.args.get("max_points", None, type=int)
+    if max_points is not None:
+        version = _dl.get_cache_version(project, tablename, datestring) # part of cache key, changes if caches are regenerated
+        return _get_graph_ts_downsampled(project, tablename, datestring, b64index, value_keyname, max_points, request.args.get("method", "lttb"), version)
     index_key = b64eval(b64index) # eval is not secure
-    _dl.setup(project, tablename, datestring)
-    desc = _dl.meta
-    series = {}
+    dl = _get_table(project, tablename, datestring)
+    desc = dl.meta
+    value_keynames = desc["value_keynames"] # default all available
+    if value_keyname and value_keyname in desc["value_keynames"]:
+        value_keynames = (value_keyname, )
+    timeseries = dl["tsa", index_key]
+    # data of every series is streamed from its own pass over timeseries
+    return iter([{
+        "name": value_keyname,
+        "label": desc["label_texts"][value_keyname],
+        "unit": desc["label_units"][value_keyname],
+        "interval": desc["interval"],
+        "data": _iter_points(timeseries, value_keyname)
+    } for value_keyname in value_keynames])
+
+@app.route("/graph/rollup/<project>/<tablename>/<datestring1>/<datestring2>/<b64index>", methods=["GET"])
+@app.route("/graph/rollup/<project>/<tablename>/<datestring1>/<datestring2>/<b64index>/<value_keyname>", methods=["GET"])
+@cache_control("public, max-age=86400")
+@conditional
+@apihandler
+def get_graph_rollup(project, tablename, datestring1, datestring2, b64index, value_keyname=None):
+    """
+    summary: return aggregated Timeseries data of many days specific for graphing with highcharts
+    parameters:
+      - name: project
+        in: path
+        required: true
+        description: name of project
+        schema:
+          type: string
+      - name: tablename
+        in: path
+        required: true
+        description: name of table
+        schema:
+          type: string
+      - name: datestring1
+        in: path
+        required: true
+        description: datestring to start, the older one
+        schema:
+          type: string
+      - name: datestring2
+        in: path
+        required: true
+        description: datestring to stop, the newer one
+        schema:
+          type: string
+      - name: base64index
+        in: path
+        required: true
+        description: base64 encoded string representation of index tuple
+        schema:
+          type: string
+      - name: value_keyname
+        in: path
+        required: false
+        description: if given one value_keyname of this TimeSeries
+        schema:
+          type: string
+      - name: points
+        in: query
+        required: false
+        description: maximum number of points per series, default 1000
+        schema:
+          type: integer
+    description: "example /graph/rollup/cmdb/vicenterVms/2019-08-01/2019-08-31/asdhfkasdhkajshd==?points=800
+        the finest rollup tier (5 minutes, 1 hour or 1 day) not exceeding points is used,
+        data holds the average, range min and max of every bucket"
+    """
+    index_key = b64eval(b64index) # eval is not secure
+    dl = _get_table(project, tablename)
+    desc = dl.meta
     value_keynames = desc["value_keynames"] # default all available
     if value_keyname and value_keyname in desc["value_keynames"]:
         value_keynames = (value_keyname, )
+    interval, rollup = dl.load_rollup(index_key, datestring1, datestring2, value_keynames, request.args.get("points", 1000, type=int))
+    series = []
     for value_keyname in value_keynames:
-        series[value_keyname] = {
+        series.append({
             "name": value_keyname,
             "label": desc["label_texts"][value_keyname],
             "unit": desc["label_units"][value_keyname],
-            "interval": desc["interval"],
-            "data": []
-        }
-    for point in _dl["tsa", index_key].to_data():
-        for value_keyname in value_keynames:
-            series[value_keyname]["data"].append((point["ts"], point[value_keyname]))
-    return list(series.values())
+            "interval": interval,
+            "data": [(row[0], row[3]) for row in rollup[value_keyname]],
+            "range": [(row[0], row[1], row[2]) for row in rollup[value_keyname]]
+        })
+    return series
 
 @app.route("/graph/tsstats/<project>/<tablename>/<datestring1>/<datestring2>/<b64index>/<stat_func_name>", methods=["GET"])
 @app.route("/graph/tsstats/<project>/<tablename>/<datestring1>/<datestring2>/<b64index>/<stat_func_name>/<value_keyname>", methods=["GET"])
 @cache_control("public, max-age=31536000")
+@conditional
 @apihandler
 def get_graph_tsstats(project, tablename, datestring1, datestring2, b64index, stat_func_name, value_keyname=None):
     """
@@ -644,9 +898,8 @@ def get_graph_tsstats(project, tablename, datestring1, datestring2, b64index, st
     description: example /graph/tsstats/cmdb/vicenterVms/2019-08-01/2019-09-01/asdhfkasdhkajshd==/avg
     """
     index_key = b64eval(b64index) # eval is not secure
-    yesterday = (datetime.date.today() - datetime.timedelta(days=1)).isoformat() # used to initialize datalogger
-    _dl.setup(project, tablename, yesterday)
-    desc = _dl.meta
+    dl = _get_table(project, tablename)
+    desc = dl.meta
     series = {}
     value_keynames = desc["value_keynames"] # default all available
     if value_keyname and value_keyname in desc["value_keynames"]:
@@ -660,16 +913,20 @@ def get_graph_tsstats(project, tablename, datestring1, datestring2, b64index, st
             "interval": desc["interval"],
             "data": []
         }
+    longtime_stats = dl.load_longtime_stats(index_key, datestring1, datestring2) # one read per year
     for datestring in _datewalker(datestring1, datestring2):
-        _dl.setup(project, tablename, datestring)
-        stats = _dl["tsastats", index_key].to_data()
-        for value_keyname in desc["value_keynames"]:
+        if datestring in longtime_stats:
+            stats = longtime_stats[datestring]
+        else: # day not in long-range store, generated before it existed
+            stats = _get_table(project, tablename, datestring)["tsastats", index_key].to_data()
+        for value_keyname in value_keynames:
             series[value_keyname]["data"].append((datestring, stats[value_keyname][stat_func_name]))
         categories.append(datestring)
     return {"categories" : categories, "series": list(series.values())}
 
 @app.route("/tsstats/<project>/<tablename>/<datestring>/<b64index>", methods=["GET"])
 @cache_control("public, max-age=31536000")
+@conditional
 @apihandler
 def get_tsstats(project, tablename, datestring, b64index):
     """
@@ -702,9 +959,64 @@ def get_tsstats(project, tablename, datestring, b64index):
     description: example /tsstats/cmdb/vicenterVms/2019-08-01/asdhfkasdhkajshd==
     """
     index_key = b64eval(b64index) # eval is not secure
-    result = {}
-    _dl.setup(project, tablename, datestring)
-    return _dl["tsastats", index_key].to_data()
+    if datestring == datetime.date.today().isoformat():
+        return _read_livestats(project, tablename, lambda livestats: livestats[index_key])
+    return _get_table(project, tablename, datestring)["tsastats", index_key].to_data()
+
+@app.route("/correlation_time/<project>/<tablename>/<datestring1>/<datestring2>/<value_keyname>", methods=["GET"])
+@cache_control("public, max-age=86400")
+@conditional
+@apihandler
+def get_correlation_time(project, tablename, datestring1, datestring2, value_keyname):
+    """
+    summary: return keys which changed most between two days
+    parameters:
+      - name: project
+        in: path
+        required: true
+        description: name of project
+        schema:
+          type: string
+      - name: tablename
+        in: path
+        required: true
+        description: name of table
+        schema:
+          type: string
+      - name: datestring1
+        in: path
+        required: true
+        description: datestring to compare to, the older one
+        schema:
+          type: string
+      - name: datestring2
+        in: path
+        required: true
+        description: datestring to examine, the newer one
+        schema:
+          type: string
+      - name: value_keyname
+        in: path
+        required: true
+        description: value_keyname to compare
+        schema:
+          type: string
+      - name: count
+        in: query
+        required: false
+        description: number of keys to return, default 20
+        schema:
+          type: integer
+    description: "example /correlation_time/cmdb/vicenterVms/2019-08-01/2019-08-08/cpu.used.summation?count=10
+        mse is the mean squared error of the sorted values of both days, normalized by the maximum on datestring2,
+        highest first, computed for all keys of the table at once and cached on the server"
+    """
+    cmt = _get_table(project, tablename, datestring2).load_correlation_time(datestring1, value_keyname)
+    return [{
+        "key": index_key,
+        "_b64_key": b64encode(index_key),
+        "mse": mse
+    } for index_key, mse in cmt.top(request.args.get("count", 20, type=int))]
 
 @app.route("/project/<project>", methods=["POST"])
 @apihandler
@@ -875,8 +1187,8 @@ def post_raw_file(project, tablename, datestring):
     if "myfile" not in request.files:
         logger.info("No myfile part in request")
         raise AttributeError("no myfile part in request")
-    _dl.setup(project, tablename, datestring)
-    filename = os.path.join(_dl.raw_basedir, "%s_%s.csv.gz" % (tablename, datestring))
+    dl = _get_table(project, tablename, datestring)
+    filename = os.path.join(dl.raw_basedir, "%s_%s.csv.gz" % (tablename, datestring))
     if os.path.isfile(filename):
         logger.info("File already exists")
         raise AttributeError("File already exists")
@@ -892,7 +1204,7 @@ def post_raw_file(project, tablename, datestring):
         raise exc
     # reread saved data
     try:
-        tsa = _dl["tsa"] # re-read received data
+        tsa = dl["tsa"] # re-read received data
     except AssertionError as exc:
         logger.exception(exc)
         os.unlink(filename)
@@ -938,30 +1250,28 @@ def put_append(project, tablename, clocktype="wallclock"):
         raise AttributeError("key rows not found in received data")
     if not isinstance(data["rows"], list): # of type list
         raise AttributeError("submitted data must be type list")
-    yesterday = (datetime.date.today() - datetime.timedelta(days=1)).isoformat() # used to initialize datalogger
     datestring = datetime.date.today().isoformat() # today
-    _dl.setup(project, tablename, yesterday) # TODO: initialization could only be done for datestring in the past
-    filename = os.path.join(_dl.raw_basedir, "%s_%s.csv" % (tablename, datestring))
-    firstline = False # indicate headerline or not
-    if not os.path.isfile(filename):
-        fh = open(filename, "wt", encoding="utf-8") # thats very important to use utf-8
-        firstline = True
-    else:
-        fh = open(filename, "at", encoding="utf-8")
+    dl = _get_table(project, tablename) # TODO: initialization could only be done for datestring in the past
+    filename = _get_live_raw_filename(dl, tablename, datestring)
     ts = time.time() # default check timestamp, must be +/- 60s to now()
     if clocktype == "dataclock": # no check
         ts = None
-    with fh as outfile:
-        for row  in data["rows"]:
-            valid, message, status_code = _row_is_valid(row, ts=ts) # check validity
-            if valid is False:
-                raise AttributeError(message)
-            # actually write
-            if firstline is True:
+    for row in data["rows"]:
+        valid, message, status_code = _row_is_valid(dl, row, ts=ts) # check validity
+        if valid is False:
+            raise AttributeError(message)
+    with _get_livestats_lock(project, tablename):
+        with open(filename, "at", encoding="utf-8") as outfile: # thats very important to use utf-8
+            fcntl.flock(outfile, fcntl.LOCK_EX) # other processes append to the same file
+            if os.fstat(outfile.fileno()).st_size == 0:
                 logger.info("raw file does not exist, will create new file %s", filename)
-                outfile.write("\t".join(_dl.headers) + "\n") # TODO: use delimiter defined in meta
-                firstline = False
-            outfile.write("\t".join([str(row[key]) for key in _dl.headers]) + "\n")
+                outfile.write("\t".join(dl.headers) + "\n") # TODO: use delimiter defined in meta
+            for row in data["rows"]: # actually write
+                outfile.write("\t".join([str(row[key]) for key in dl.headers]) + "\n")
+            outfile.flush() # before lock is released
+        livestats = _get_livestats(project, tablename) # reads appended rows from raw file
+        if livestats.dumped is None or time.time() - livestats.dumped > LIVESTATS_DUMP_INTERVAL:
+            _dump_livestats(project, tablename, livestats)
     return "%d rows appended" % len(data["rows"])
 
 @app.route("/appendmany/<project>/<tablename>", methods=["PUT"])
@@ -1016,12 +1326,158 @@ def delete_caches(project, tablename, datestring):
         schema:
           type: string
     """
-    _dl.setup(project, tablename, datestring)
-    _dl.delete_caches()
+    _get_table(project, tablename, datestring).delete_caches()
 
 
 ############### private functions ##################################
 
+def _get_cache_versions(kwds):
+    """
+    return versions of cache directories of all datestrings of this request
+
+    :param kwds: <dict> arguments of endpoint, with project, tablename and datestring or datestring1 and datestring2
+    :return <tuple>: of <int>, None for days without caches, or None if this is live data or there are no caches at all
+    """
+    if "datestring" in kwds:
+        datestrings = [kwds["datestring"], ]
+    else:
+        datestrings = list(_datewalker(kwds["datestring1"], kwds["datestring2"]))
+    if datetime.date.today().isoformat() in datestrings:
+        return None
+    versions = tuple((_dl.get_cache_version(kwds["project"], kwds["tablename"], datestring) for datestring in datestrings))
+    if all((version is None for version in versions)):
+        return None
+    return versions # days without caches are part of the version, they change if generated
+
+def _get_table(project, tablename, datestring=None):
+    """
+    return table context of global _dl for this request, contexts are
+    immutable, so concurrent requests do not interfere with each other,
+    loaded data is shared between all contexts
+
+    :param project: <str>
+    :param tablename: <str>
+    :param datestring: <str> like 2019-12-31, default yesterday, use default for meta informations only
+    :return <DataLogger>:
+    """
+    if datestring is None:
+        datestring = (datetime.date.today() - datetime.timedelta(days=1)).isoformat()
+    return _dl.table(project, tablename, datestring)
+
+def _get_livestats_dir(project, tablename, datestring):
+    """return cache directory of live statistics, created if not existing"""
+    outdir = os.path.join(_dl.global_cachedir, datestring, project, tablename)
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    return outdir
+
+def _get_live_raw_filename(dl, tablename, datestring):
+    """return raw input file of live data, written by put_append"""
+    return os.path.join(dl.raw_basedir, "%s_%s.csv" % (tablename, datestring))
+
+def _get_livestats_lock(project, tablename):
+    """
+    return lock of LiveStats of project/tablename, it has to be held
+    while appending rows and while using LiveStats
+
+    :return <threading.Lock>:
+    """
+    with _livestats_locks_lock:
+        return _livestats_locks.setdefault((project, tablename), threading.Lock())
+
+def _get_livestats(project, tablename):
+    """
+    return LiveStats of todays data for project/tablename, up to date with
+    all rows in raw input file, also appended by other processes.
+    After a restart the last dump is loaded, and the remaining rows are
+    read from raw input file. Meta informations of this table are taken
+    from context of yesterday. Call only while holding _get_livestats_lock
+
+    :param project: <str>
+    :param tablename: <str>
+    :return <LiveStats>:
+    """
+    datestring = datetime.date.today().isoformat()
+    dl = _get_table(project, tablename)
+    livestats = _livestats.get((project, tablename))
+    if livestats is None or livestats.datestring != datestring:
+        filename = LiveStats.get_dumpfilename(_get_livestats_dir(project, tablename, datestring))
+        if os.path.isfile(filename):
+            livestats = LiveStats.load(os.path.dirname(filename))
+            livestats.dumped = time.time()
+        else: # first data of today
+            livestats = LiveStats(dl.index_keynames, dl.value_keynames, dl.ts_keyname, dl.datatypes, datestring)
+        _livestats[(project, tablename)] = livestats
+    raw_filename = _get_live_raw_filename(dl, tablename, datestring)
+    if os.path.isfile(raw_filename):
+        livestats.update(raw_filename, "\t") # delimiter used by put_append
+    return livestats
+
+def _read_livestats(project, tablename, func):
+    """
+    return func(livestats) of todays LiveStats of project/tablename,
+    func is called while holding the lock, so results are consistent
+
+    :param project: <str>
+    :param tablename: <str>
+    :param func: <function> called with LiveStats
+    """
+    with _get_livestats_lock(project, tablename):
+        return func(_get_livestats(project, tablename))
+
+def _dump_livestats(project, tablename, livestats):
+    """store LiveStats to cache directory of its datestring"""
+    livestats.dump(_get_livestats_dir(project, tablename, livestats.datestring))
+    livestats.dumped = time.time()
+
+def _get_stats(project, tablename, datestring):
+    """
+    return statistics of every index key like TimeseriesArrayStats.stats,
+    for todays data from LiveStats
+
+    :param project: <str>
+    :param tablename: <str>
+    :param datestring: <str> like 2019-012-31
+    :return <dict>:
+    """
+    if datestring == datetime.date.today().isoformat():
+        return _read_livestats(project, tablename, lambda livestats: livestats.stats)
+    return _get_table(project, tablename, datestring)["tsastats"].stats
+
+def _iter_points(timeseries, value_keyname):
+    """yield (ts, value) of one value_keyname of Timeseries"""
+    for point in timeseries.to_data((value_keyname, )):
+        yield (point[timeseries.ts_keyname], point[value_keyname])
+
+@lru_cache(maxsize=DOWNSAMPLE_CACHE_SIZE)
+def _get_graph_ts_downsampled(project, tablename, datestring, b64index, value_keyname, max_points, method, version):
+    """
+    return highcharts series like get_graph_ts, every series downsampled
+    to max_points on its own, results are cached per key and version
+
+    :param version: <int> cache version of project/tablename/datestring,
+        not used, but part of cache key, so results of deleted or
+        regenerated caches are not used anymore
+    """
+    index_key = b64eval(b64index) # eval is not secure
+    dl = _get_table(project, tablename, datestring)
+    desc = dl.meta
+    value_keynames = desc["value_keynames"] # default all available
+    if value_keyname and value_keyname in desc["value_keynames"]:
+        value_keynames = (value_keyname, )
+    times, values = get_matrix(dl["tsa", index_key], value_keynames)
+    series = []
+    for value_keyname, serie in zip(value_keynames, values):
+        selected = downsample(times, serie, max_points, method)
+        series.append({
+            "name": value_keyname,
+            "label": desc["label_texts"][value_keyname],
+            "unit": desc["label_units"][value_keyname],
+            "interval": desc["interval"],
+            "data": list(zip(times[selected].tolist(), serie[selected].tolist()))
+        })
+    return series
+
 def _get_table_index(project, tablename, datestring):
     """
     yield all stored data form project/tablename/datestring
@@ -1030,8 +1486,8 @@ def _get_table_index(project, tablename, datestring):
     :param datestring: <str> like 2019-012-31
     :return <dict>: generator
     """
-    _dl.setup(project, tablename, datestring)
-    dl_caches = dict(_dl["caches"])
+    dl = _get_table(project, tablename, datestring)
+    dl_caches = dict(dl["caches"])
     for str_key in dl_caches["ts"]["keys"]:
         filename = dl_caches["ts"]["keys"][str_key]
         b64_key = filename.split(".")[0].split("_")[1]
@@ -1039,7 +1495,7 @@ def _get_table_index(project, tablename, datestring):
             "_project": project,
             "_tablename": tablename,
             "_datestring": datestring,
-            "_key": dict(zip(_dl.meta["index_keynames"], eval(str_key))),
+            "_key": dict(zip(dl.index_keynames, eval(str_key))),
             "_str_key": str_key,
             "_b64_key": b64_key,
             "_links": {
@@ -1059,11 +1515,11 @@ def _get_index(datestring):
     ret_data = []
     for project in list(_dl.get_projects()):
         for tablename in list(_dl.get_tablenames(project)):
-            _dl.setup(project, tablename, datestring)
-            index_keynames = _dl.meta["index_keynames"]
-            for index in _dl["caches"]["ts"]["keys"]:
+            dl = _get_table(project, tablename, datestring)
+            index_keynames = dl.index_keynames
+            for index in dl["caches"]["ts"]["keys"]:
                 # key like : ts_KHUndnNhbmFwcDYnLCB1JzEwMicsIHUnMCcsIHUnMScsIHUnMzUnLCB1J1ByaW1hcnkgTGF5b3V0JywgdScxMDAyNicp.csv.gz
-                b64 = _dl["caches"]["ts"]["keys"][index].split("_")[1].split(".")[0]
+                b64 = dl["caches"]["ts"]["keys"][index].split("_")[1].split(".")[0]
                 index_dict = {
                     "_project": project,
                     "_tablename": tablename,
@@ -1085,42 +1541,43 @@ def _get_index_keys(data):
     if index_key in data this will be used to match exactly
     if index_pattern is given, all matches will be returned
     """
-    _dl.setup(data["project"], data["tablename"], data["datestring"])
+    dl = _get_table(data["project"], data["tablename"], data["datestring"])
     index_keys = []
     if data["index_key"]: # use only one
-        if tuple(data["index_key"]) in _dl["tsa"].keys():
+        if tuple(data["index_key"]) in dl["tsa"].keys():
             index_keys.append(data["index_key"])
     else: # search by pattern in available index_keys
         index_keys = []
         index_pattern = data["index_pattern"]
-        for index_key in _dl["tsa"].keys():
-            index_key_dict = dict(zip(_dl.index_keynames, index_key))
+        for index_key in dl["tsa"].keys():
+            index_key_dict = dict(zip(dl.index_keynames, index_key))
             if all((index_pattern[key].lower() in index_key_dict[key].lower() for key in index_pattern.keys() if index_pattern[key])):
                 index_keys.append(index_key)
     return index_keys
 
-def _row_is_valid(row, ts=None):
+def _row_is_valid(dl, row, ts=None):
     """
     return True if row is valid, otherwise False, cehck timestamp if ts was given
+    :params dl <DataLogger>: table context of this row
     :params row <dict>: dictionary of single row
     :params ts None or float: if given check if timestamp is in between +/- 60s to now
     :returns <tuple>(<bool:valid or not>, <str:message>, <int:status:code>):
     """
     # self.logger.info("received data to store %s", row)
-    if not all((index_key in row for index_key in _dl.index_keynames)):
+    if not all((index_key in row for index_key in dl.index_keynames)):
         logger.error("some index_key is missing")
         return False, "some index_key is missing", 409
-    if not all((value_key in row for value_key in _dl.value_keynames)):
+    if not all((value_key in row for value_key in dl.value_keynames)):
         logger.error("some value_key is missing")
         return False, "some value_key is missing", 409
-    if not _dl.ts_keyname in row:
+    if not dl.ts_keyname in row:
         logger.error("ts_key is missing")
         return False, "ts_key is missing", 409
     if ts: # only if given
         # check timestamp
         min_ts = ts - 60
         max_ts = ts + 60
-        if not min_ts < float(row[_dl.ts_keyname]) < max_ts:
+        if not min_ts < float(row[dl.ts_keyname]) < max_ts:
             logger.info("timestamp in received data is out of range +/- 60s")
             return False, "timestamp in received data is out of range +/- 60s", 409
     return True, "row is valid", 200
@@ -1152,6 +1609,10 @@ def _datewalker(datestring_start, datestring_stop):
 
 logger = logging.getLogger("DataLoggerWebApp")
 logger.setLevel(logging.INFO)
+_livestats = {} # (project, tablename) -> LiveStats of today
+_livestats_locks = {} # (project, tablename) -> threading.Lock
+_livestats_locks_lock = threading.Lock()
+LIVESTATS_DUMP_INTERVAL = 60 # seconds between two dumps of live statistics
 application = app # WSGI Module will call application.run()
 app.config["JSON_AS_ASCII"] = False # that little thing is crucial, json will return UTF-8 encoded
 if __name__ == "__main__":
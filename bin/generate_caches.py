@@ -5,9 +5,13 @@ usually this should be run daily to analyze new data
 """
 import sys
 import os
+import time
+import struct
 import datetime
 import logging
 import argparse
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
 # own modules
 from datalogger4 import DataLogger
 from datalogger4 import TimeseriesArrayStats
@@ -17,7 +21,12 @@ from datalogger4 import fast_tsa
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s : %(message)s")
 
-def analyze(basedir, project, tablename, datestring, force):
+# estimated memory usage of analyze in relation to the size of uncompressed raw input
+MEMORY_FACTOR = 5
+# estimated memory of one additional process parsing raw input
+PARSE_WORKER_MEMORY = 64 * 2**20
+
+def analyze(basedir, project, tablename, datestring, force, parse_workers=1, fmt="csv", fused=False):
     """
     analyze or reanalyze given project/tablename/datestring combination
     generating TimeseriesArray, Timeseries, TimeseriesArrayStats, TimeseriesStats, QuantileArray, Quantile
@@ -26,6 +35,9 @@ def analyze(basedir, project, tablename, datestring, force):
     :param tablename <str>: name of table in project
     :param datestring <str>: datestring
     :param force <bool>: if True, recreate from original input file (raw)
+    :param parse_workers <int>: number of processes to parse raw input file
+    :param fmt <str>: format of Timeseries cache files, csv, bin or bin.gz
+    :param fused <bool>: if True, calculate all statistics from parsed data in memory
     """
     dl = DataLogger(basedir)
     dl.setup(project, tablename, datestring)
@@ -59,8 +71,12 @@ def analyze(basedir, project, tablename, datestring, force):
         dl.delete_caches()
         dl = DataLogger(basedir)
         dl.setup(project, tablename, datestring)
-        logging.info("calling fast_tsa()")
-        fast_tsa(dl) # read from input and split into Timeseries
+        if fused:
+            logging.info("calling generate_caches()")
+            dl.generate_caches(parse_workers=parse_workers, fmt=fmt, fused=True)
+        else:
+            logging.info("calling fast_tsa()")
+            fast_tsa(dl, parse_workers=parse_workers, fmt=fmt) # read from input and split into Timeseries
     logging.info("getting caches")
     caches = dl["caches"]
     assert isinstance(caches, dict)
@@ -68,8 +84,12 @@ def analyze(basedir, project, tablename, datestring, force):
         # there seems to be no caches at all
         # generate them all, higher memory consumption
         logging.info("no existing TSA and TS Files found, creating from scratch")
-        logging.info("calling fast_tsa()")
-        fast_tsa(dl)
+        if fused:
+            logging.info("calling generate_caches()")
+            dl.generate_caches(parse_workers=parse_workers, fmt=fmt, fused=True)
+        else:
+            logging.info("calling fast_tsa()")
+            fast_tsa(dl, parse_workers=parse_workers, fmt=fmt)
         #logging.info("archiving to archivepath")
         #dl.raw_to_archive()
     logging.info("reading tsa - or recreating if not present")
@@ -101,12 +121,204 @@ def analyze(basedir, project, tablename, datestring, force):
     num_points = 24 * 60 * 60 / meta["interval"] * num_ts
     logging.info("stats individual points     : %s", num_points)
 
+def get_raw_size(dl):
+    """
+    return size of uncompressed raw input data of this setup in bytes,
+    for gzipped files the size is read from gzip trailer,
+    0 if there is no raw input data
+
+    :param dl <DataLogger>: already setup to project/tablename/datestring
+    """
+    for filename in (dl.raw_filename, dl.archive_filename):
+        if filename is None or not os.path.isfile(filename):
+            continue
+        size = os.path.getsize(filename)
+        if filename.endswith(".gz"):
+            with open(filename, "rb") as infile:
+                infile.seek(-4, os.SEEK_END)
+                # ISIZE is stored modulo 2**32, so use at least compressed size
+                size = max(size, struct.unpack("<I", infile.read(4))[0])
+        return size
+    return 0
+
+def get_jobs(basedir, startdate, enddate, project=None, tablename=None, force=False):
+    """
+    enumerate all pending jobs between startdate and enddate,
+    jobs of already analyzed and archived days are skipped,
+    so after some crash only the unfinished jobs will be returned
+
+    the jobs are sorted by priority, newest datestring first,
+    then largest raw input first (longest processing time first)
+
+    :param basedir <str>: basedir of datalogger
+    :param startdate <str>: datestring to start
+    :param enddate <str>: datestring to stop
+    :param project <str>: process only this project, None for all
+    :param tablename <str>: process only this tablename, None for all
+    :param force <bool>: if True, also list already finished jobs
+    :return <list>: of <tuple> (datestring, project, tablename, estimated memory in bytes)
+    """
+    jobs = []
+    dl = DataLogger(basedir)
+    for datestring in tuple(dl.datewalker(startdate, enddate)):
+        for job_project in dl.get_projects():
+            if project is not None and job_project != project:
+                continue
+            for job_tablename in dl.get_tablenames(job_project):
+                if tablename is not None and job_tablename != tablename:
+                    continue
+                dl.setup(job_project, job_tablename, datestring)
+                caches = dl["caches"]
+                if not force and caches["total_stats"]["exists"] and dl.raw_filename is None:
+                    logging.debug("%s/%s/%s is already finished", job_project, job_tablename, datestring)
+                    continue
+                size = get_raw_size(dl)
+                if size == 0 and not caches["tsa"]["keys"]:
+                    logging.debug("%s/%s/%s has no input data", job_project, job_tablename, datestring)
+                    continue
+                jobs.append((datestring, job_project, job_tablename, size * MEMORY_FACTOR))
+    return sort_jobs(jobs)
+
+def sort_jobs(jobs):
+    """
+    sort jobs by priority, newest datestring first, then largest
+    raw input first (longest processing time first)
+
+    :param jobs <list>: of <tuple> (datestring, project, tablename, estimated memory in bytes)
+    :return <list>: sorted jobs
+    """
+    return sorted(jobs, key=lambda job: (job[0], job[3]), reverse=True)
+
+def get_job_memory(job, parse_workers=1):
+    """
+    return estimated memory of job, if raw input is parsed by more
+    than one process, the parsed parts are held in the parsing processes
+    until they are merged, so the estimation doubles, and every parsing
+    process needs some memory on its own
+
+    :param job <tuple>: as returned by get_jobs
+    :param parse_workers <int>: number of processes to parse raw input file
+    :return <int>: estimated memory in bytes
+    """
+    if parse_workers > 1:
+        return 2 * job[3] + parse_workers * PARSE_WORKER_MEMORY
+    return job[3]
+
+def pick_job(pending, running, used, memory_limit, parse_workers=1):
+    """
+    return index of next job to start, in the given order, as long as
+    the sum of estimated memory of running jobs stays below memory_limit.
+    If the next job does not fit, a smaller one is chosen, a job larger
+    than memory_limit is chosen if nothing else is running
+
+    :param pending <list>: of jobs not started yet
+    :param running <int>: number of running jobs
+    :param used <int>: estimated memory of running jobs in bytes
+    :param memory_limit <int>: memory budget in bytes
+    :param parse_workers <int>: number of processes to parse raw input file
+    :return <int>: index in pending or None if no job fits
+    """
+    for index, job in enumerate(pending):
+        if not running or used + get_job_memory(job, parse_workers) <= memory_limit:
+            return index
+    return None
+
+def run_job(basedir, job, force, parse_workers, fmt, fused):
+    """
+    run analyze for one job in a worker process
+
+    :param basedir <str>: basedir of datalogger
+    :param job <tuple>: as returned by get_jobs
+    :return <float>: duration in seconds
+    """
+    starttime = time.time()
+    datestring, project, tablename, _ = job
+    analyze(basedir, project, tablename, datestring, force, parse_workers, fmt, fused)
+    return time.time() - starttime
+
+def schedule(basedir, jobs, workers, memory_limit, force=False, parse_workers=1, fmt="csv", fused=False, func=run_job):
+    """
+    run jobs in a pool of processes, in the order pick_job chooses
+
+    if a worker process dies, for example killed by the OOM killer,
+    all jobs running in this pool fail, and a new pool is created
+    for the remaining jobs
+
+    :param basedir <str>: basedir of datalogger
+    :param jobs <list>: as returned by get_jobs
+    :param workers <int>: number of processes
+    :param memory_limit <int>: memory budget in bytes
+    :param func <function>: called with basedir, job, force, parse_workers, fmt, fused in worker process
+    :return <list>: of failed jobs
+    """
+    pending = list(jobs)
+    running = {}
+    failed = []
+    used = 0
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    submitted = 0 # jobs submitted to current pool
+    try:
+        while pending or running:
+            broken = False
+            while pending and len(running) < workers:
+                index = pick_job(pending, len(running), used, memory_limit, parse_workers)
+                if index is None:
+                    break
+                job = pending[index]
+                try:
+                    future = executor.submit(func, basedir, job, force, parse_workers, fmt, fused)
+                except BrokenProcessPool as exc:
+                    broken = True
+                    if not submitted: # even a new pool is not working
+                        logging.exception(exc)
+                        logging.error("job %s/%s/%s could not be started", job[1], job[2], job[0])
+                        failed.append(pending.pop(index))
+                    break
+                del pending[index]
+                logging.info("starting %s/%s/%s, estimated memory %d MB", job[1], job[2], job[0], get_job_memory(job, parse_workers) // 2**20)
+                running[future] = job
+                submitted += 1
+                used += get_job_memory(job, parse_workers)
+            if running:
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    used -= get_job_memory(job, parse_workers)
+                    try:
+                        logging.info("finished %s/%s/%s in %0.2f s, %d jobs left", job[1], job[2], job[0], future.result(), len(pending) + len(running))
+                    except BrokenProcessPool:
+                        logging.error("job %s/%s/%s failed, worker process died, maybe out of memory", job[1], job[2], job[0])
+                        failed.append(job)
+                        broken = True
+                    except Exception as exc:
+                        logging.exception(exc)
+                        logging.error("job %s/%s/%s failed", job[1], job[2], job[0])
+                        failed.append(job)
+            if broken and not running:
+                logging.info("recreating pool of processes, %d jobs left", len(pending))
+                executor.shutdown(wait=True)
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+                submitted = 0
+    finally:
+        executor.shutdown(wait=True)
+    return failed
+
 def main():
     """
     walk from start to enddate and analyze data
     if the specific day is already analyzed, nothing will happen
     otherwise this data will be analyzed
+
+    with --jobs all pending jobs are run in parallel by schedule()
     """
+    if args.jobs > 0:
+        jobs = get_jobs(args.basedir, startdate, args.enddate, args.project, args.tablename, args.force)
+        logging.info("found %d pending jobs", len(jobs))
+        failed = schedule(args.basedir, jobs, args.jobs, args.memory * 2**20, args.force, args.workers, args.format, args.fused)
+        if failed:
+            logging.error("%d jobs failed, run again to retry", len(failed))
+            sys.exit(1)
+        return
     datalogger = DataLogger(args.basedir)
     for datestring in tuple(datalogger.datewalker(startdate, args.enddate)):
         start_ts, stop_ts = datalogger.get_ts_for_datestring(datestring)
@@ -121,7 +333,7 @@ def main():
                     logging.debug("skipping %s/%s", project, tablename)
                     continue
                 logging.info("working on %s/%s/%s", project, tablename, datestring)
-                analyze(args.basedir, project, tablename, datestring, args.force)
+                analyze(args.basedir, project, tablename, datestring, args.force, args.workers, args.format, args.fused)
 
 if __name__ == "__main__":
     yesterday_datestring = (datetime.date.today() - datetime.timedelta(1)).isoformat()
@@ -135,6 +347,11 @@ if __name__ == "__main__":
     parser.add_argument("-p", '--project', help="process only this project name")
     parser.add_argument("-t", '--tablename', help="process only this tablename")
     parser.add_argument("-f", '--force', action="store_true", help="force recreation of caches")
+    parser.add_argument('--format', default="csv", choices=("csv", "bin", "bin.gz", "pack", "pack.zlib"), help="format of Timeseries cache files, default : %(default)s")
+    parser.add_argument("-w", '--workers', type=int, default=1, help="number of processes to parse raw input files, default : %(default)s")
+    parser.add_argument('--fused', action="store_true", help="calculate tsastats, quantiles and total_stats while parsing, without reading Timeseries files again")
+    parser.add_argument("-j", '--jobs', type=int, default=0, help="number of days/tables to analyze in parallel, 0 to run one after the other, default : %(default)s")
+    parser.add_argument('--memory', type=int, default=4096, help="memory budget in MB for parallel jobs, default : %(default)s")
     args = parser.parse_args()
     if args.quiet is True:
         logging.getLogger("").setLevel(logging.ERROR)
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+"""
+script to convert existing Timeseries and TimeseriesStats cache files
+of analyzed days into one container file each per table and day
+
+ts_<key1>.csv.gz
+ts_<key2>.csv.gz     ->   tspack_<index_keys>.dat
+...
+tsstat_<key1>.json
+tsstat_<key2>.json   ->   tsastat_<index_keys>.dat
+...
+"""
+import sys
+import os
+import datetime
+import logging
+import argparse
+# own modules
+from datalogger4 import DataLogger
+from datalogger4 import TimeseriesArray
+from datalogger4 import TimeseriesArrayStats
+from datalogger4.TimeseriesPack import TimeseriesPack
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s : %(message)s")
+
+def convert(basedir, project, tablename, datestring, fmt, delete):
+    """
+    convert Timeseries and TimeseriesStats files of given
+    project/tablename/datestring combination into container files
+
+    :param basedir <str>: basedir of datalogger
+    :param project <str>: name of project
+    :param tablename <str>: name of table in project
+    :param datestring <str>: datestring
+    :param fmt <str>: either pack or pack.zlib
+    :param delete <bool>: if True, delete single files after conversion
+    """
+    dl = DataLogger(basedir)
+    dl.setup(project, tablename, datestring)
+    caches = dl["caches"]
+    convert_tsstats(dl, caches, delete)
+    if caches["tspack"]["keys"]:
+        logging.info("container file already exists, skipping")
+        return
+    if not caches["tsa"]["keys"] or not caches["ts"]["keys"]:
+        logging.info("no TSA or TS Files found, nothing to convert")
+        return
+    ts_filenames = list(caches["ts"]["keys"].values())
+    # load without datatype conversion, to store the data as is
+    tsa = TimeseriesArray.load(dl.cachedir, dl.index_keynames, datatypes={})
+    tsa.dump(dl.cachedir, fmt=fmt) # writes container and new tsa file
+    with TimeseriesPack(os.path.join(dl.cachedir, TimeseriesPack.get_dumpfilename(dl.index_keynames))) as pack:
+        if len(pack) != len(tsa):
+            logging.error("container holds %d keys, but there are %d Timeseries files", len(pack), len(tsa))
+            return
+    logging.info("converted %d Timeseries files", len(ts_filenames))
+    if delete:
+        for filename in ts_filenames:
+            logging.debug("deleting %s", filename)
+            os.unlink(os.path.join(dl.cachedir, filename))
+
+def convert_tsstats(dl, caches, delete):
+    """
+    convert tsstat files of former versions into one container file
+
+    :param dl <DataLogger>: already set up
+    :param caches <dict>: output of DataLogger.get_caches
+    :param delete <bool>: if True, delete tsstat files after conversion
+    """
+    tsstat_filenames = [filename for filename in caches["tsstat"]["keys"].values() if filename.endswith(".json")]
+    if not tsstat_filenames:
+        logging.info("no tsstat files found, nothing to convert")
+        return
+    tsastats = TimeseriesArrayStats.load(dl.cachedir, dl.index_keynames)
+    tsastats.dump(dl.cachedir, overwrite=True) # writes container and new tsastat file
+    stored = len(TimeseriesArrayStats.get_stored_keys(dl.cachedir, dl.index_keynames))
+    if stored != len(tsstat_filenames):
+        logging.error("container holds %d keys, but there are %d tsstat files", stored, len(tsstat_filenames))
+        return
+    logging.info("converted %d tsstat files", len(tsstat_filenames))
+    if delete:
+        for filename in tsstat_filenames:
+            logging.debug("deleting %s", filename)
+            os.unlink(os.path.join(dl.cachedir, filename))
+
+def main():
+    """
+    walk from start to enddate and convert every table of every project,
+    and add tables analyzed by former versions to search index
+    """
+    datalogger = DataLogger(args.basedir)
+    for datestring in tuple(datalogger.datewalker(startdate, args.enddate)):
+        for project in datalogger.get_projects():
+            if args.project is not None and project != args.project:
+                logging.debug("skipping whole project %s", project)
+                continue
+            for tablename in datalogger.get_tablenames(project):
+                if args.tablename is not None and tablename != args.tablename:
+                    logging.debug("skipping %s/%s", project, tablename)
+                    continue
+                logging.info("working on %s/%s/%s", project, tablename, datestring)
+                convert(args.basedir, project, tablename, datestring, args.format, args.delete)
+        # tables analyzed by former versions are missing in search index
+        for project, tablename in datalogger.update_search_index(datestring):
+            logging.info("added %s/%s/%s to search index", project, tablename, datestring)
+
+if __name__ == "__main__":
+    yesterday_datestring = (datetime.date.today() - datetime.timedelta(1)).isoformat()
+    parser = argparse.ArgumentParser(description='convert Timeseries cache files into container files')
+    parser.add_argument('--basedir', default="/var/rrd", help="basedirectory of datalogger data on local machine, default : %(default)s")
+    parser.add_argument("-b", '--back', help="how many days back from now")
+    parser.add_argument("-s", '--startdate', help="start date in isoformat YYYY-MM-DD")
+    parser.add_argument("-e", '--enddate', default=yesterday_datestring, help="stop date in isoformat YYYY-MM-DD, default : %(default)s")
+    parser.add_argument("-q", '--quiet', action='store_true', help="set to loglevel ERROR")
+    parser.add_argument("-v", '--verbose', action='store_true', help="set to loglevel DEBUG")
+    parser.add_argument("-p", '--project', help="process only this project name")
+    parser.add_argument("-t", '--tablename', help="process only this tablename")
+    parser.add_argument('--format', default="pack", choices=("pack", "pack.zlib"), help="format of container file, default : %(default)s")
+    parser.add_argument("-d", '--delete', action="store_true", help="delete single Timeseries and TimeseriesStats files after conversion")
+    args = parser.parse_args()
+    if args.quiet is True:
+        logging.getLogger("").setLevel(logging.ERROR)
+    if args.verbose is True:
+        logging.getLogger("").setLevel(logging.DEBUG)
+    logging.debug(args)
+    if (args.back is not None) == (args.startdate is not None):
+        logging.error("option -b and -s are mutual exclusive, use only one")
+        sys.exit(1)
+    startdate = None
+    if args.back is not None:
+        startdate = (datetime.date.today() - datetime.timedelta(int(args.back))).isoformat()
+    elif args.startdate is not None:
+        startdate = args.startdate
+    else:
+        logging.error("you have to provide either -b or -s")
+        sys.exit(1)
+    main()
@@ -4,6 +4,8 @@ import json
 from datalogger4.DataLogger import DataLogger
 from datalogger4.TimeseriesArray import TimeseriesArray
 from datalogger4.TimeseriesArrayStats import TimeseriesArrayStats
+from datalogger4.GroupBy import group_by
+from datalogger4.StatsMerge import merge
 
 def tsa_group_by(tsa, datestring, index_keynames, group_func, interval):
     """
@@ -11,19 +13,25 @@ def tsa_group_by(tsa, datestring, index_keynames, group_func, interval):
     the individual timeseries are automatically grouped by timestamp and interval
     defined in configuration
 
+    if group_func is one of GROUP_FUNCS, whole arrays are aggregated by
+    GroupBy.group_by, otherwise group_func is called for every value
+
     parameters:
     tsa <TimeseriesArray>
     datestring <str> datestring to use to aggregate data TODO: get this from tsa
     subkey <tuple> could also be empty, to aggregate everything
-    group_func <func> like lambda a, b : (a + b) / 2 to get averages
+    group_func <str> one of GROUP_FUNCS like "avg"
+        or <func> like lambda a, b : (a + b) / 2 to get running averages
     interval <int> interval in seconds the timeseries values should appear
 
     returns:
     <TimeseriesArray>
     """
+    start_ts, _ = DataLogger.get_ts_for_datestring(datestring)
+    if isinstance(group_func, str):
+        return group_by(tsa, start_ts, index_keynames, group_func, interval)
     # intermediated tsa
     tsa2 = TimeseriesArray(index_keynames=index_keynames, value_keynames=tsa.value_keynames, ts_key=tsa.ts_key, datatypes=tsa.datatypes)
-    start_ts, _ = DataLogger.get_ts_for_datestring(datestring)
     ts_keyname = tsa.ts_key
     for data in tsa.export():
         # align timestamp
@@ -34,58 +42,30 @@ def tsa_group_by(tsa, datestring, index_keynames, group_func, interval):
 
 def tsastats_group_by(tsastat, index_keynames):
     """
-    group given tsastat array by some subkey
+    group given tsastat array by some subkey, the statistics of every
+    group are the statistics of all values of its Timeseries, merged
+    from stored statistics and partials, see StatsMerge
 
     parameters:
     tsastat <TimeseriesArrayStats>
-    subkey <tuple> subkey to group by
+    subkey <tuple> subkey to group by, empty to aggregate everything to key ("__total__", )
 
     returns:
-    <dict>
+    <TimeseriesArrayStats>
     """
-    # how to aggregate statistical values
-    group_funcs = {
-        u'count' : lambda a, b: a + b,
-        u'std' : lambda a, b: (a + b)/2,
-        u'avg': lambda a, b: (a + b)/2,
-        u'last' : lambda a, b: -1.0, # theres no meaning
-        u'min' : min,
-        u'max' : max,
-        u'sum' : lambda a, b: (a + b) / 2,
-        u'median' : lambda a, b: (a + b)/2,
-        u'mean' : lambda a, b: (a + b)/2,
-        u'diff' : lambda a, b: (a + b)/2,
-        u'dec' : lambda a, b: (a + b)/2,
-        u'inc' : lambda a, b: (a + b)/2,
-        u'first' : lambda a, b: -1.0, # theres no meaning
-    }
-    # create new empty TimeseriesArrayStats Object
-    #tsastats_new = TimeseriesArrayStats.__new__(TimeseriesArrayStats)
-    #tsastats_new.index_keynames = index_keynames # only subkey
-    #tsastats_new.value_keynames = tsastat.value_keynames # same oas original
-    newdata = {}
-    for index_key, tsstat in tsastat.items():
-        key_dict = dict(zip(tsastat.index_keynames, index_key))
-        newkey = None
-        if len(index_keynames) == 0: # no subkey means total aggregation
-            newkey = ("__total__", )
-        else:
-            newkey = tuple([key_dict[key] for key in index_keynames])
-        if newkey not in newdata:
-            newdata[newkey] = {}
-        for value_keyname in tsastat.value_keynames:
-            if value_keyname not in newdata[newkey]:
-                newdata[newkey][value_keyname] = dict(tsstat[value_keyname])
-            else:
-                for stat_funcname in tsstat[value_keyname].keys():
-                    existing = float(newdata[newkey][value_keyname][stat_funcname])
-                    to_group = float(tsstat[value_keyname][stat_funcname])
-                    newdata[newkey][value_keyname][stat_funcname] = group_funcs[stat_funcname](existing, to_group)
-
+    keys = list(tsastat.keys())
+    if len(index_keynames) == 0: # no subkey means total aggregation
+        group_keys = [("__total__", )] * len(keys)
+    else:
+        group_keys = []
+        for index_key in keys:
+            key_dict = dict(zip(tsastat.index_keynames, index_key))
+            group_keys.append(tuple([key_dict[key] for key in index_keynames]))
+    merged = merge([tsastat[key] for key in keys], group_keys, tsastat.value_keynames)
     tsastats_data = [
         index_keynames,
         tsastat.value_keynames,
-        [(key, data) for key, data in newdata.items()]
+        [(key, dict(stats, __partials__=partials)) for key, (stats, partials) in merged.items()]
     ]
     tsastats = TimeseriesArrayStats.from_json(json.dumps(tsastats_data))
     return tsastats
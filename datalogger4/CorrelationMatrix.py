@@ -1,7 +1,30 @@
 #!/usr/bin/pypy
 # pylint: disable=line-too-long
+"""
+distance of value distributions of all Timeseries of one value_key
+
+the distance of two series is get_mse_sorted_norm, the mean squared
+error of both sorted series, normalized by the maximum of the first one.
+Like the former pairwise implementation, the series of the key later
+in tsa.keys() is the first one.
+
+every series is sorted once, with ||a||^2 + ||b||^2 - 2 a.b the mean
+squared errors of all pairs are computed in blocks of rows with one
+matrix multiplication each, blocks are distributed to a process pool
+if workers > 1. Series of different length are not compared.
+
+the symmetric result is stored as lower triangle with diagonal in
+numpy format, NaN for pairs not compared
+"""
+import ast
+import io
 import json
 import logging
+import concurrent.futures
+# non std
+import numpy
+
+BLOCK_ROWS = 256 # rows of distance matrix computed in one matrix multiplication
 
 def get_mse(series1, series2):
     """
@@ -62,13 +85,121 @@ def get_mse_sorted_norm(series1, series2):
     return mse
 
 
+def get_sorted(series_list):
+    """
+    sort every series once and return what is needed to compare them
+
+    parameters:
+    series_list <list> of series, all of same length
+
+    returns:
+    <numpy.ndarray> shape (series, length) sorted values
+    <numpy.ndarray> shape (series, ) maximum of every series
+    <numpy.ndarray> shape (series, ) sum of squares of every series
+    """
+    rows = numpy.sort(numpy.array(series_list, dtype=numpy.float64).reshape((len(series_list), -1)), axis=1)
+    maxima = rows[:, -1] if rows.shape[1] else numpy.zeros(len(rows))
+    return rows, maxima, numpy.einsum("ij,ij->i", rows, rows)
+
+
+def get_distance_rows(rows, maxima, norms, start, stop):
+    """
+    return get_mse_sorted_norm of series start to stop as first series
+    and all series before stop as second series
+
+    parameters:
+    rows, maxima, norms <numpy.ndarray> returned by get_sorted
+    start <int>
+    stop <int>
+
+    returns:
+    <numpy.ndarray> shape (stop - start, stop)
+    """
+    length = rows.shape[1]
+    block = norms[start:stop, numpy.newaxis] + norms[numpy.newaxis, :stop] - 2.0 * (rows[start:stop] @ rows[:stop].T)
+    numpy.maximum(block, 0.0, out=block) # rounding errors of nearly equal series
+    block_maxima = maxima[start:stop, numpy.newaxis]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        block = numpy.where(block_maxima == 0.0, norms[numpy.newaxis, :stop], block / (block_maxima * block_maxima)) / length
+    for row in range(stop - start): # series compared with itself
+        if maxima[start + row] != 0.0:
+            block[row, start + row] = 0.0
+    return block
+
+
+_worker_data = None # rows, maxima, norms of process pool worker
+
+def _init_worker(rows, maxima, norms):
+    """initializer of process pool, data is transferred once per process"""
+    global _worker_data
+    _worker_data = (rows, maxima, norms)
+
+def _get_distance_rows_worker(start, stop):
+    return get_distance_rows(*_worker_data, start, stop)
+
+
+def get_distance_matrix(series_list, workers=1, block_rows=BLOCK_ROWS):
+    """
+    return symmetric matrix of get_mse_sorted_norm of all pairs of series,
+    the later series of every pair is normalized by its maximum
+
+    parameters:
+    series_list <list> of series
+    workers <int> number of processes, 1 computes in this process
+    block_rows <int> rows computed at once
+
+    returns:
+    <numpy.ndarray> shape (series, series), NaN for series of different length
+    """
+    matrix = numpy.full((len(series_list), len(series_list)), numpy.nan)
+    groups = {}
+    for index, series in enumerate(series_list):
+        groups.setdefault(len(series), []).append(index)
+    for length, indices in groups.items():
+        if length == 0:
+            continue
+        rows, maxima, norms = get_sorted([series_list[index] for index in indices])
+        blocks = [(start, min(start + block_rows, len(indices))) for start in range(0, len(indices), block_rows)]
+        if workers > 1 and len(blocks) > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rows, maxima, norms)) as executor:
+                results = list(executor.map(_get_distance_rows_worker, *zip(*blocks)))
+        else:
+            results = [get_distance_rows(rows, maxima, norms, start, stop) for start, stop in blocks]
+        lower = numpy.zeros((len(indices), len(indices)))
+        for (start, stop), block in zip(blocks, results):
+            lower[start:stop, :stop] = block
+        lower = numpy.tril(lower)
+        positions = numpy.array(indices)
+        matrix[numpy.ix_(positions, positions)] = lower + numpy.tril(lower, -1).T
+    return matrix
+
+
+def to_condensed(matrix):
+    """return lower triangle with diagonal of symmetric matrix as flat array"""
+    return matrix[numpy.tril_indices(len(matrix))]
+
+
+def from_condensed(condensed, size):
+    """return symmetric matrix of lower triangle returned by to_condensed"""
+    matrix = numpy.empty((size, size))
+    rows, cols = numpy.tril_indices(size)
+    matrix[rows, cols] = condensed
+    matrix[cols, rows] = condensed
+    return matrix
+
+
 class CorrelationMatrixArray(object):
 
-    def __init__(self, tsa):
+    def __init__(self, tsa, workers=1):
+        """
+        parameters:
+        tsa <TimeseriesArray>
+        workers <int> number of processes used by every CorrelationMatrix
+        """
         self.__data = {}
         for value_keyname in tsa.value_keynames:
             logging.info("calculating value_key %s", value_keyname)
-            self.__data[value_keyname] = CorrelationMatrix(tsa, value_keyname)
+            self.__data[value_keyname] = CorrelationMatrix(tsa, value_keyname, workers=workers)
 
     def __eq__(self, other):
         try:
@@ -88,75 +219,128 @@ class CorrelationMatrixArray(object):
         return self.__data.keys()
 
     def dump(self, filehandle):
-        data = dict(((key, self.__data[key].dumps()) for key in self.__data.keys()))
-        json.dump(data, filehandle)
+        """
+        store all matrices in numpy npz format
+
+        parameters:
+        filehandle <file> opened in binary mode
+        """
+        value_keynames = list(self.__data.keys())
+        arrays = dict((("matrix_%d" % index, to_condensed(self.__data[value_keyname].matrix)) for index, value_keyname in enumerate(value_keynames)))
+        meta = {
+            "value_keynames" : value_keynames,
+            "keys" : [[list(key) for key in self.__data[value_keyname].keys()] for value_keyname in value_keynames]
+        }
+        numpy.savez(filehandle, meta=numpy.array(json.dumps(meta)), **arrays)
         filehandle.flush()
 
     @staticmethod
     def load(filehandle):
+        """
+        load matrices stored by dump, without unpickling, json files
+        stored by former versions are also accepted
+
+        parameters:
+        filehandle <file> opened in binary mode
+        """
         cma = CorrelationMatrixArray.__new__(CorrelationMatrixArray)
-        data = json.load(filehandle)
-        cma.__data = dict(((key, CorrelationMatrix.loads(data)) for key, data in data.items()))
+        cma.__data = {}
+        raw = filehandle.read()
+        if not raw.startswith(b"PK"): # no zip archive, former json format
+            cma.__data = dict(((key, CorrelationMatrix.loads(data)) for key, data in json.loads(raw).items()))
+            return cma
+        with numpy.load(io.BytesIO(raw), allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            for index, value_keyname in enumerate(meta["value_keynames"]):
+                keys = [tuple(key) for key in meta["keys"][index]]
+                cma.__data[value_keyname] = CorrelationMatrix.from_matrix(keys, from_condensed(data["matrix_%d" % index], len(keys)))
         return cma
 
 
 class CorrelationMatrix(object):
 
-    def __init__(self, tsa, value_key):
-        self.__data = self.__get_correlation_matrix(tsa, value_key)
+    def __init__(self, tsa, value_key, workers=1):
+        """
+        parameters:
+        tsa <TimeseriesArray>
+        value_key <str>
+        workers <int> number of processes, 1 computes in this process
+        """
+        logging.info("Searching for correlation in value_key %s)", value_key)
+        self.__keys = tuple(tsa.keys())
+        self.__positions = dict(((key, position) for position, key in enumerate(self.__keys)))
+        self.__matrix = get_distance_matrix([tsa[key][value_key] for key in self.__keys], workers=workers)
+
+    @staticmethod
+    def from_matrix(keys, matrix):
+        """
+        create from already computed distances
+
+        parameters:
+        keys <list> of <tuple>
+        matrix <numpy.ndarray> shape (keys, keys), NaN if not compared
+        """
+        cm = CorrelationMatrix.__new__(CorrelationMatrix)
+        cm.__keys = tuple(keys)
+        cm.__positions = dict(((key, position) for position, key in enumerate(cm.__keys)))
+        cm.__matrix = matrix
+        return cm
+
+    @property
+    def matrix(self):
+        """symmetric distance matrix, in order of keys()"""
+        return self.__matrix
 
     @property
     def data(self):
-        return self.__data
+        """nested <dict> key -> otherkey -> distance, of compared keys only"""
+        return dict(((key, self[key]) for key in self.__keys))
 
     def __eq__(self, other):
         try:
-            assert self.__data == other.data
+            assert self.__keys == tuple(other.keys())
+            assert numpy.array_equal(self.__matrix, other.matrix, equal_nan=True)
             return True
         except AssertionError as exc:
             logging.exception(exc)
-            logging.debug("self keys : %s, other keys : %s", self.__data.keys(), other.data.keys())
+            logging.debug("self keys : %s, other keys : %s", self.__keys, other.keys())
         return False
 
     def __getitem__(self, key):
-        if isinstance(key, tuple):
-            return self.__data[key[0]][key[1]]
-        else:
-            return self.__data[key]
+        if isinstance(key, tuple) and len(key) == 2 and key[0] in self.__positions and key[1] in self.__positions:
+            value = self.__matrix[self.__positions[key[0]], self.__positions[key[1]]]
+            if value != value: # NaN
+                raise KeyError("%s and %s are not compared, series are not of same length" % key)
+            return float(value)
+        row = self.__matrix[self.__positions[key]].tolist()
+        return dict(((otherkey, value) for otherkey, value in zip(self.__keys, row) if value == value))
 
     def keys(self):
-        return self.__data.keys()
-
-    @staticmethod
-    def __get_correlation_matrix(tsa, value_key):
-        """
-        search for corelating series in all other series available
-        """
-        logging.info("Searching for correlation in value_key %s)", value_key)
-        matrix = {}
-        keylist = tsa.keys()
-        for key in keylist:
-            series = tsa[key][value_key]
-            matrix[key] = {}
-            for otherkey in keylist:
-                try:
-                    matrix[key][otherkey]
-                except KeyError:
-                    if otherkey not in matrix:
-                        matrix[otherkey] = {}
-                    other = tsa[otherkey][value_key]
-                    if len(series) == len(other):
-                        matrix[key][otherkey] = get_mse_sorted_norm(series, other)
-                        matrix[otherkey][key] = matrix[key][otherkey]
-                    else:
-                        logging.info("skipping, dataseries are not of same length")
-        return matrix
+        return self.__keys
 
     def dumps(self):
-        return json.dumps(str(self.__data))
+        """return json encoded string of keys and lower triangle"""
+        return json.dumps({
+            "keys" : [list(key) for key in self.__keys],
+            "matrix" : [None if value != value else value for value in to_condensed(self.__matrix).tolist()]
+        })
 
     @staticmethod
     def loads(data):
-        cm = CorrelationMatrix.__new__(CorrelationMatrix)
-        cm.__data = eval(json.loads(data))
-        return cm
+        """
+        recreate from dumps output, or from nested dict stored by
+        former versions, only literals are evaluated
+        """
+        data = json.loads(data)
+        if isinstance(data, str): # former format, str() of nested dict
+            nested = ast.literal_eval(data)
+            keys = list(nested.keys())
+            positions = dict(((key, position) for position, key in enumerate(keys)))
+            matrix = numpy.full((len(keys), len(keys)), numpy.nan)
+            for key, row in nested.items():
+                for otherkey, value in row.items():
+                    matrix[positions[key], positions[otherkey]] = value
+            return CorrelationMatrix.from_matrix(keys, matrix)
+        keys = [tuple(key) for key in data["keys"]]
+        condensed = numpy.array([numpy.nan if value is None else value for value in data["matrix"]], dtype=numpy.float64)
+        return CorrelationMatrix.from_matrix(keys, from_condensed(condensed, len(keys)))
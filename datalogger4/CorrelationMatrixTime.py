@@ -7,9 +7,21 @@ useful to identify some major differences,
 by watching on the Timeseries with the highest MSE values
 
 MSE - Mean Squared Error
+
+compare() computes get_mse_sorted_norm_missing of all keys and
+value_keynames of two TimeseriesArray at once, pairs of series with the
+same lengths are sorted and compared in one array operation, in batches
+of BATCH_KEYS keys
 """
+import ast
 import json
 import logging
+# non std
+import numpy
+# own modules
+from datalogger4.Rollup import get_matrix
+
+BATCH_KEYS = 1024 # keys compared at once
 
 
 def get_mse(series1, series2):
@@ -99,6 +111,62 @@ def get_mse_sorted_norm_missing(series1, series2):
     return mse
 
 
+def get_distances(pairs):
+    """
+    get_mse_sorted_norm_missing of many pairs of series at once,
+    pairs with equal lengths are compared in one array operation
+
+    parameters:
+    pairs <list> of (<numpy.ndarray>, <numpy.ndarray>)
+
+    returns:
+    <numpy.ndarray> shape (pairs, ), NaN if series are empty or
+        their length differs 10 percent or more
+    """
+    distances = numpy.full(len(pairs), numpy.nan)
+    groups = {}
+    for index, (series1, series2) in enumerate(pairs):
+        groups.setdefault((len(series1), len(series2)), []).append(index)
+    for (length1, length2), indices in groups.items():
+        if not length1 or not length2 or abs(length1 - length2) / max(length1, length2) >= 0.1:
+            logging.debug("%d pairs of series with length %d and %d are not comparable, skipping", len(indices), length1, length2)
+            continue
+        rows1 = -numpy.sort(-numpy.array([pairs[index][0] for index in indices], dtype=numpy.float64), axis=1) # descending
+        rows2 = -numpy.sort(-numpy.array([pairs[index][1] for index in indices], dtype=numpy.float64), axis=1)
+        length = min(length1, length2)
+        diff = rows1[:, :length] - rows2[:, :length]
+        maxima = rows1[:, 0]
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            distances[indices] = numpy.where(maxima == 0.0, numpy.einsum("ij,ij->i", rows2, rows2), numpy.einsum("ij,ij->i", diff, diff) / (maxima * maxima)) / length1
+    return distances
+
+def compare(tsa1, tsa2, value_keynames=None):
+    """
+    get_mse_sorted_norm_missing of every key in both TimeseriesArray,
+    tsa1 is the newer one, normalized by its maximum
+
+    parameters:
+    tsa1 <TimeseriesArray>
+    tsa2 <TimeseriesArray>
+    value_keynames <list> default all value_keynames of both
+
+    returns:
+    <list> of keys in tsa1 and tsa2, in order of tsa1
+    <numpy.ndarray> shape (keys, value_keynames), NaN if not comparable
+    """
+    if value_keynames is None:
+        value_keynames = [value_keyname for value_keyname in tsa1.value_keynames if value_keyname in tsa2.value_keynames]
+    keys2 = set(tsa2.keys())
+    keys = [key for key in tsa1.keys() if key in keys2]
+    logging.info("comparing %d keys, %d keys not in older TSA", len(keys), len(tsa1.keys()) - len(keys))
+    distances = numpy.full((len(keys), len(value_keynames)), numpy.nan)
+    for start in range(0, len(keys), BATCH_KEYS):
+        batch = [(get_matrix(tsa1[key], value_keynames)[1], get_matrix(tsa2[key], value_keynames)[1]) for key in keys[start:start + BATCH_KEYS]]
+        for index, _ in enumerate(value_keynames):
+            distances[start:start + len(batch), index] = get_distances([(values1[index], values2[index]) for values1, values2 in batch])
+    return keys, distances
+
+
 class CorrelationMatrixTimeWeb(object):
     """
     for all available Timeseries Objects in TimeseriesArray
@@ -156,7 +224,7 @@ class CorrelationMatrixTimeWeb(object):
             if key_str not in caches2["ts"]["keys"]:
                 logging.debug("key %s is not in older tsa, skipping", str(key_str))
                 continue
-            key = eval(key_str)
+            key = ast.literal_eval(key_str)
             other = self.__dataloggerweb.get_ts(self.__project, self.__tablename, self.__datestring2, key)[key]
             series = self.__dataloggerweb.get_ts(self.__project, self.__tablename, self.__datestring1, key)[key]
             matrix[key] = get_mse_sorted_norm_missing(series[self.__value_key], other[self.__value_key])
@@ -169,8 +237,8 @@ class CorrelationMatrixTimeWeb(object):
     @staticmethod
     def loads(data):
         """recreating object from jason encoded data"""
-        cm = CorrelationMatrixTime.__new__(CorrelationMatrixTime)
-        cm.__data = eval(json.loads(data))
+        cm = CorrelationMatrixTimeWeb.__new__(CorrelationMatrixTimeWeb)
+        cm.__data = ast.literal_eval(json.loads(data))
         return cm
 
 
@@ -181,11 +249,37 @@ class CorrelationMatrixTime(object):
 
     to detect anomalities in usage over time
 
-    this version works with native DataLogger API, on DataLogger Server
+    this version works with native DataLogger API, on DataLogger Server,
+    use DataLogger.load_correlation_time to get cached results
     """
 
     def __init__(self, tsa1, tsa2, value_key):
-        self.__data = self.__get_correlation_matrix(tsa1, tsa2, value_key)
+        """
+        parameters:
+        tsa1 <TimeseriesArray> the newer one
+        tsa2 <TimeseriesArray> the older one
+        value_key <str>
+        """
+        logging.info("Searching for correlation in value_key %s)", value_key)
+        keys, distances = compare(tsa1, tsa2, (value_key, ))
+        self.__data = self.__to_dict(keys, distances[:, 0])
+
+    @staticmethod
+    def __to_dict(keys, distances):
+        return dict(((key, float(distance)) for key, distance in zip(keys, distances) if distance == distance)) # without NaN
+
+    @staticmethod
+    def from_distances(keys, distances):
+        """
+        create from result of compare()
+
+        parameters:
+        keys <list> of <tuple>
+        distances <numpy.ndarray> shape (keys, ), NaN if not compared
+        """
+        cm = CorrelationMatrixTime.__new__(CorrelationMatrixTime)
+        cm.__data = CorrelationMatrixTime.__to_dict(keys, distances)
+        return cm
 
     @property
     def data(self):
@@ -212,27 +306,24 @@ class CorrelationMatrixTime(object):
     def items(self):
         return self.__data.items()
 
-    @staticmethod
-    def __get_correlation_matrix(tsa1, tsa2, value_key):
+    def top(self, count=None):
         """
-        search for correlating series in all other series available
+        return keys with highest MSE first
+
+        parameters:
+        count <int> number of keys, default all
+
+        returns:
+        <list> of (key, mse)
         """
-        logging.info("Searching for correlation in value_key %s)", value_key)
-        matrix = {}
-        for key in tsa1.keys():
-            other = None
-            if key in tsa2.keys():
-                matrix[key] = get_mse_sorted_norm_missing(tsa1[key][value_key], tsa2[key][value_key])
-            else:
-                logging.debug("skipping %s key not in older TSA", key)
-        return matrix
+        return sorted(self.__data.items(), key=lambda item: item[1], reverse=True)[:count]
 
     def dumps(self):
         return json.dumps(str(self.__data))
 
     @staticmethod
     def loads(data):
-        cm = CorrelationMatrix.__new__(CorrelationMatrix)
-        cm.__data = eval(json.loads(data))
+        cm = CorrelationMatrixTime.__new__(CorrelationMatrixTime)
+        cm.__data = ast.literal_eval(json.loads(data))
         return cm
 
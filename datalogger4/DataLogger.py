@@ -5,6 +5,7 @@ Module to handle global DataLogger things, like reading from raw data,
 dumping cache files, and so on
 """
 import os
+import re
 import glob
 import json
 import logging
@@ -14,16 +15,34 @@ import time
 import gzip
 import pwd
 import shutil
+import copy
+import collections
+import concurrent.futures
 # non std
 import yaml
+import numpy
 # own modules
 from datalogger4.TimeseriesArray import TimeseriesArray
 from datalogger4.TimeseriesArrayStats import TimeseriesArrayStats
+from datalogger4.TimeseriesPack import TimeseriesPack
+from datalogger4.KeyIndex import KeyIndex
 from datalogger4.TimeseriesStats import TimeseriesStats
 from datalogger4.Quantile import QuantileArray
+from datalogger4.CorrelationMatrixTime import CorrelationMatrixTime, compare
+from datalogger4.GroupBy import group_by
+from datalogger4.StatsMerge import merge
+from datalogger4.TimeseriesColumnar import TimeseriesColumnar
+from datalogger4.SearchIndex import SearchIndex
+from datalogger4.LongtimeStats import LongtimeStats
+from datalogger4.Rollup import Rollup, TIERS
 from datalogger4.CustomExceptions import *
-from datalogger4.b64 import b64eval
-from datalogger4.FastTsa import fast_tsa
+from datalogger4.b64 import b64eval, b64encode
+from datalogger4.FastTsa import fast_tsa, get_tsa
+from datalogger4.ObjectCache import ObjectCache
+
+OBJECT_CACHE_BYTES = 512 * 1024 * 1024 # budget of loaded objects held in memory, for all instances
+_object_cache = ObjectCache(OBJECT_CACHE_BYTES)
+LOAD_WORKERS = 8 # threads loading Timeseries files concurrently in load_ts_many
 
 class DataLogger(object):
     """
@@ -63,7 +82,7 @@ class DataLogger(object):
         self.__timedelta = None
         self.__raw_basedir = None # subdir to project
         self.__meta = None # table_config, old name
-        self.__memcache = None # in memory store
+        self.__context = False # True if returned by table(), could not be set up again
 
     def setup(self, project, tablename, datestring, timedelta=0.0):
         """
@@ -74,6 +93,8 @@ class DataLogger(object):
         datestring <str> some datestring like 2018-12-31 in the past
         timedelta <int> defaults to 0
         """
+        if self.__context:
+            raise AttributeError("table context %s/%s/%s is immutable, use table() to get another one" % (self.__project, self.__tablename, self.__datestring))
         if project not in self.__config["projects"]:
             raise AttributeError("called project %s is not defined in main configuration file" % project)
         if tablename not in self.__config["projects"][project]:
@@ -85,8 +106,7 @@ class DataLogger(object):
         if project == self.__project and tablename == self.__tablename and datestring == self.__datestring and self.__timedelta == timedelta:
             logging.debug("DataLogger already setup for this configuration")
             return
-        # cleanup memcache
-        self.__memcache_init()
+        # loaded objects of other setups stay in object cache
         self.__datestring = datestring
         self.__project = project
         self.__tablename = tablename
@@ -98,18 +118,88 @@ class DataLogger(object):
         self._check_table_config(table_config)
         self.__meta = table_config
 
-    def __memcache_set(self, key, value):
-        """ raises AtributeError if value is None """
-        if value is None:
-            raise AttributeError("None value is not permitted")
-        self.__memcache[key] = value
+    def table(self, project, tablename, datestring, timedelta=0.0):
+        """
+        return new DataLogger set up to this project/tablename/datestring
+        combination, which could not be set up again. Configuration is
+        shared with this instance, loaded objects are shared by all
+        instances via the process wide object cache. Use one context
+        per request in concurrent threads, instead of calling setup()
+        of one shared instance.
+
+        parameters:
+        project <str> has to be in defined projects
+        tablename <str> has to be in defined tablenames of project
+        datestring <str> some datestring like 2018-12-31 in the past
+        timedelta <int> defaults to 0
+
+        returns:
+        <DataLogger>
+        """
+        context = copy.copy(self)
+        context.__context = False
+        context.setup(project, tablename, datestring, timedelta)
+        context.__context = True
+        return context
+
+    @property
+    def is_context(self):
+        """True if returned by table()"""
+        return self.__context
+
+    def __memcache_key(self, kind=None):
+        """key of loaded object in process wide object cache, without kind prefix of this setup"""
+        prefix = (os.path.abspath(self.__cachedir), self.__project, self.__tablename, self.__datestring, self.__timedelta)
+        return prefix if kind is None else prefix + (kind, )
 
-    def __memcache_get(self, key):
-        """ raises KeyError if key does not exist """
-        return self.__memcache[key]
+    def __memcache_version(self):
+        """modification time of cache directory, changes if cache files are created or deleted"""
+        return self.get_cache_version(self.__project, self.__tablename, self.__datestring)
+
+    def get_cache_version(self, project, tablename, datestring):
+        """
+        return modification time of cache directory of this table-day,
+        which changes everytime cache files are created, replaced or
+        deleted, so data derived from caches could be validated without
+        loading it. setup() is not necessary.
+
+        parameters:
+        project <str>
+        tablename <str>
+        datestring <str>
+
+        returns:
+        <int> nanoseconds since epoch or None if there are no caches
+        """
+        try:
+            return os.stat(os.path.join(self.__cachedir, datestring, project, tablename)).st_mtime_ns
+        except OSError:
+            return None
+
+    def __memcache_load(self, key, loader):
+        """
+        return loaded object from object cache, or call loader and store
+        its result, raises AttributeError if loader returns None
+        """
+        def load():
+            value = loader()
+            if value is None:
+                raise AttributeError("None value is not permitted")
+            return value
+        return _object_cache.get_or_load(self.__memcache_key(key), load, self.__memcache_version())
+
+    def __memcache_resize(self, key):
+        """estimate size again, after data was loaded on demand"""
+        _object_cache.resize(self.__memcache_key(key))
 
     def __memcache_init(self):
-        self.__memcache = {}
+        """drop all loaded objects of this setup"""
+        _object_cache.invalidate(self.__memcache_key())
+
+    @property
+    def object_cache(self):
+        """process wide ObjectCache of loaded objects"""
+        return _object_cache
 
     def __str__(self):
         ret = {
@@ -373,6 +463,39 @@ class DataLogger(object):
             logging.error("User %s does not exist on this systemi, default permission will be applied to created directories", username)
         return subdir
 
+    @property
+    def derived_cachedir(self):
+        """
+        return directory to store data derived lazily from caches, like
+        grouped TimeseriesArrays, next to cachedir. Files stored there do
+        not change the cache version of this table-day, their names
+        contain the cache versions they are derived from instead.
+        if this directory does not exist, it will be created
+
+        returns:
+        <str> directory path
+        """
+        subdir = os.path.join(self.__cachedir, self.datestring, self.project, "%s.derived" % self.tablename)
+        os.makedirs(subdir, exist_ok=True)
+        return subdir
+
+    def __delete_outdated_derived(self, prefix, current):
+        """delete derived files or directories named prefix and other cache versions than current"""
+        pattern = re.compile(re.escape(prefix) + r"[0-9_]+(\.json)?")
+        for entry in os.listdir(self.derived_cachedir):
+            if entry != current and pattern.fullmatch(entry):
+                logging.debug("deleting outdated derived cache %s", entry)
+                absfile = os.path.join(self.derived_cachedir, entry)
+                if os.path.isdir(absfile):
+                    shutil.rmtree(absfile)
+                else:
+                    os.unlink(absfile)
+
+    @property
+    def longtime_stats(self):
+        """LongtimeStats of this table and year of datestring"""
+        return LongtimeStats(LongtimeStats.get_path(self.__cachedir, self.project, self.tablename), self.datestring[:4])
+
     @property
     def interval(self):
         """return defined interval of timestamps defined in configuration"""
@@ -406,61 +529,25 @@ class DataLogger(object):
         ["qa", <key>] -> return <dict> Quantile
         ["total_stats"] -> return <dict> total_stats
         """
+        loaders = {
+            "tsa" : self.load_tsa,
+            "tsastats" : self.load_tsastats,
+            "qa" : self.load_quantile,
+            "caches" : self.get_caches,
+            "total_stats" : self.load_total_stats
+        }
         if isinstance(args[0], str):
             kind = args[0]
-            if kind == "tsa":
-                try:
-                    return self.__memcache_get("tsa")
-                except KeyError:
-                    self.__memcache_set("tsa", self.load_tsa())
-                    return self.__memcache_get("tsa")
-            if kind == "tsastats":
-                try:
-                    return self.__memcache_get("tsastats")
-                except KeyError:
-                    self.__memcache_set("tsastats", self.load_tsastats())
-                    return self.__memcache_get("tsastats")
-            if kind == "qa":
-                try:
-                    return self.__memcache_get("qa")
-                except KeyError:
-                    self.__memcache_set("qa", self.load_quantile())
-                    return self.__memcache_get("qa")
-            if kind == "caches":
-                try:
-                    return self.__memcache_get("caches")
-                except KeyError:
-                    self.__memcache_set("caches", self.get_caches())
-                    return self.__memcache_get("caches")
-            if kind == "total_stats":
-                try:
-                    return self.__memcache_get("total_stats")
-                except KeyError:
-                    self.__memcache_set("total_stats", self.load_total_stats())
-                    return self.__memcache_get("total_stats")
+            if kind in loaders:
+                return self.__memcache_load(kind, loaders[kind])
         elif isinstance(args[0], tuple):
             kind, subkey = args[0]
-            if kind == "tsa":
-                try:
-                    tsa = self.__memcache_get("tsa")
-                except KeyError:
-                    tsa = self.load_tsa()
-                    self.__memcache_set("tsa", tsa)
-                return tsa[subkey]
-            if kind == "tsastats":
-                try:
-                    tsastats = self.__memcache_get("tsastats")
-                except KeyError:
-                    tsastats = self.load_tsastats()
-                    self.__memcache_set("tsastats", tsastats)
-                return tsastats[subkey]
+            if kind in ("tsa", "tsastats"):
+                data = self.__memcache_load(kind, loaders[kind])[subkey] # maybe loaded on demand
+                self.__memcache_resize(kind)
+                return data
             if kind == "qa":
-                try:
-                    qa = self.__memcache_get("qa")
-                except KeyError:
-                    qa = self.load_quantile()
-                    self.__memcache_set("qa", qa)
-                return qa[subkey]
+                return self.__memcache_load(kind, loaders[kind])[subkey]
         raise KeyError("unknown datatype")
 
     def __parse_line(self, row):
@@ -562,20 +649,29 @@ class DataLogger(object):
         """delete pre calculates caches"""
         rawfilename = self.__get_raw_filename()
         if rawfilename is not None:
-            pattern_list = ("tsa_", "ts_", "tsastat_", "tsstat_", "quantile.json", "total_stats.json")
+            pattern_list = ("tsa_", "ts_", "tspack_", "keyindex_", "tsastat_", "tsstat_", "rollup", "quantile", "correlation_time_", "group_", "total_stats.json")
         else:
             # raw file is missing, or file is archived
             # in this case do not delete tsa file
-            logging.info("original raw file is missing, tsa_ file and all ts_ files will not be deleted")
-            pattern_list = ("tsastat_", "tsstat_", "quantile.json", "total_stats.json")
+            logging.info("original raw file is missing, tsa_ file and all ts_, tspack_ and keyindex_ files will not be deleted")
+            pattern_list = ("tsastat_", "tsstat_", "rollup", "quantile", "correlation_time_", "group_", "total_stats.json")
         # erase memcache
         self.__memcache_init()
+        # erase data derived from caches
+        derived_cachedir = os.path.join(self.__cachedir, self.datestring, self.project, "%s.derived" % self.tablename)
+        if os.path.isdir(derived_cachedir):
+            shutil.rmtree(derived_cachedir)
         # erase files
         for entry in os.listdir(self.cachedir):
             absfile = os.path.join(self.cachedir, entry)
             if any((entry.startswith(pattern) for pattern in pattern_list)):
                 logging.debug("deleting cached file %s", entry)
-                os.unlink(absfile)
+                if os.path.isdir(absfile): # grouped TimeseriesArray
+                    shutil.rmtree(absfile)
+                else:
+                    os.unlink(absfile)
+        if "tsa_" in pattern_list:
+            SearchIndex.update_file(os.path.join(self.__cachedir, self.datestring), self.project, self.tablename)
 
     def get_caches(self):
         """
@@ -596,7 +692,11 @@ class DataLogger(object):
                 "raw" : None,
             },
             "ts" : {
-                "pattern" : "ts_*.csv.gz",
+                "pattern" : "ts_*", # ts_*.csv.gz, ts_*.bin or ts_*.bin.gz
+                "keys" : {},
+            },
+            "tspack" : {
+                "pattern" : "tspack_*.dat",
                 "keys" : {},
             },
             "tsastat" : {
@@ -604,11 +704,11 @@ class DataLogger(object):
                 "keys" : {},
             },
             "tsstat" : {
-                "pattern" : "tsstat_*.json",
+                "pattern" : "tsastat_*.dat", # former versions tsstat_*.json, listed in tsastat file
                 "keys" : {},
             },
             "quantile" : {
-                "pattern" : "quantile.json",
+                "pattern" : "quantile*", # quantile.npy and quantile_index.json, or older quantile.json
                 "exists" : False,
             },
             "total_stats" : {
@@ -620,51 +720,133 @@ class DataLogger(object):
         # calculated TSA/TSASTATS and so on are available. In this case
         # define None
         caches["tsa"]["raw"] = self.__get_raw_filename() # None if not found
-        for cachetype in ("tsa", "ts", "tsastat", "tsstat"):
+        for cachetype in ("tsa", "ts", "tspack", "tsastat"):
             file_pattern = os.path.join(self.cachedir, caches[cachetype]["pattern"])
             for abs_filename in glob.glob(file_pattern):
                 filename = os.path.basename(abs_filename)
                 key = self.__decode_filename(filename)
                 caches[cachetype]["keys"][str(key)] = filename
+        # Timeseries stored in container files, are listed like single files
+        # with ending .pack, these names are not existing on disk
+        for filename in caches["tspack"]["keys"].values():
+            with TimeseriesPack(os.path.join(self.cachedir, filename)) as pack:
+                for key in pack.keys():
+                    caches["ts"]["keys"][str(key)] = "ts_%s.pack" % b64encode(key)
+        # TimeseriesStats are also stored in one container file, these are
+        # listed like single files, without globbing for tsstat files
+        if TimeseriesArrayStats.get_dumpfilename(self.index_keynames) in caches["tsastat"]["keys"].values():
+            for key, filename in TimeseriesArrayStats.get_stored_keys(self.cachedir, self.index_keynames).items():
+                if filename.endswith(".dat"):
+                    filename = "tsstat_%s.pack" % b64encode(key)
+                caches["tsstat"]["keys"][str(key)] = filename
         # add quantile part
-        caches["quantile"]["exists"] = os.path.isfile(os.path.join(self.cachedir, "quantile.json"))
+        caches["quantile"]["exists"] = QuantileArray.exists(self.cachedir)
         # add total_stats part
         caches["total_stats"]["exists"] = os.path.isfile(os.path.join(self.cachedir, "total_stats.json"))
         return caches
 
-    def generate_caches(self, use_fast=True):
+    def generate_caches(self, use_fast=True, parse_workers=1, fmt="csv", fused=False):
         """
         meant to generate all cached files from scratch (raw input data)
+
+        parameters:
+        use_fast <bool> use fast_tsa to read raw input data
+        parse_workers <int> number of processes fast_tsa uses to parse raw input data
+        fmt <str> format of Timeseries cache files, csv, bin or bin.gz
+        fused <bool> calculate tsastats, quantiles and total_stats from
+            the data fast_tsa parsed in memory, instead of reading the
+            just written Timeseries files again
         """
         logging.info("generate_caches() was called")
         if use_fast:
-            logging.info("calling fast_tsa() - disabled")
-            fast_tsa(self)
-            logging.info("calling load_tsa()")
-            tsa = self.load_tsa()
-            tsa.cache = True
+            logging.info("calling fast_tsa()")
+            raw_tsa = fast_tsa(self, parse_workers=parse_workers, fmt=fmt)
+            if fused and raw_tsa is not None:
+                logging.info("building TimeseriesArray from parsed data")
+                tsa = get_tsa({"index_keys" : self.index_keynames, "value_keys" : self.value_keynames, "ts_key" : self.ts_keyname}, raw_tsa, datatypes=self.datatypes)
+                del raw_tsa # free memory as soon as possible
+                tsa.finalize() # convert Timeseries to Datatypes
+            else:
+                logging.info("calling load_tsa()")
+                tsa = self.load_tsa()
+                tsa.cache = True
         else:
             logging.info("calling load_tsa_raw()")
             tsa = self.load_tsa_raw()
             logging.info("calling tsa.dump()")
-            tsa.dump(self.cachedir) # save full data
+            tsa.dump(self.cachedir, fmt=fmt) # save full data
             tsa.cache = True
             logging.info("calling load_tsa_finalize()")
             tsa.finalize() # convert Timeseries to Datatypes
+        logging.info("updating search index")
+        SearchIndex.update_file(os.path.join(self.__cachedir, self.datestring), self.project, self.tablename, self.index_keynames, tsa.keys())
         logging.info("creating tsastats")
         tsastats = TimeseriesArrayStats(tsa) # calculate
         logging.info("calling tsastats.dump()")
         tsastats.dump(self.cachedir) # store
+        logging.info("adding tsastats to long-range store")
+        self.longtime_stats.add(self.datestring, tsastats)
+        logging.info("creating rollup tiers")
+        Rollup.dump(self.cachedir, tsa)
         logging.info("creating quantile_array")
         quantile_array = QuantileArray(tsa, tsastats) # caclculate
         logging.info("calling quantile_array.dump()")
         quantile_array.dump(self.cachedir) # store
         logging.info("creating total_stats()")
-        self.load_total_stats() # calculate
+        self.load_total_stats(tsastats) # calculate
         logging.info("done generate_caches()")
         # call this methode to refresh cached informations
         self.__memcache_init()
 
+    def load_search_index(self, datestring):
+        """
+        return SearchIndex of all index keys of all projects and tablenames
+        on this datestring. The index is updated by generate_caches, and
+        is held in the process wide object cache until the stored file
+        changes. Tables with caches of former versions are added by
+        update_search_index.
+
+        parameters:
+        datestring <str>
+
+        returns:
+        <SearchIndex>
+        """
+        path = os.path.join(self.__cachedir, datestring)
+        try:
+            stat = os.stat(SearchIndex.get_dumpfilename(path))
+        except OSError: # not created yet
+            return SearchIndex()
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size) # replaced by rename on every update
+        return _object_cache.get_or_load((os.path.abspath(self.__cachedir), "search_index", datestring), lambda: SearchIndex.load(path), version)
+
+    def update_search_index(self, datestring):
+        """
+        add tables with caches, which are not in SearchIndex of this
+        datestring, like caches generated by former versions. This reads
+        the caches of every such table, so it is meant to be called once
+        by maintenance scripts, not while answering requests.
+
+        parameters:
+        datestring <str>
+
+        returns:
+        <list> of (project <str>, tablename <str>) added
+        """
+        path = os.path.join(self.__cachedir, datestring)
+        indexed = SearchIndex.load(path).tables() if SearchIndex.exists(path) else []
+        added = []
+        for project in self.get_projects():
+            for tablename in self.get_tablenames(project):
+                if (project, tablename) in indexed or not glob.glob(os.path.join(path, project, tablename, "tsa_*.json")):
+                    continue
+                logging.info("adding %s/%s to search index of %s", project, tablename, datestring)
+                context = self.table(project, tablename, datestring)
+                keys = [self.__decode_filename(filename) for filename in context.get_caches()["ts"]["keys"].values()]
+                SearchIndex.update_file(path, project, tablename, context.index_keynames, keys)
+                added.append((project, tablename))
+        return added
+
     def raw_to_archive(self, force=False):
         """
         method to archive raw input files to archivepath destination
@@ -781,6 +963,95 @@ class DataLogger(object):
             os.unlink(cachefilename)
             return fallback()
 
+    def load_ts_many(self, keys=None, filterkeys=None, matchtype="and", workers=LOAD_WORKERS):
+        """
+        yield Timeseries of many keys of this setup, loaded concurrently
+        by a bounded pool of threads. Reading and decompressing releases
+        the GIL, so the I/O of several files overlaps. Not more than
+        2 * workers loaded Timeseries are waiting to be consumed.
+
+        parameters:
+        keys <list> of <tuple> index keys, default all keys or keys matching filterkeys
+        filterkeys <dict> see KeyIndex for possible conditions
+        matchtype <str> default "and"
+        workers <int> number of threads
+
+        returns:
+        <generator> of (key <tuple>, <Timeseries>) in order of keys
+        """
+        tsa = self["tsa"]
+        if keys is None:
+            path = os.path.join(self.__cachedir, self.__datestring, self.__project, self.__tablename)
+            if filterkeys is None:
+                keys = list(tsa.keys())
+            elif KeyIndex.exists(path, self.index_keynames):
+                keys = KeyIndex.load(path, self.index_keynames).filter(filterkeys, matchtype)
+            else:
+                keys = [key for key in tsa.keys() if KeyIndex.filtermatch(tsa.get_index_dict(key), filterkeys, matchtype)]
+        keys = [tuple(key) for key in keys]
+        missing = [key for key in keys if key not in tsa.keys()]
+        if missing:
+            raise KeyError("keys %s not found" % missing[:10])
+        if tsa.pack is not None:
+            tsa.pack.prefetch(keys)
+        def loader():
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = collections.deque()
+                try:
+                    for key in keys:
+                        futures.append((key, executor.submit(tsa.__getitem__, key)))
+                        if len(futures) >= 2 * workers:
+                            key, future = futures.popleft()
+                            yield key, future.result()
+                    while futures:
+                        key, future = futures.popleft()
+                        yield key, future.result()
+                finally: # consumer stopped early
+                    for _, future in futures:
+                        future.cancel()
+            self.__memcache_resize("tsa")
+        return loader()
+
+    def load_tsa_grouped(self, index_keynames, group_func="avg", cache=True):
+        """
+        return TimeseriesArray grouped by some of index_keynames, every
+        Timeseries aligned to interval of this table and aggregated with
+        group_func, see GroupBy
+
+        if cache is True, the grouped TimeseriesArray is stored in directory
+        group_<group_func>_<b64 index_keynames>_<cache version> of
+        derived_cachedir and loaded from there afterwards
+
+        parameters:
+        index_keynames <tuple> subset of index_keynames, empty to aggregate everything
+        group_func <str> one of GroupBy.GROUP_FUNCS
+        cache <bool> store grouped TimeseriesArray in cache directory
+
+        returns:
+        <TimeseriesArray> of <TimeseriesColumnar>
+        """
+        index_keynames = tuple(index_keynames)
+        prefix = "group_%s_%s_" % (group_func, b64encode(index_keynames))
+        def loader():
+            outdir = os.path.join(self.derived_cachedir, "%s%s" % (prefix, self.__memcache_version()))
+            if cache and os.path.isfile(os.path.join(outdir, TimeseriesArray.get_dumpfilename(index_keynames))):
+                logging.debug("loading grouped TimeseriesArray from %s", outdir)
+                # values are already converted to datatypes
+                return TimeseriesArray.load(outdir, index_keynames, datatypes={}, timeseries_class=TimeseriesColumnar)
+            tsa = group_by(self["tsa"], self.get_ts_for_datestring(self.datestring)[0], index_keynames, group_func, self.interval)
+            if cache:
+                # caches could be generated now
+                outdir = os.path.join(self.derived_cachedir, "%s%s" % (prefix, self.__memcache_version()))
+                logging.info("storing grouped TimeseriesArray in %s", outdir)
+                os.makedirs(outdir + ".tmp", exist_ok=True)
+                tsa.dump(outdir + ".tmp", fmt="pack")
+                if os.path.isdir(outdir):
+                    shutil.rmtree(outdir)
+                os.rename(outdir + ".tmp", outdir)
+                self.__delete_outdated_derived(prefix, os.path.basename(outdir))
+            return tsa
+        return self.__memcache_load(("tsa_grouped", index_keynames, group_func), loader)
+
     def load_tsastats(self, filterkeys=None):
         """
         caching version to load_tsa_raw
@@ -825,7 +1096,7 @@ class DataLogger(object):
         """
         cachefilename = QuantileArray.get_dumpfilename(self.cachedir)
         quantile_array = None
-        if os.path.isfile(cachefilename):
+        if QuantileArray.exists(self.cachedir):
             quantile_array = QuantileArray.load(self.cachedir)
         else:
             logging.info("cachefile %s does not exist, fallback read from tsa archive", cachefilename)
@@ -837,52 +1108,82 @@ class DataLogger(object):
             quantile_array.dump(self.cachedir)
         return quantile_array
 
+    def load_correlation_time(self, datestring, value_keyname):
+        """
+        return MSE of every key of this table-day compared to the same key
+        on datestring, like the same day one week ago. All value_keynames
+        are compared at once and cached in derived_cachedir of this day,
+        in correlation_time_<datestring>_<version>_<version of datestring>.json,
+        so the cache is recalculated if caches of either day change.
+
+        :param datestring <str>: other day to compare to
+        :param value_keyname <str>:
+        :return <CorrelationMatrixTime>:
+        """
+        version = self.get_cache_version(self.project, self.tablename, datestring)
+        loader = lambda: self.__load_correlation_time(datestring, version)
+        return self.__memcache_load(("correlation_time", datestring, version), loader)[value_keyname]
+
+    def __load_correlation_time(self, datestring, version):
+        """
+        return <dict> value_keyname -> CorrelationMatrixTime, from cache
+        file if stored with both versions, otherwise calculated and stored
+        """
+        prefix = "correlation_time_%s_" % datestring
+        cachefilename = os.path.join(self.derived_cachedir, "%s%s_%s.json" % (prefix, self.__memcache_version(), version))
+        if version is not None and os.path.isfile(cachefilename):
+            with open(cachefilename, "rt") as infile:
+                data = json.load(infile)
+            keys = [tuple(key) for key in data["keys"]]
+            distances = numpy.array([[numpy.nan if value is None else value for value in row] for row in data["distances"]], dtype=numpy.float64).reshape((len(keys), len(data["value_keynames"])))
+            return dict(((value_keyname, CorrelationMatrixTime.from_distances(keys, distances[:, index])) for index, value_keyname in enumerate(data["value_keynames"])))
+        tsa2 = self.table(self.project, self.tablename, datestring, self.timedelta)["tsa"]
+        keys, distances = compare(self["tsa"], tsa2, self.value_keynames)
+        data = {
+            "value_keynames" : list(self.value_keynames),
+            "keys" : [list(key) for key in keys],
+            "distances" : [[None if value != value else value for value in row] for row in distances.tolist()]
+        }
+        # caches of either day could be generated now
+        cachefilename = os.path.join(self.derived_cachedir, "%s%s_%s.json" % (prefix, self.__memcache_version(), self.get_cache_version(self.project, self.tablename, datestring)))
+        with open(cachefilename + ".tmp", "wt") as outfile:
+            json.dump(data, outfile)
+        os.rename(cachefilename + ".tmp", cachefilename)
+        self.__delete_outdated_derived(prefix, os.path.basename(cachefilename))
+        return dict(((value_keyname, CorrelationMatrixTime.from_distances(keys, distances[:, index])) for index, value_keyname in enumerate(self.value_keynames)))
+
     @staticmethod
     def _calculate_total_stats(value_keynames, tsastats):
         """
-        helping funtion to aggregate all timeseriesstats to one total_stats structure
-        """
-        aggregator = {
-            'median': lambda a, b: 0.0, # median of medians
-            'avg': lambda a, b: a + b,
-            'last': lambda a, b: 0.0,
-            'diff': lambda a, b: 0.0,
-            'max': max,
-            'first': lambda a, b: 0.0,
-            'min': min,
-            'std': lambda a, b: 0.0,
-            'count': lambda a, b: a + b,
-            'mean': lambda a, b: 0.0,
-            'dec': lambda a, b: a + b,
-            'inc': lambda a, b: a + b,
-            'sum': lambda a, b: a + b,
-            'total_count' : lambda a, b: a # to be consistent
-        }
+        helping funtion to aggregate all timeseriesstats to one total_stats structure,
+        merged from stored statistics and partials, see StatsMerge,
+        total_count is the number of Timeseries, total_avg the average sum of one Timeseries
+        """
+        keys = list(tsastats.keys())
+        merged = merge([tsastats[key] for key in keys], [()] * len(keys), value_keynames)
         stats_data = {}
         for value_keyname in value_keynames:
-            stats_data[value_keyname] = dict((key, 0.0) for key in aggregator) # prefill with 0.0
-            for index_key in tsastats.keys():
-                stats = tsastats[index_key]
-                for stat_func in stats[value_keyname].keys():
-                    stats_data[value_keyname][stat_func] = aggregator[stat_func](stats_data[value_keyname][stat_func], stats[value_keyname][stat_func])
-                stats_data[value_keyname]["total_count"] += 1
-            if stats_data[value_keyname]["total_count"] > 0:
-                stats_data[value_keyname]["total_avg"] = stats_data[value_keyname]["sum"] / stats_data[value_keyname]["total_count"]
-                stats_data[value_keyname]["avg"] /= stats_data[value_keyname]["total_count"]
+            if merged:
+                stats_data[value_keyname] = merged[()][0][value_keyname]
+                stats_data[value_keyname]["total_count"] = len(keys)
+                stats_data[value_keyname]["total_avg"] = stats_data[value_keyname]["sum"] / len(keys)
             else:
+                stats_data[value_keyname] = dict((key, 0.0) for key in TimeseriesStats.stat_funcs) # prefill with 0.0
+                stats_data[value_keyname]["total_count"] = 0
                 stats_data[value_keyname]["total_avg"] = 0.0
-                stats_data[value_keyname]["avg"] = 0.0
         return stats_data
 
-    def load_total_stats(self):
+    def load_total_stats(self, tsastats=None):
         """
         aggregates all TimeseriesStats available in TimeseriesArrayStats to total_stats dict
 
+        :param tsastats <TimeseriesArrayStats>: already calculated tsastats to use, otherwise loaded from cache
         :returns <dict>: of statistical functions, and values
         """
         cachefilename = os.path.join(self.cachedir, "total_stats.json")
         if not os.path.isfile(cachefilename):
-            tsastats = self["tsastats"]
+            if tsastats is None:
+                tsastats = self["tsastats"]
             total_stats = self._calculate_total_stats(self.value_keynames, tsastats)
             with open(cachefilename, "wt") as outfile:
                 json.dump(total_stats, outfile, indent=4)
@@ -1010,29 +1311,91 @@ class DataLogger(object):
         stop = "%04d-%02d-%02d" % (int(year), int(month), lastday)
         return DataLogger.datewalker(start, stop)
 
+    def load_longtime_stats(self, key, datestring_start, datestring_stop):
+        """
+        return daily statistics of one key of this table from long-range
+        store, one file read per year
+
+        parameters:
+        key <tuple>
+        datestring_start <str>
+        datestring_stop <str>
+
+        returns:
+        <dict> datestring -> <dict> like TimeseriesStats.stats, days without data are missing
+        """
+        path = LongtimeStats.get_path(self.__cachedir, self.project, self.tablename)
+        ret_data = {}
+        for year in range(int(datestring_start[:4]), int(datestring_stop[:4]) + 1):
+            longtime_stats = LongtimeStats(path, year)
+            if key not in longtime_stats:
+                continue
+            start = max(datestring_start, "%04d-01-01" % year)
+            stop = min(datestring_stop, "%04d-12-31" % year)
+            ret_data.update(longtime_stats.get_stats(key, start, stop))
+        return ret_data
+
+    def load_rollup(self, key, datestring_start, datestring_stop, value_keynames=None, max_points=1000):
+        """
+        return aggregated data of one key of this table, using the finest
+        rollup tier, which returns not more than max_points buckets for
+        this time range, or the daily tier if no tier is coarse enough
+
+        parameters:
+        key <tuple>
+        datestring_start <str>
+        datestring_stop <str>
+        value_keynames <list> default all
+        max_points <int> maximum number of buckets for this time range
+
+        returns:
+        <int> interval of used tier in seconds
+        <dict> value_keyname -> <list> of [ts, min, max, avg, count], buckets without data are missing
+        """
+        if value_keynames is None:
+            value_keynames = self.value_keynames
+        datestrings = list(self.datewalker(datestring_start, datestring_stop))
+        interval = 86400 # daily tier
+        for tier in sorted(TIERS):
+            if len(datestrings) * 86400 / tier <= max_points:
+                interval = tier
+                break
+        ret_data = dict(((value_keyname, []) for value_keyname in value_keynames))
+        if interval == 86400: # stored in long-range store
+            for datestring, stats in sorted(self.load_longtime_stats(key, datestring_start, datestring_stop).items()):
+                start_ts = round(self.get_ts_for_datestring(datestring)[0])
+                for value_keyname in value_keynames:
+                    ret_data[value_keyname].append([start_ts, ] + [stats[value_keyname][func] for func in ("min", "max", "avg", "count")])
+            return interval, ret_data
+        for datestring in datestrings:
+            path = os.path.join(self.__cachedir, datestring, self.project, self.tablename)
+            if not Rollup.exists(path):
+                continue
+            rollup = Rollup(path)
+            if key not in rollup or interval not in rollup.tiers:
+                continue
+            for value_keyname in value_keynames:
+                rows = ret_data[value_keyname]
+                for row in rollup.get_rows(key, interval, value_keyname):
+                    if rows and rows[-1][0] == row[0]: # bucket continued from previous day
+                        last = rows[-1]
+                        count = last[4] + row[4]
+                        rows[-1] = [row[0], min(last[1], row[1]), max(last[2], row[2]), (last[3] * last[4] + row[3] * row[4]) / count, count]
+                    else:
+                        rows.append(row)
+        return interval, ret_data
+
     def get_tsastats_longtime_hc(self, monthstring, key, value_key):
         """
         TODO: do this in webapp, not here, too special
-        method to get longtime data from stored TimeseriesArrayStats objects
+        method to get longtime data from long-range store
         and return data usable as higcharts input
         """
-        # datalogger = DataLogger(BASEDIR, project, tablename)
-        filterkeys = dict(zip(self.index_keynames, key))
-        logging.debug("build filterkeys %s", filterkeys)
+        start, *_, stop = self.monthwalker(monthstring)
         ret_data = {}
-        for datestring in self.monthwalker(monthstring):
-            logging.debug("getting tsatstats for %s", monthstring)
-            try:
-                tsastats = self.load_tsastats(filterkeys)
-                for funcname in tsastats[key][value_key].keys():
-                    if funcname in ret_data:
-                        ret_data[funcname].append((datestring, tsastats[key][value_key][funcname]))
-                    else:
-                        ret_data[funcname] = [(datestring, tsastats[key][value_key][funcname]), ]
-            except DataLoggerLiveDataError as exc:
-                logging.exception(exc)
-                logging.error("Reading from live data is not allowed, skipping this data, and ending loop")
-                break
+        for datestring, stats in sorted(self.load_longtime_stats(key, start, stop).items()):
+            for funcname, value in stats[value_key].items():
+                ret_data.setdefault(funcname, []).append((datestring, value))
         return ret_data
 
     @staticmethod
@@ -0,0 +1,234 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+array based implementations of Timeseries datatypes
+
+every function in here produces exactly the same values as the
+corresponding datatype_* function in module Timeseries, but works on
+numpy arrays. series could also be 2-dimensional, one row per column,
+so many columns of the same Timeseries are converted in one pass
+
+times  -> [ ts1, ts2, ts3, ... ]
+series -> [ value1, value2, value3, ... ]
+          or
+          [ [ col1_value1, col1_value2, ... ],
+            [ col2_value1, col2_value2, ... ] ]
+"""
+import logging
+# non std
+import numpy
+
+
+def _first_invalid(times, series, valid):
+    """
+    return (value, timestamp) of the first element in time order, which is not valid,
+    or None if every element is valid
+    """
+    if valid.all():
+        return None
+    invalid = ~valid.reshape(-1, valid.shape[-1])
+    series = series.reshape(invalid.shape)
+    # first column with an invalid value, than first time in this column
+    row = int(numpy.flatnonzero(invalid.any(axis=1))[0])
+    column = int(numpy.flatnonzero(invalid[row])[0])
+    return series[row, column].item(), times[column].item()
+
+def _differences(series):
+    """return differences between two subsequent values, first value is 0.0"""
+    derive = numpy.zeros(series.shape, dtype=numpy.float64)
+    derive[..., 1:] = series[..., 1:] - series[..., :-1]
+    return derive
+
+def _durations(times):
+    """return time differences between two subsequent timestamps, first value is 0.0"""
+    duration = numpy.zeros(len(times), dtype=numpy.float64)
+    duration[1:] = times[1:] - times[:-1]
+    return duration
+
+def _per_duration(derive, duration):
+    """return derive / duration, or 0.0 where duration is not above zero"""
+    return numpy.divide(derive, duration, out=numpy.zeros(derive.shape, dtype=numpy.float64), where=duration > 0.0)
+
+def datatype_percent(times, series):
+    """
+    returns series converted to datatype percent
+
+    ever value is calculated as percentage of max value in series
+
+    parameters:
+    times <numpy.ndarray> of <float>
+    series <numpy.ndarray> of <float>
+
+    returns:
+    <numpy.ndarray> of <float> percent between 0.0 and 1.0
+    """
+    series = numpy.asarray(series, dtype=numpy.float64)
+    if series.shape[-1] == 0:
+        return series.copy()
+    max_value = series.max(axis=-1, keepdims=True)
+    return numpy.divide(series, max_value, out=numpy.zeros(series.shape, dtype=numpy.float64), where=max_value != 0.0)
+
+def datatype_derive(times, series):
+    """
+    returns series converted to datatype derive
+    store only differeces between two subsequent values
+
+    parameters:
+    times <numpy.ndarray> of <float>
+    series <numpy.ndarray> of <float>
+
+    returns:
+    <numpy.ndarray> of <float>
+    """
+    return _differences(numpy.asarray(series, dtype=numpy.float64))
+
+def _datatype_counter(times, series, max_value):
+    """
+    generic counter datatype with parameterized max_value,
+    do not use directly, use counter32, counter64 instead
+    first value will always be 0.0
+
+    valid range of values :
+        min: 0.0
+        max: max_value
+
+    parameters:
+    times <numpy.ndarray> of <float>
+    series <numpy.ndarray> of <float>
+
+    returns:
+    <numpy.ndarray> of <float>
+    """
+    times = numpy.asarray(times, dtype=numpy.float64)
+    series = numpy.asarray(series, dtype=numpy.float64)
+    invalid = _first_invalid(times, series, (0.0 <= series) & (series <= max_value))
+    if invalid is not None:
+        msg = "counter %f out of range at time %f, max_value: %f " % (invalid[0], invalid[1], max_value)
+        logging.error(msg)
+        raise AssertionError(msg)
+    derive = _differences(series)
+    overflow = derive < 0.0 # overflow detected
+    if overflow.any():
+        previous = numpy.zeros(series.shape, dtype=numpy.float64)
+        previous[..., 1:] = series[..., :-1]
+        derive = numpy.where(overflow, (max_value - previous) + series, derive)
+    return _per_duration(derive, _durations(times))
+
+def datatype_counter32(times, series):
+    """
+    returns series converted to datatype counter32
+    counter32 will steadily increase until overflow at 2^32 occurs
+    stores only differences between to subsequent values,
+    first value wil always be 0.0
+
+    parameters:
+    times <numpy.ndarray> of <float>
+    series <numpy.ndarray> of <float>
+
+    returns:
+    <numpy.ndarray> of <float>
+    """
+    return _datatype_counter(times, series, 2.0**32)
+
+def datatype_counter64(times, series):
+    """
+    returns series converted to datatype counter64
+    counter64 will steadily increase until overflow at 2^64 occurs
+    stores only differences between to subsequent values
+
+    parameters:
+    times <numpy.ndarray> of <float>
+    series <numpy.ndarray> of <float>
+
+    returns:
+    <numpy.ndarray> of <float>
+    """
+    return _datatype_counter(times, series, 2.0**64)
+
+def datatype_persecond(times, series):
+    """
+    difference between two subsequent values divided by time difference
+
+    parameters:
+    times <numpy.ndarray> of <float>
+    series <numpy.ndarray> of <float>
+
+    returns:
+    <numpy.ndarray> of <float>
+    """
+    times = numpy.asarray(times, dtype=numpy.float64)
+    return _per_duration(_differences(numpy.asarray(series, dtype=numpy.float64)), _durations(times))
+
+def datatype_counterreset(times, series):
+    """
+    for counter which are steadily increasing, but will reset after restart
+    of some part of this system, there is no upper value defined to overflow
+
+    parameters:
+    times <numpy.ndarray> of <float>
+    series <numpy.ndarray> of <float>
+
+    returns:
+    <numpy.ndarray> of <float>
+    """
+    series = numpy.asarray(series, dtype=numpy.float64)
+    derive = _differences(series)
+    return numpy.where(derive < 0.0, series, derive)
+
+def datatype_gauge32(times, series):
+    """
+    like counterreset, but difference will be divided by duration,
+    to get some e.g. byte/s values
+
+    parameters:
+    times <numpy.ndarray> of <float>
+    series <numpy.ndarray> of <float>
+
+    returns:
+    <numpy.ndarray> of <float>
+    """
+    times = numpy.asarray(times, dtype=numpy.float64)
+    series = numpy.asarray(series, dtype=numpy.float64)
+    invalid = _first_invalid(times, series, series >= 0.0)
+    if invalid is not None:
+        msg = "counter %f out of range at time %f" % invalid
+        logging.error(msg)
+        raise AssertionError(msg)
+    derive = _differences(series)
+    derive = numpy.where(derive < 0.0, series, derive) # reset detected
+    return _per_duration(derive, _durations(times))
+
+
+datatype_mapper = {
+    "derive" : datatype_derive,
+    "counter32" : datatype_counter32,
+    "gauge32" : datatype_gauge32,
+    "counter64" : datatype_counter64,
+    "counterreset" : datatype_counterreset,
+    "percent" : datatype_percent,
+    "persecond" : datatype_persecond,
+}
+
+def convert_columns(times, values, datatypes):
+    """
+    convert many columns at once, columns with the same datatype
+    are converted together in one call
+
+    parameters:
+    times <numpy.ndarray> of <float>, shape (length, )
+    values <numpy.ndarray> of <float>, shape (number of columns, length)
+    datatypes <list> of datatype names for every column, "asis" to leave column unchanged
+
+    returns:
+    <numpy.ndarray> of <float>, shape (number of columns, length)
+    """
+    times = numpy.asarray(times, dtype=numpy.float64)
+    values = numpy.asarray(values, dtype=numpy.float64)
+    assert len(datatypes) == values.shape[0]
+    converted = values.copy()
+    for datatype in dict.fromkeys(datatypes): # keep order of first occurence
+        if datatype == "asis":
+            continue
+        colnums = [colnum for colnum, coltype in enumerate(datatypes) if coltype == datatype]
+        converted[colnums] = datatype_mapper[datatype](times, values[colnums])
+    return converted
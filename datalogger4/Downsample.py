@@ -0,0 +1,106 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+point budget downsampling of single series, for graphing
+
+both algorithms select original points, so the values shown are
+always real measured values
+
+lttb    Largest-Triangle-Three-Buckets, first and last point are kept,
+        the points in between are divided in max_points - 2 buckets,
+        from every bucket the point forming the largest triangle with the
+        point selected in the previous bucket and the average of the next
+        bucket is selected. Keeps the visual shape of the series.
+minmax  the points are divided in max_points / 2 buckets, from every
+        bucket the minimum and maximum is selected in time order.
+        Keeps every peak of the series.
+"""
+# non std
+import numpy
+
+METHODS = ("lttb", "minmax")
+
+
+def lttb(times, values, max_points):
+    """
+    return indices of points selected by Largest-Triangle-Three-Buckets
+
+    parameters:
+    times <numpy.ndarray> of <float> steadily increasing
+    values <numpy.ndarray> of <float> same length as times
+    max_points <int> at least 3
+
+    returns:
+    <numpy.ndarray> of <int> indices in increasing order
+    """
+    length = len(times)
+    if length <= max_points:
+        return numpy.arange(length)
+    times = numpy.asarray(times, dtype=numpy.float64)
+    values = numpy.asarray(values, dtype=numpy.float64)
+    # bucket borders of points between first and last one
+    edges = numpy.floor(numpy.linspace(1, length - 1, max_points - 1)).astype(numpy.int64)
+    # average of every bucket, computed at once, used as third point
+    counts = numpy.diff(edges)
+    avg_times = numpy.add.reduceat(times[1:-1], edges[:-1] - 1) / counts
+    avg_values = numpy.add.reduceat(values[1:-1], edges[:-1] - 1) / counts
+    avg_times = numpy.append(avg_times, times[-1]) # last point is next bucket of last bucket
+    avg_values = numpy.append(avg_values, values[-1])
+    selected = numpy.empty(max_points, dtype=numpy.int64)
+    selected[0] = 0
+    selected[-1] = length - 1
+    last = 0
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # double area of triangle for every point in bucket
+        areas = numpy.abs((times[last] - avg_times[bucket + 1]) * (values[start:stop] - values[last]) - (times[last] - times[start:stop]) * (avg_values[bucket + 1] - values[last]))
+        last = start + int(numpy.argmax(areas))
+        selected[bucket + 1] = last
+    return selected
+
+
+def minmax(times, values, max_points):
+    """
+    return indices of minimum and maximum point of every bucket
+
+    parameters:
+    times <numpy.ndarray> of <float> steadily increasing
+    values <numpy.ndarray> of <float> same length as times
+    max_points <int> at least 2
+
+    returns:
+    <numpy.ndarray> of <int> indices in increasing order
+    """
+    length = len(times)
+    if length <= max_points:
+        return numpy.arange(length)
+    values = numpy.asarray(values, dtype=numpy.float64)
+    buckets = max_points // 2
+    bucket_nums = numpy.arange(length) * buckets // length
+    # sorted by bucket, then by value, so first of every bucket is minimum, last is maximum
+    order = numpy.lexsort((values, bucket_nums))
+    firsts = numpy.searchsorted(bucket_nums, numpy.arange(buckets))
+    lasts = numpy.append(firsts[1:], length) - 1
+    return numpy.unique(numpy.concatenate((order[firsts], order[lasts])))
+
+
+def downsample(times, values, max_points, method="lttb"):
+    """
+    return indices of points to show, not more than max_points
+
+    parameters:
+    times <numpy.ndarray> of <float> steadily increasing
+    values <numpy.ndarray> of <float> same length as times
+    max_points <int>
+    method <str> one of METHODS
+
+    returns:
+    <numpy.ndarray> of <int> indices in increasing order
+    """
+    if method not in METHODS:
+        raise AttributeError("unknown downsampling method %s, use one of %s" % (method, METHODS))
+    if max_points < 3:
+        raise AttributeError("max_points must be at least 3")
+    if method == "lttb":
+        return lttb(times, values, max_points)
+    return minmax(times, values, max_points)
@@ -7,6 +7,7 @@ csv -> TSA (definiton of many Timeseries) -> TS1
                                           -> ...
 """
 import os
+import io
 import gzip
 import json
 import time
@@ -14,6 +15,11 @@ import concurrent.futures
 import logging
 # own modules
 from datalogger4.b64 import b64encode
+from datalogger4 import TimeseriesBinary
+from datalogger4.TimeseriesPack import TimeseriesPack
+from datalogger4.KeyIndex import KeyIndex
+from datalogger4.TimeseriesArray import TimeseriesArray
+from datalogger4.Timeseries import Timeseries
 
 def get_ts_writer(ts_keyname, value_keynames):
     """
@@ -65,6 +71,70 @@ def get_ts_buffer_writer(ts_keyname, value_keynames):
             outfile.write("\n".join(outbuffer))
     return ts_buffer_writer
 
+def get_ts_binary_writer(ts_keyname, value_keynames):
+    """
+    prepare function to write single timeseries to file in binary format,
+    compressed if filename ends with .gz
+
+    :param ts_keyname <str>: dict key of timstamp column
+    :param value_keynames <list>: list of value_keynames to store from dict
+    """
+    def ts_binary_writer(filename, data):
+        """
+        write data to file in binary format, see TimeseriesBinary
+
+        :param filename <str>: name of output file
+        :param data <dict>: data of this Timeseries
+        """
+        with TimeseriesBinary.open_file(filename, "wb") as outfile:
+            write_ts_binary(outfile, ts_keyname, value_keynames, data)
+    return ts_binary_writer
+
+def write_ts_binary(outfile, ts_keyname, value_keynames, data):
+    """
+    write data of one Timeseries to filehandle in binary format, sorted by timestamp
+
+    :param outfile <file>: opened in binary mode
+    :param ts_keyname <str>: dict key of timstamp column
+    :param value_keynames <list>: list of value_keynames
+    :param data <dict>: data of this Timeseries
+    """
+    timestamps = sorted(data.keys())
+    values = [[data[ts][colnum] for ts in timestamps] for colnum in range(len(value_keynames))]
+    TimeseriesBinary.dump_columns(outfile, ts_keyname, value_keynames, timestamps, values)
+
+def get_pack_records(ts_keyname, value_keynames, tsa):
+    """
+    generate records for TimeseriesPack.write from tsa dictionary
+
+    :param ts_keyname <str>: dict key of timstamp column
+    :param value_keynames <list>: list of value_keynames
+    :param tsa <dict>: key -> data of Timeseries
+    """
+    for key in tsa:
+        outbuffer = io.BytesIO()
+        write_ts_binary(outbuffer, ts_keyname, value_keynames, tsa[key])
+        yield key, outbuffer.getvalue()
+
+def get_tsa(tsa_def, tsa, datatypes=None, timeseries_class=Timeseries):
+    """
+    build TimeseriesArray in cache mode from parsed data in memory,
+    the same data as if the written Timeseries files were loaded again
+
+    :param tsa_def <dict>: table definition
+    :param tsa <dict>: key -> data of Timeseries, as returned by raw readers
+    :param datatypes <dict>: datatypes of value columns, used by finalize()
+    :param timeseries_class <class>: Timeseries implementation to use
+    :return <TimeseriesArray>:
+    """
+    tsa_obj = TimeseriesArray(tsa_def["index_keys"], tsa_def["value_keys"], tsa_def["ts_key"], datatypes=datatypes, cache=True, timeseries_class=timeseries_class)
+    for key, data in tsa.items():
+        timeseries = timeseries_class(tsa_def["value_keys"], tsa_def["ts_key"])
+        for ts in sorted(data.keys()): # parsed data is trusted, no checks needed
+            timeseries.add_from_csv(ts, data[ts])
+        tsa_obj[key] = timeseries
+    return tsa_obj
+
 def get_raw_reader(filename, delimiter, headers, tsa_def):
     """
     prepare reading of raw or archived (.gz) file and return
@@ -203,12 +273,166 @@ def get_raw_buffer_reader(filename, delimiter, headers, tsa_def):
         return tsa
     return inner
 
-def fast_tsa(dl, max_workers=6):
+def parse_raw_chunk(chunk, delimiter, headers, tsa_def):
+    """
+    parse block of raw data lines, without header line
+
+    module level function, to be usable in process pools
+
+    :param chunk <bytes>: newline aligned part of raw input file
+    :param delimiter <char>: delimiting character
+    :param headers <list>: list of header columns - order matters
+    :param tsa_def <dict>: table definition
+    :return <tuple>: (tsa <dict>, number of done lines <int>, number of skipped lines <int>)
+    """
+    index_keynames = tsa_def["index_keys"]
+    value_keynames = tsa_def["value_keys"]
+    ts_keyname = tsa_def["ts_key"]
+    tsa = {}
+    skipped = 0
+    done = 0
+    rows = chunk.decode("utf-8").split("\n")
+    if rows[-1] == "":
+        rows.pop() # chunk ends with newline
+    for row in rows:
+        try:
+            cols = row.strip().split(delimiter)
+            if len(cols) != len(headers):
+                skipped += 1
+                continue
+            data_dict = dict(zip(headers, cols)) # row_dict
+            ts = float(data_dict[ts_keyname])
+            key = tuple([data_dict[index_key] for index_key in index_keynames])
+            values = [float(data_dict[value_key]) for value_key in value_keynames]
+            if key not in tsa:
+                tsa[key] = {}
+            tsa[key][ts] = values
+            done += 1
+        except ValueError as exc:
+            # if there is any error in converting input data to float, skip this line
+            skipped += 1
+        except KeyError as exc:
+            # if there is any key missing in row, skip this line
+            logging.debug("missing key %s in raw line %s", exc, row)
+            skipped += 1
+    return tsa, done, skipped
+
+def parse_raw_range(filename, start, stop, delimiter, headers, tsa_def):
+    """
+    read byte range [start, stop) of uncompressed raw file and parse it
+
+    :param filename <str>: name of input file
+    :param start <int>: first byte, must be the beginning of a line
+    :param stop <int>: byte after last newline of this range
+    :return <tuple>: same as parse_raw_chunk
+    """
+    with open(filename, "rb") as infile:
+        infile.seek(start)
+        chunk = infile.read(stop - start)
+    return parse_raw_chunk(chunk, delimiter, headers, tsa_def)
+
+def get_byte_ranges(filename, start, chunks, min_size=1024 * 1024):
+    """
+    split file from byte start to end in newline aligned byte ranges
+
+    :param filename <str>: name of input file
+    :param start <int>: first byte to use, must be beginning of a line
+    :param chunks <int>: number of ranges wanted
+    :param min_size <int>: minimum size of every range in bytes
+    :return <list>: of (start <int>, stop <int>)
+    """
+    size = os.path.getsize(filename)
+    step = max(min_size, (size - start) // max(1, chunks) + 1)
+    ranges = []
+    with open(filename, "rb") as infile:
+        while start < size:
+            stop = start + step
+            if stop < size:
+                infile.seek(stop)
+                infile.readline() # align to next newline
+                stop = infile.tell()
+            else:
+                stop = size
+            ranges.append((start, stop))
+            start = stop
+    return ranges
+
+def get_raw_parallel_reader(filename, delimiter, headers, tsa_def, workers):
+    """
+    prepare reading of raw or archived (.gz) file and return
+    function to read whole file in once
+
+    the data lines are split into newline aligned blocks,
+    and parsed in a pool of processes, afterwards the
+    partial results are merged in file order
+
+    uncompressed files are split by byte ranges and every process
+    reads its own range, archived files have to be decompressed
+    in this process, and only the parsing is distributed
+
+    :param filename <str>: name of input file
+    :param delimiter <char>: delimiting character
+    :param headers <list>: list of header columns - order matters
+    :param tsa_def <dict>: table definition
+    :param workers <int>: number of processes to use
+    """
+    def inner():
+        """
+        read input file in parallel and fill tsa structure with data
+        """
+        if filename.endswith(".gz"):
+            with gzip.open(filename, "rb") as infile:
+                headerline = infile.readline()
+                data = infile.read()
+        else:
+            with open(filename, "rb") as infile:
+                headerline = infile.readline()
+        fileheaders = headerline.decode("utf-8").strip().split(delimiter)
+        if fileheaders != headers:
+            logging.error("defined headers       : %s", headers)
+            logging.error("headers in input file : %s", fileheaders)
+            logging.error("header not defined    : %s", [header for header in headers if header not in fileheaders])
+            logging.error("header missing in file: %s", [header for header in fileheaders if header not in headers])
+        tsa = {}
+        skipped = 0
+        done = 0
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            if filename.endswith(".gz"):
+                step = len(data) // workers + 1
+                start = 0
+                while start < len(data):
+                    stop = data.find(b"\n", start + step) + 1 or len(data)
+                    futures.append(executor.submit(parse_raw_chunk, data[start:stop], delimiter, headers, tsa_def))
+                    start = stop
+                del data
+            else:
+                for start, stop in get_byte_ranges(filename, len(headerline), workers):
+                    futures.append(executor.submit(parse_raw_range, filename, start, stop, delimiter, headers, tsa_def))
+            for future in futures: # merge in file order, later lines win
+                part, part_done, part_skipped = future.result()
+                for key, ts_data in part.items():
+                    if key not in tsa:
+                        tsa[key] = ts_data
+                    else:
+                        tsa[key].update(ts_data)
+                done += part_done
+                skipped += part_skipped
+        logging.info("done %d lines, skipped %d lines", done, skipped)
+        return tsa
+    return inner
+
+def fast_tsa(dl, max_workers=6, parse_workers=1, fmt="csv"):
     """
     import data from raw data analyze data and store it
     Datalogger object must be initialized to some project/tablename/datestring combination
 
     :param dl <Datalogger>: object to use for configuration
+    :param max_workers <int>: number of threads to write Timeseries files
+    :param parse_workers <int>: number of processes to parse raw input file, 1 means serial
+    :param fmt <str>: format of Timeseries files, one of TimeseriesBinary.ts_formats
+        or "pack", "pack.zlib" to write one container file
+    :return <dict>: parsed data key -> data of Timeseries, None if there is no input file
     """
     # define new tsa structure
     tsa_def = {
@@ -223,33 +447,50 @@ def fast_tsa(dl, max_workers=6):
     # first bet, there is a *.csv.gz version
     if os.path.isfile(dl.archive_filename):
         logging.info("found archived raw input file %s", dl.archive_filename)
-        raw_reader = get_raw_reader(dl.archive_filename, dl.meta["delimiter"], list(dl.meta["headers"]), tsa_def)
+        raw_filename = dl.archive_filename
     # otherwise a csv (uncompressed) version
     elif dl.raw_filename is not None:
         logging.info("searching original raw input file %s", dl.raw_filename)
         # this will raise Exception if fil does not exist
-        raw_reader = get_raw_reader(dl.raw_filename, dl.meta["delimiter"], list(dl.meta["headers"]), tsa_def)
+        raw_filename = dl.raw_filename
     else:
         logging.error("neither archived nor raw file is available")
         return
+    if parse_workers > 1:
+        logging.info("parsing with %d processes", parse_workers)
+        raw_reader = get_raw_parallel_reader(raw_filename, dl.meta["delimiter"], list(dl.meta["headers"]), tsa_def, parse_workers)
+    else:
+        raw_reader = get_raw_reader(raw_filename, dl.meta["delimiter"], list(dl.meta["headers"]), tsa_def)
     tsa = raw_reader() # read data into memory
-    logging.debug("done in %0.2f", time.time() - starttime)
+    duration = time.time() - starttime
+    rows = sum((len(data) for data in tsa.values()))
+    logging.info("read %d rows in %0.2f s, %0.0f rows/s", rows, duration, rows / max(duration, 0.001))
     starttime = time.time()
     logging.debug("dumping individual TS files")
     # output TS data
-    ts_writer = get_ts_buffer_writer(tsa_def["ts_key"], tsa_def["value_keys"])
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = []
-        for key in tsa: # split into Timeseries by index_key
-            ts_filename = "ts_" + b64encode(key) + ".csv.gz"
-            filename = os.path.join(dl.cachedir, ts_filename)
-            tsa_def["ts_filenames"].append(ts_filename)
-            futures.append(executor.submit(ts_writer, filename, tsa[key])) # build up queue
-        for future in concurrent.futures.as_completed(futures): # wait for futures to complete
-            future.result()
+    if fmt in ("pack", "pack.zlib"):
+        pack_filename = TimeseriesPack.get_dumpfilename(tsa_def["index_keys"])
+        TimeseriesPack.write(os.path.join(dl.cachedir, pack_filename), tsa_def["index_keys"], tsa_def["value_keys"], tsa_def["ts_key"], get_pack_records(tsa_def["ts_key"], tsa_def["value_keys"], tsa), compress=(fmt == "pack.zlib"))
+        tsa_def["pack_filename"] = pack_filename
+    else:
+        if fmt == "csv":
+            ts_writer = get_ts_buffer_writer(tsa_def["ts_key"], tsa_def["value_keys"])
+        else:
+            ts_writer = get_ts_binary_writer(tsa_def["ts_key"], tsa_def["value_keys"])
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = []
+            for key in tsa: # split into Timeseries by index_key
+                ts_filename = "ts_" + b64encode(key) + TimeseriesBinary.ts_formats[fmt]
+                filename = os.path.join(dl.cachedir, ts_filename)
+                tsa_def["ts_filenames"].append(ts_filename)
+                futures.append(executor.submit(ts_writer, filename, tsa[key])) # build up queue
+            for future in concurrent.futures.as_completed(futures): # wait for futures to complete
+                future.result()
     # output tsa structure
     logging.debug("done in in %0.2f", time.time() - starttime)
     tsa_filename = "tsa_" + b64encode(tsa_def["index_keys"]) + ".json"
     logging.debug("dumping tsa to %s", tsa_filename)
     json.dump(tsa_def, open(os.path.join(dl.cachedir, tsa_filename), "wt"), indent=4) # dump tsa data
+    KeyIndex(tsa_def["index_keys"], tsa.keys(), ts_format=fmt).dump(dl.cachedir)
     logging.debug("done in in %0.2f", time.time() - starttime)
+    return tsa
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+columnar group by of TimeseriesArray
+
+the timestamps of every Timeseries are aligned to the nearest slot of
+interval seconds since start of day, like Advanced.tsa_group_by does,
+then all values of all Timeseries of one group are aggregated per slot
+in one pass with numpy reduceat, instead of calling a group function
+for every value of every row.
+
+group functions
+
+    sum     sum of all values in slot
+    min     minimum of all values in slot
+    max     maximum of all values in slot
+    avg     arithmetic mean of all values in slot
+    count   number of values in slot
+"""
+import logging
+# non std
+import numpy
+# own modules
+from datalogger4.TimeseriesArray import TimeseriesArray
+from datalogger4.TimeseriesColumnar import TimeseriesColumnar
+from datalogger4.Rollup import get_matrix
+
+GROUP_FUNCS = ("sum", "min", "max", "avg", "count")
+REDUCERS = {
+    "sum" : numpy.add,
+    "min" : numpy.minimum,
+    "max" : numpy.maximum,
+    "avg" : numpy.add, # divided by count afterwards
+}
+
+
+def aggregate(slots, values, group_func):
+    """
+    aggregate all values with the same slot
+
+    parameters:
+    slots <numpy.ndarray> shape (length, ) of <int64>
+    values <numpy.ndarray> shape (headers, length)
+    group_func <str> one of GROUP_FUNCS
+
+    returns:
+    <numpy.ndarray> shape (slots, ) distinct slots in increasing order
+    <numpy.ndarray> shape (headers, slots) aggregated values
+    """
+    if len(slots) == 0:
+        return slots, values
+    order = numpy.argsort(slots, kind="stable")
+    slots = slots[order]
+    values = values[:, order]
+    starts = numpy.flatnonzero(numpy.concatenate(([True, ], slots[1:] != slots[:-1])))
+    counts = numpy.diff(numpy.append(starts, len(slots))).astype(numpy.float64)
+    if group_func == "count":
+        aggregated = numpy.tile(counts, (len(values), 1))
+    elif len(values) == 0:
+        aggregated = numpy.empty((0, len(starts)), dtype=numpy.float64)
+    else:
+        aggregated = REDUCERS[group_func].reduceat(values, starts, axis=1)
+        if group_func == "avg":
+            aggregated /= counts
+    return slots[starts], aggregated
+
+
+def group_by(tsa, start_ts, index_keynames, group_func="avg", interval=300):
+    """
+    group Timeseries of tsa by some of its index_keynames
+
+    parameters:
+    tsa <TimeseriesArray>
+    start_ts <float> start of day, first slot
+    index_keynames <tuple> subset of tsa.index_keynames, could also be
+        empty, to aggregate everything to key ()
+    group_func <str> one of GROUP_FUNCS
+    interval <int> interval in seconds the timeseries values should appear
+
+    returns:
+    <TimeseriesArray> of <TimeseriesColumnar>
+    """
+    if group_func not in GROUP_FUNCS:
+        raise AttributeError("unknown group function %s, use one of %s" % (group_func, GROUP_FUNCS))
+    if any((index_keyname not in tsa.index_keynames for index_keyname in index_keynames)):
+        raise AttributeError("index_keynames %s are not a subset of %s" % (index_keynames, tsa.index_keynames))
+    positions = [tsa.index_keynames.index(index_keyname) for index_keyname in index_keynames]
+    value_keynames = list(tsa.value_keynames)
+    groups = {} # group key -> ([slots, ...], [values, ...])
+    for key in tsa.keys():
+        times, values = get_matrix(tsa[key], value_keynames)
+        group = groups.setdefault(tuple((key[position] for position in positions)), ([], []))
+        group[0].append(numpy.round((times - start_ts) / interval).astype(numpy.int64)) # nearest slot
+        group[1].append(values)
+    logging.info("grouping %d keys to %d keys by %s", len(tsa), len(groups), index_keynames)
+    grouped = TimeseriesArray(index_keynames=index_keynames, value_keynames=value_keynames, ts_key=tsa.ts_key, datatypes=tsa.datatypes, timeseries_class=TimeseriesColumnar)
+    for group_key, (slots, values) in groups.items():
+        slots, aggregated = aggregate(numpy.concatenate(slots), numpy.concatenate(values, axis=1), group_func)
+        times = numpy.trunc(start_ts + slots * interval) # like int() of aligned timestamp
+        grouped[group_key] = TimeseriesColumnar.from_columns(value_keynames, times, aggregated, ts_keyname=tsa.ts_key)
+    return grouped
@@ -0,0 +1,167 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+incremental json serialization of large results
+
+iterators like generators are serialized as json arrays while they
+are consumed, so rows of Timeseries.to_data or TimeseriesArray.export
+are never held in memory as a whole. Items of iterators are encoded
+BATCH_SIZE at once by json.dumps, only containers holding iterators
+are walked. Output is collected in chunks of about CHUNK_SIZE
+characters, to not send every row on its own.
+"""
+import json
+import time
+import logging
+import collections.abc
+
+CHUNK_SIZE = 64 * 1024 # characters collected before yielding
+BATCH_SIZE = 256 # items of an iterator encoded at once
+
+
+def iter_json(obj, stack=None):
+    """
+    yield json representation of obj in pieces, iterators are
+    serialized as arrays, even nested ones. Only iterators and
+    containers holding iterators are walked, everything else,
+    like every item of an iterator, is encoded by one json.dumps
+
+    parameters:
+    obj <object> json encodable, or containing iterators
+    stack <list> if given, closing brackets of open containers,
+        to finish output if an iterator raises an exception
+
+    returns:
+    <generator> of <str>
+    """
+    if stack is None:
+        stack = []
+    if isinstance(obj, collections.abc.Iterator):
+        yield "["
+        stack.append("]")
+        batch = []
+        separator = ""
+        try:
+            for value in obj: # iterators raise only between complete values
+                batch.append(value)
+                if len(batch) == BATCH_SIZE:
+                    values, batch = batch, []
+                    yield from iter_batch(values, separator, stack)
+                    separator = ", "
+        except Exception: # values before the exception are valid
+            if batch:
+                yield from iter_batch(batch, separator, stack)
+            raise
+        if batch:
+            yield from iter_batch(batch, separator, stack)
+        yield stack.pop()
+        return
+    try:
+        piece = json.dumps(obj, ensure_ascii=False)
+    except TypeError: # holding iterators, json.dumps fails before consuming them
+        if not isinstance(obj, (dict, list, tuple)):
+            raise
+        piece = None
+    if piece is not None:
+        yield piece
+    elif isinstance(obj, dict):
+        yield "{"
+        stack.append("}")
+        for num, (key, value) in enumerate(obj.items()):
+            yield "%s%s: " % (", " if num else "", json.dumps(str(key), ensure_ascii=False))
+            yield from iter_json(value, stack)
+        yield stack.pop()
+    else: # list or tuple
+        yield "["
+        stack.append("]")
+        for num, value in enumerate(obj):
+            if num:
+                yield ", "
+            yield from iter_json(value, stack)
+        yield stack.pop()
+
+
+def iter_batch(values, separator, stack):
+    """
+    yield json representation of some items of an iterator, without
+    brackets, all encoded by one json.dumps, if this is not possible
+    every item is encoded on its own
+
+    parameters:
+    values <list>
+    separator <str> written before first item
+    stack <list> like iter_json
+
+    returns:
+    <generator> of <str>
+    """
+    try:
+        piece = json.dumps(values, ensure_ascii=False)[1:-1]
+    except TypeError: # holding iterators, json.dumps fails before consuming them
+        piece = None
+    if piece is not None:
+        yield separator + piece
+        return
+    for value in values:
+        yield separator
+        yield from iter_json(value, stack)
+        separator = ", "
+
+
+def iter_chunks(pieces, chunk_size=CHUNK_SIZE):
+    """
+    join pieces to chunks of at least chunk_size characters
+
+    parameters:
+    pieces <iterable> of <str>
+    chunk_size <int>
+
+    returns:
+    <generator> of <str>
+    """
+    buffer = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def iter_envelope(results, starttime=None, chunk_size=CHUNK_SIZE, raise_errors=False):
+    """
+    yield api envelope {"results": ..., "duration": ..., "timestamp": ...}
+    in chunks, results are serialized while consumed. Errors raised while
+    streaming could not change the already sent status code anymore, so
+    they are reported as "error" and "status_code" in the envelope.
+    With raise_errors they are raised again instead, to abort the transfer,
+    so a partial body is never stored together with a validator like ETag.
+
+    parameters:
+    results <object> json encodable, or containing iterators
+    starttime <float> start of request, default now
+    chunk_size <int>
+    raise_errors <bool> raise errors while streaming, instead of closing the envelope
+
+    returns:
+    <generator> of <str>
+    """
+    if starttime is None:
+        starttime = time.time()
+    def pieces():
+        yield "{\"results\": "
+        stack = []
+        try:
+            yield from iter_json(results, stack)
+        except Exception as exc:
+            logging.exception(exc)
+            if raise_errors:
+                raise
+            yield "".join(reversed(stack)) # close open containers
+            yield ", \"error\": %s, \"status_code\": 500" % json.dumps(str(exc), ensure_ascii=False)
+        yield ", \"duration\": %s, \"timestamp\": %s}" % (json.dumps(time.time() - starttime), json.dumps(time.time()))
+    return iter_chunks(pieces(), chunk_size)
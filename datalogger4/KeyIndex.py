@@ -0,0 +1,267 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+persistent index of all index keys of one TimeseriesArray
+
+for every index column there is an inverted list, holding the positions
+of all keys with this value in this column, so filters are resolved
+against the distinct values of one column, not against every key
+
+    keys    -> [ ("srv1", "eth0"), ("srv1", "eth1"), ("srv2", "eth0") ]
+    columns -> {
+        "hostname" : { "srv1" : [0, 1], "srv2" : [2] },
+        "ifname" : { "eth0" : [0, 2], "eth1" : [1] }
+    }
+
+possible filter conditions for one column:
+
+    None                        every value matches
+    <str>                       equality
+    <list>, <tuple>, <set>      value is one of these
+    {"prefix" : <str>}          value starts with prefix
+    {"regex" : <str>}           value matches regular expression, re.match
+    compiled regular expression
+"""
+import os
+import re
+import json
+import bisect
+import logging
+# own modules
+from datalogger4.b64 import b64encode
+
+
+class KeyIndex(object):
+    """
+    index keys of one table-day and inverted lists for every index column
+    """
+
+    def __init__(self, index_keynames, keys, ts_format=None):
+        """
+        parameters:
+        index_keynames <tuple> names of index columns
+        keys <iterable> of <tuple> index keys
+        ts_format <str> format the Timeseries files are stored in, see TimeseriesArray.dump
+        """
+        self.__index_keynames = tuple(index_keynames)
+        self.__keys = [tuple(key) for key in keys]
+        self.__ts_format = ts_format
+        self.__columns = dict(((index_keyname, {}) for index_keyname in self.__index_keynames))
+        for position, key in enumerate(self.__keys):
+            for index_keyname, value in zip(self.__index_keynames, key):
+                self.__columns[index_keyname].setdefault(value, []).append(position)
+        self.__values = {} # sorted distinct values of column, created on demand
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def __contains__(self, key):
+        return len(self.filter(dict(zip(self.__index_keynames, key)))) > 0
+
+    @property
+    def index_keynames(self):
+        """names of index columns"""
+        return self.__index_keynames
+
+    @property
+    def ts_format(self):
+        """format of Timeseries files, None if unknown"""
+        return self.__ts_format
+
+    def keys(self):
+        """all index keys in stored order"""
+        return list(self.__keys)
+
+    def values(self, index_keyname):
+        """
+        return sorted distinct values of one index column
+
+        parameters:
+        index_keyname <str>
+
+        returns:
+        <list> of <str>
+        """
+        if index_keyname not in self.__values:
+            self.__values[index_keyname] = sorted(self.__columns[index_keyname].keys())
+        return self.__values[index_keyname]
+
+    def select(self, index_keyname, condition):
+        """
+        return positions of all keys, where value of index column matches condition
+
+        parameters:
+        index_keyname <str>
+        condition see module description
+
+        returns:
+        <set> of <int>
+        """
+        column = self.__columns[index_keyname]
+        if isinstance(condition, str):
+            values = [condition, ]
+        elif isinstance(condition, (list, tuple, set, frozenset)):
+            values = condition
+        elif isinstance(condition, dict) and "prefix" in condition:
+            prefix = condition["prefix"]
+            distinct = self.values(index_keyname)
+            start = bisect.bisect_left(distinct, prefix)
+            values = []
+            for value in distinct[start:]:
+                if not value.startswith(prefix):
+                    break
+                values.append(value)
+        else:
+            rex = self.get_regex(condition)
+            values = [value for value in column.keys() if rex.match(value)]
+        positions = set()
+        for value in values:
+            positions.update(column.get(value, ()))
+        return positions
+
+    def filter(self, filterkeys, matchtype="and"):
+        """
+        return all keys matching filterkeys, same result as using
+        filtermatch() on every key, but only the matching keys are touched
+
+        parameters:
+        filterkeys <dict> index_keyname -> condition
+        matchtype <str> "and" or "or"
+
+        returns:
+        <list> of <tuple> matching keys in stored order
+        """
+        assert matchtype in ("and", "or")
+        positions = None
+        for index_keyname, condition in filterkeys.items():
+            if condition is None: # ignore keys with value None
+                continue
+            selected = self.select(index_keyname, condition)
+            if positions is None:
+                positions = selected
+            elif matchtype == "and":
+                positions &= selected
+            else:
+                positions |= selected
+        if positions is None: # there was no condition at all
+            return self.keys() if matchtype == "and" else []
+        return [self.__keys[position] for position in sorted(positions)]
+
+    @staticmethod
+    def get_regex(condition):
+        """return compiled regular expression of regex condition"""
+        if isinstance(condition, dict):
+            return re.compile(condition["regex"])
+        if hasattr(condition, "match"): # already compiled
+            return condition
+        raise TypeError("unknown filter condition %s" % condition)
+
+    @staticmethod
+    def match_value(value, condition):
+        """
+        return True if single value matches condition, see module description
+
+        parameters:
+        value <str>
+        condition
+
+        returns:
+        <bool>
+        """
+        if isinstance(condition, str):
+            return value == condition
+        if isinstance(condition, (list, tuple, set, frozenset)):
+            return value in condition
+        if isinstance(condition, dict) and "prefix" in condition:
+            return value.startswith(condition["prefix"])
+        return KeyIndex.get_regex(condition).match(value) is not None
+
+    @staticmethod
+    def filtermatch(key_dict, filterkeys, matchtype):
+        """
+        key_dict is the whole index key, aka
+        {hostname : test, instance:1, other:2}
+
+        filterkey is part
+        {hostname : test}
+        {hostname : test, instance: None, other: None}
+        {hostname : {"prefix" : "te"}, instance: ["1", "2"]}
+        """
+        assert matchtype in ("and", "or")
+        matched = 0
+        for key in filterkeys.keys():
+            if filterkeys[key] is None: # ignore keys with value None
+                if matchtype == "and": # and count them as matched
+                    matched += 1
+                continue
+            if KeyIndex.match_value(key_dict[key], filterkeys[key]):
+                matched += 1
+        # every key must match at AND
+        if (matchtype == "and") and (matched == len(filterkeys.keys())):
+            return True
+        # at least one key must match at OR
+        elif (matchtype == "or") and (matched > 0):
+            return True
+        return False
+
+    @staticmethod
+    def get_dumpfilename(index_keys):
+        """
+        create filename of stored KeyIndex from given index_keys
+
+        parameters:
+        index_keys <tuple>
+
+        returns:
+        <str>
+        """
+        return "keyindex_%s.json" % b64encode(index_keys)
+
+    def to_data(self):
+        """return data used to further encode via json"""
+        return {
+            "index_keys" : list(self.__index_keynames),
+            "ts_format" : self.__ts_format,
+            "keys" : [list(key) for key in self.__keys],
+            "columns" : self.__columns
+        }
+
+    def dump(self, outpath):
+        """
+        store KeyIndex in outpath, the filename is created from index_keys
+
+        parameters:
+        outpath <str>
+        """
+        filename = os.path.join(outpath, self.get_dumpfilename(self.__index_keynames))
+        with open(filename + ".tmp", "wt") as outfile:
+            json.dump(self.to_data(), outfile)
+        os.rename(filename + ".tmp", filename)
+        logging.debug("written KeyIndex with %d keys to %s", len(self.__keys), filename)
+
+    @staticmethod
+    def load(path, index_keys):
+        """
+        load stored KeyIndex, the inverted lists are used as stored
+
+        parameters:
+        path <str>
+        index_keys <tuple>
+
+        returns:
+        <KeyIndex>
+        """
+        with open(os.path.join(path, KeyIndex.get_dumpfilename(index_keys)), "rt") as infile:
+            data = json.load(infile)
+        keyindex = KeyIndex.__new__(KeyIndex)
+        keyindex.__index_keynames = tuple(data["index_keys"])
+        keyindex.__keys = [tuple(key) for key in data["keys"]]
+        keyindex.__ts_format = data["ts_format"]
+        keyindex.__columns = data["columns"]
+        keyindex.__values = {}
+        return keyindex
+
+    @staticmethod
+    def exists(path, index_keys):
+        """True if there is a stored KeyIndex in path"""
+        return os.path.isfile(os.path.join(path, KeyIndex.get_dumpfilename(index_keys)))
@@ -0,0 +1,387 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+running statistics of live data, updated row by row
+
+the nightly analysis calculates TimeseriesStats from the whole day,
+LiveStats keeps the same statistical values up to date while rows are
+appended to todays raw input file, so there is no need to read the raw
+file again.
+
+every value is converted to its datatype with the previous row of the
+same index key, like Datatypes does for the whole series. Datatype
+percent depends on the maximum of the whole day, so these statistics
+are scaled when requested.
+
+all values are exact, except std which is calculated with Welford's
+method, and median, which is estimated with the P-square algorithm
+after the first five values
+
+rows are read from todays raw input file, LiveStats remembers how many
+bytes of it are added already. So every process serving the same table
+reads the rows every other process appended, and after a restart the
+rows appended since the last dump are read again from the raw file.
+"""
+import os
+import json
+import fcntl
+import logging
+# own modules
+from datalogger4.DataLogger import DataLogger
+from datalogger4.CustomExceptions import *
+
+
+def convert_value(datatype, last_ts, last_value, ts, value):
+    """
+    convert single value to datatype, the same way Datatypes converts whole series
+
+    parameters:
+    datatype <str>
+    last_ts <float> timestamp of previous row, None if this is the first one
+    last_value <float> raw value of previous row
+    ts <float> timestamp
+    value <float> raw value
+
+    returns:
+    <float>
+    """
+    if datatype in ("asis", "percent"):
+        return value
+    if datatype in ("counter32", "counter64"):
+        max_value = 2.0**32 if datatype == "counter32" else 2.0**64
+        if not 0.0 <= value <= max_value:
+            raise DataFormatError("counter %f out of range at time %f, max_value: %f " % (value, ts, max_value))
+    elif datatype == "gauge32" and value < 0.0:
+        raise DataFormatError("counter %f out of range at time %f" % (value, ts))
+    if last_ts is None: # first value of derived series is always 0.0
+        return 0.0
+    derive = value - last_value
+    if derive < 0.0:
+        if datatype in ("counter32", "counter64"):
+            derive = (max_value - last_value) + value # overflow
+        elif datatype in ("counterreset", "gauge32"):
+            derive = value # reset
+    if datatype in ("derive", "counterreset"):
+        return derive
+    duration = ts - last_ts
+    if duration > 0.0: # counter32, counter64, gauge32, persecond
+        return derive / duration
+    return 0.0
+
+
+class RunningStats(object):
+    """
+    statistics of one series, updated value by value
+    """
+    dn = (0.0, 0.25, 0.5, 0.75, 1.0) # increments of P-square marker positions for median
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.first = None
+        self.last = None
+        self.inc = 0.0
+        self.dec = 0.0
+        self.mean = 0.0 # Welford
+        self.m2 = 0.0
+        self.heights = [] # P-square markers, or all values if count < 5
+        self.positions = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.desired = [1.0, 2.0, 3.0, 4.0, 5.0]
+
+    def add(self, value):
+        """
+        add next value of series
+
+        parameters:
+        value <float>
+        """
+        if self.count == 0:
+            self.min = self.max = self.first = value
+        else:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+            if value > self.last:
+                self.inc += value - self.last
+            elif value < self.last:
+                self.dec += self.last - value
+        self.last = value
+        self.count += 1
+        self.sum += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.__add_median(value)
+
+    def __add_median(self, value):
+        """P-square update of median markers"""
+        heights = self.heights
+        if self.count <= 5:
+            heights.append(value)
+            heights.sort()
+            return
+        positions = self.positions
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = max(index for index in range(4) if heights[index] <= value)
+        for index in range(cell + 1, 5):
+            positions[index] += 1.0
+        for index in range(5):
+            self.desired[index] += self.dn[index]
+        for index in range(1, 4):
+            offset = self.desired[index] - positions[index]
+            if (offset >= 1.0 and positions[index + 1] - positions[index] > 1.0) or (offset <= -1.0 and positions[index - 1] - positions[index] < -1.0):
+                step = 1 if offset > 0.0 else -1
+                height = heights[index] + step / (positions[index + 1] - positions[index - 1]) * (
+                    (positions[index] - positions[index - 1] + step) * (heights[index + 1] - heights[index]) / (positions[index + 1] - positions[index]) +
+                    (positions[index + 1] - positions[index] - step) * (heights[index] - heights[index - 1]) / (positions[index] - positions[index - 1]))
+                if not heights[index - 1] < height < heights[index + 1]: # use linear prediction
+                    height = heights[index] + step * (heights[index + step] - heights[index]) / (positions[index + step] - positions[index])
+                heights[index] = height
+                positions[index] += step
+
+    @property
+    def median(self):
+        """exact median of up to five values, estimation afterwards"""
+        if self.count > 5:
+            return self.heights[2]
+        half = self.count // 2
+        if not self.count % 2:
+            return (self.heights[half - 1] + self.heights[half]) / 2.0
+        return self.heights[half]
+
+    def stats(self, scale=1.0):
+        """
+        return statistics like TimeseriesStats, all values multiplied by scale
+
+        parameters:
+        scale <float>
+
+        returns:
+        <dict>
+        """
+        min_value, max_value = sorted((self.min * scale, self.max * scale))
+        inc, dec = (self.inc * scale, self.dec * scale) if scale >= 0.0 else (-self.dec * scale, -self.inc * scale)
+        avg = self.sum * scale / float(self.count)
+        return {
+            "min" : min_value,
+            "max" : max_value,
+            "avg" : avg,
+            "sum" : self.sum * scale,
+            "std" : (self.m2 / self.count)**0.5 * abs(scale),
+            "median" : self.median * scale,
+            "count" : self.count,
+            "first" : self.first * scale,
+            "last" : self.last * scale,
+            "mean" : avg,
+            "inc" : inc,
+            "dec" : dec,
+            "diff" : (self.last - self.first) * scale,
+        }
+
+    def to_data(self):
+        """return data used to further encode via json"""
+        return self.__dict__
+
+    @staticmethod
+    def from_data(data):
+        """recreate from to_data() output"""
+        running_stats = RunningStats()
+        running_stats.__dict__.update(data)
+        return running_stats
+
+
+class LiveStats(object):
+    """
+    running statistics of todays data for every index key and value key
+    """
+    __filename = "livestats.json"
+
+    def __init__(self, index_keynames, value_keynames, ts_keyname, datatypes, datestring):
+        """
+        parameters:
+        index_keynames <tuple>
+        value_keynames <list>
+        ts_keyname <str>
+        datatypes <dict> value_keyname -> datatype
+        datestring <str> day of live data
+        """
+        self.__index_keynames = tuple(index_keynames)
+        self.__value_keynames = list(value_keynames)
+        self.__ts_keyname = ts_keyname
+        self.__datatypes = [datatypes.get(value_keyname, "asis") for value_keyname in self.__value_keynames]
+        self.__datestring = datestring
+        self.__data = {} # key -> [last_ts, last raw values, list of RunningStats]
+        self.dumped = None # timestamp of last dump
+        self.position = 0 # bytes of raw input file added already
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __contains__(self, key):
+        return key in self.__data and self.__data[key][2][0].count > 0
+
+    def __getitem__(self, key):
+        """return statistics of given index key like TimeseriesStats.to_data()"""
+        if key not in self: # keys without any value, stored by former versions
+            raise KeyError(key)
+        _, _, running = self.__data[key]
+        ret_data = {}
+        for datatype, value_keyname, running_stats in zip(self.__datatypes, self.__value_keynames, running):
+            scale = 1.0
+            if datatype == "percent": # percent of maximum of whole series
+                scale = 1.0 / running_stats.max if running_stats.max != 0.0 else 0.0
+            ret_data[value_keyname] = running_stats.stats(scale)
+        return ret_data
+
+    def keys(self):
+        """mimic dict, only keys with values"""
+        return [key for key in self.__data.keys() if key in self]
+
+    def items(self):
+        """mimic dict"""
+        return ((key, self[key]) for key in self.keys())
+
+    @property
+    def stats(self):
+        """all statistics like TimeseriesArrayStats.stats"""
+        return dict(self.items())
+
+    @property
+    def datestring(self):
+        """day of live data"""
+        return self.__datestring
+
+    @property
+    def value_keynames(self):
+        return self.__value_keynames
+
+    def add(self, row):
+        """
+        add one row of raw data, rows with timestamps not newer than the
+        last row of the same index key are ignored, like Timeseries.add does
+
+        parameters:
+        row <dict> with index_keynames, value_keynames and ts_keyname
+
+        returns:
+        <bool> True if row was used
+        """
+        key = tuple((str(row[index_keyname]) for index_keyname in self.__index_keynames))
+        ts = float(row[self.__ts_keyname])
+        values = [float(row[value_keyname]) for value_keyname in self.__value_keynames]
+        last_ts, last_values, running = self.__data.get(key, (None, None, None))
+        if last_ts is not None and ts <= last_ts:
+            logging.debug("timestamp %s of key %s is not steadily increasing, ignoring", ts, key)
+            return False
+        # raises DataFormatError before a new key is stored
+        converted = [convert_value(datatype, last_ts, last_values[colnum] if last_values else None, ts, values[colnum]) for colnum, datatype in enumerate(self.__datatypes)]
+        if running is None:
+            running = [RunningStats() for _ in self.__value_keynames]
+            self.__data[key] = [None, None, running]
+        for running_stats, value in zip(running, converted):
+            running_stats.add(value)
+        self.__data[key][0] = ts
+        self.__data[key][1] = values
+        return True
+
+    def update(self, filename, delimiter="\t"):
+        """
+        add all complete rows appended to raw input file since last call,
+        a partially written last line is left for the next call,
+        rows not usable for statistics are skipped
+
+        parameters:
+        filename <str> raw input file of this datestring, with headerline
+        delimiter <str>
+
+        returns:
+        <int> number of rows used
+        """
+        used = 0
+        with open(filename, "rb") as infile:
+            headerline = infile.readline()
+            if not headerline.endswith(b"\n"): # header not written completely
+                return used
+            headers = headerline.decode("utf-8").rstrip("\n").split(delimiter)
+            infile.seek(max(self.position, len(headerline)))
+            data = infile.read()
+            end = data.rfind(b"\n") + 1
+            self.position = infile.tell() - len(data) + end
+        for line in data[:end].decode("utf-8").split("\n")[:-1]:
+            try:
+                used += self.add(dict(zip(headers, line.split(delimiter))))
+            except (KeyError, ValueError, DataFormatError) as exc:
+                logging.error("row not usable for live statistics: %s", exc)
+        return used
+
+    def total_stats(self):
+        """
+        return aggregation of all statistics, like DataLogger.load_total_stats
+
+        returns:
+        <dict>
+        """
+        return DataLogger._calculate_total_stats(self.__value_keynames, self.stats)
+
+    def to_data(self):
+        """return data used to further encode via json"""
+        return {
+            "index_keynames" : self.__index_keynames,
+            "value_keynames" : self.__value_keynames,
+            "ts_keyname" : self.__ts_keyname,
+            "datatypes" : dict(zip(self.__value_keynames, self.__datatypes)),
+            "datestring" : self.__datestring,
+            "position" : self.position,
+            "data" : [[list(key), last_ts, last_values, [running_stats.to_data() for running_stats in running]] for key, (last_ts, last_values, running) in self.__data.items()]
+        }
+
+    @staticmethod
+    def from_data(data):
+        """recreate from to_data() output"""
+        livestats = LiveStats(data["index_keynames"], data["value_keynames"], data["ts_keyname"], data["datatypes"], data["datestring"])
+        livestats.position = data.get("position", 0) # former versions read whole raw file again, older rows are ignored
+        for key, last_ts, last_values, running in data["data"]:
+            livestats.__data[tuple(key)] = [last_ts, last_values, [RunningStats.from_data(running_stats) for running_stats in running]]
+        return livestats
+
+    @classmethod
+    def get_dumpfilename(cls, outdir):
+        return os.path.join(outdir, cls.__filename)
+
+    def dump(self, outdir):
+        """
+        store to outdir, written to temporary file and renamed afterwards,
+        so readers never see partial data. Several processes could dump
+        the same LiveStats, so the file is locked, and is only replaced if
+        more of the raw input file is added than in the stored one
+
+        returns:
+        <bool> True if written
+        """
+        filename = self.get_dumpfilename(outdir)
+        with open(filename + ".lock", "a+") as lockfile: # holds position of stored LiveStats
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            lockfile.seek(0)
+            stored = lockfile.read()
+            if os.path.isfile(filename) and stored and int(stored) >= self.position:
+                logging.debug("stored LiveStats are up to date, not written")
+                return False
+            with open(filename + ".tmp", "wt") as outfile:
+                json.dump(self.to_data(), outfile)
+            os.rename(filename + ".tmp", filename)
+            lockfile.truncate(0)
+            lockfile.write(str(self.position))
+        return True
+
+    @classmethod
+    def load(cls, outdir):
+        """load from outdir"""
+        with open(cls.get_dumpfilename(outdir), "rt") as infile:
+            return cls.from_data(json.load(infile))
@@ -0,0 +1,221 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+long-range store of daily TimeseriesStats of one table
+
+instead of loading the TimeseriesArrayStats of every single day, the
+daily statistics of all keys of one year are held in one file, in
+columnar layout
+
+    key x day of year x value_keyname x stat_func_name
+
+so the statistics of one key for a whole year are one contiguous block
+of this file. Days without data are NaN.
+
+files of one table, stored in <cachedir>/longtime/<project>/<tablename>/
+
+    stats_<year>.dat    <float64> native byte order, used via numpy.memmap
+    stats_<year>.json   {
+        "year" : <int>,
+        "value_keynames" : <list>,
+        "stat_func_names" : <list>,
+        "keys" : [<list> key, ...] position in list is position in data file
+    }
+"""
+import os
+import json
+import fcntl
+import datetime
+import logging
+# non std
+import numpy
+# own modules
+from datalogger4.TimeseriesStats import TimeseriesStats
+from datalogger4.CustomExceptions import *
+
+DAYS = 366 # every year has room for leap day
+
+
+class LongtimeStats(object):
+    """
+    daily statistics of all keys of one table and one year
+    """
+
+    def __init__(self, path, year):
+        """
+        parameters:
+        path <str> directory of this table
+        year <int>
+        """
+        self.__path = path
+        self.__year = int(year)
+        self.__value_keynames = None
+        self.__stat_func_names = TimeseriesStats.get_stat_func_names()
+        self.__keys = {} # key -> position in data file
+        if os.path.isfile(self.meta_filename):
+            self.__load_meta()
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def __contains__(self, key):
+        return key in self.__keys
+
+    def __load_meta(self):
+        with open(self.meta_filename, "rt") as infile:
+            meta = json.load(infile)
+        self.__value_keynames = meta["value_keynames"]
+        self.__stat_func_names = meta["stat_func_names"]
+        self.__keys = dict(((tuple(key), position) for position, key in enumerate(meta["keys"])))
+
+    def __dump_meta(self):
+        keys = [None] * len(self.__keys)
+        for key, position in self.__keys.items():
+            keys[position] = list(key)
+        with open(self.meta_filename + ".tmp", "wt") as outfile:
+            json.dump({
+                "year" : self.__year,
+                "value_keynames" : self.__value_keynames,
+                "stat_func_names" : self.__stat_func_names,
+                "keys" : keys
+            }, outfile)
+        os.rename(self.meta_filename + ".tmp", self.meta_filename)
+
+    @property
+    def year(self):
+        return self.__year
+
+    @property
+    def value_keynames(self):
+        """value_keynames of stored statistics, None if empty"""
+        return self.__value_keynames
+
+    @property
+    def stat_func_names(self):
+        return self.__stat_func_names
+
+    @property
+    def meta_filename(self):
+        return os.path.join(self.__path, "stats_%04d.json" % self.__year)
+
+    @property
+    def data_filename(self):
+        return os.path.join(self.__path, "stats_%04d.dat" % self.__year)
+
+    def keys(self):
+        """mimic dict"""
+        return self.__keys.keys()
+
+    def get_day(self, datestring):
+        """
+        return position of datestring in this year
+
+        parameters:
+        datestring <str>
+
+        returns:
+        <int>
+        """
+        date = datetime.date(*(int(part) for part in datestring.split("-")))
+        if date.year != self.__year:
+            raise KeyError("datestring %s is not in year %d" % (datestring, self.__year))
+        return date.timetuple().tm_yday - 1
+
+    def __get_map(self, mode="r"):
+        """return data file as numpy.memmap of shape (keys, days, value_keynames, stat_func_names)"""
+        shape = (len(self.__keys), DAYS, len(self.__value_keynames), len(self.__stat_func_names))
+        return numpy.memmap(self.data_filename, dtype=numpy.float64, mode=mode, shape=shape)
+
+    def add(self, datestring, tsastats):
+        """
+        store statistics of all keys of one day, an already existing day
+        will be replaced. Several processes could generate caches of the
+        same table, so this is done holding an exclusive lock.
+
+        parameters:
+        datestring <str>
+        tsastats <TimeseriesArrayStats> of this day
+        """
+        if not os.path.isdir(self.__path):
+            os.makedirs(self.__path)
+        day = self.get_day(datestring)
+        with open(self.meta_filename + ".lock", "wt") as lockfile:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            if os.path.isfile(self.meta_filename): # could be changed by other process
+                self.__load_meta()
+            if self.__value_keynames is None:
+                self.__value_keynames = list(tsastats.value_keynames)
+            elif list(tsastats.value_keynames) != self.__value_keynames:
+                raise DataFormatError("value_keynames %s do not match stored value_keynames %s" % (tsastats.value_keynames, self.__value_keynames))
+            new_keys = [key for key in tsastats.keys() if key not in self.__keys]
+            if new_keys: # append empty blocks for new keys
+                block = numpy.full((DAYS, len(self.__value_keynames), len(self.__stat_func_names)), numpy.nan)
+                with open(self.data_filename, "ab") as outfile:
+                    for key in new_keys:
+                        self.__keys[key] = len(self.__keys)
+                        outfile.write(block.tobytes())
+            data = self.__get_map("r+")
+            data[:, day] = numpy.nan # keys not existing at this day
+            for key, stats in tsastats.items():
+                data[self.__keys[key], day] = [[stats[value_keyname][stat_func_name] for stat_func_name in self.__stat_func_names] for value_keyname in self.__value_keynames]
+            data.flush()
+            del data
+            self.__dump_meta()
+        logging.debug("added statistics of %d keys on %s to %s", len(tsastats), datestring, self.data_filename)
+
+    def get(self, key):
+        """
+        return statistics of one key for every day of this year
+
+        parameters:
+        key <tuple>
+
+        returns:
+        <numpy.ndarray> shape (days, value_keynames, stat_func_names), NaN if there is no data
+        """
+        data = self.__get_map("r")
+        ret_data = numpy.array(data[self.__keys[key]]) # one contiguous read
+        del data
+        return ret_data
+
+    def get_stats(self, key, datestring_start=None, datestring_stop=None):
+        """
+        return daily statistics of one key like TimeseriesStats.stats,
+        days without data are not returned
+
+        parameters:
+        key <tuple>
+        datestring_start <str> default first day of year
+        datestring_stop <str> default last day of year
+
+        returns:
+        <dict> datestring -> <dict> value_keyname -> <dict> stat_func_name -> <float>
+        """
+        start = self.get_day(datestring_start) if datestring_start is not None else 0
+        stop = self.get_day(datestring_stop) if datestring_stop is not None else DAYS - 1
+        data = self.get(key)
+        first_day = datetime.date(self.__year, 1, 1)
+        ret_data = {}
+        for day in range(start, stop + 1):
+            if numpy.isnan(data[day]).all():
+                continue
+            datestring = (first_day + datetime.timedelta(days=day)).isoformat()
+            ret_data[datestring] = dict(((value_keyname, dict(zip(self.__stat_func_names, row))) for value_keyname, row in zip(self.__value_keynames, data[day].tolist())))
+            for stats in ret_data[datestring].values():
+                stats["count"] = int(stats["count"])
+        return ret_data
+
+    @staticmethod
+    def get_path(cachedir, project, tablename):
+        """
+        return directory of long-range store of one table
+
+        parameters:
+        cachedir <str> global cache directory
+        project <str>
+        tablename <str>
+
+        returns:
+        <str>
+        """
+        return os.path.join(cachedir, "longtime", project, tablename)
@@ -0,0 +1,233 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+memory bounded LRU cache of loaded objects, shared by all DataLogger
+instances of one process
+
+every entry has an estimated size in bytes, if the sum of all sizes
+exceeds the byte budget, least recently used entries are evicted.
+Additionally every entry could be stored with a version, if the version
+given at get() differs, the entry is dropped, this is used to detect
+cache files changed by other processes.
+Concurrent threads requesting the same missing entry via get_or_load()
+wait for the first one, so every object is loaded only once.
+"""
+import sys
+import threading
+import collections
+import logging
+
+SAMPLES = 16 # number of elements used to estimate size of large containers
+
+
+def get_size(obj, memo=None):
+    """
+    return estimated size of object in bytes, containers with more than
+    SAMPLES elements are estimated from SAMPLES evenly distributed elements
+
+    parameters:
+    obj <object>
+
+    returns:
+    <int>
+    """
+    if memo is None:
+        memo = set()
+    if id(obj) in memo:
+        return 0
+    memo.add(id(obj))
+    if hasattr(obj, "nbytes") and not isinstance(obj, type): # numpy, TimeseriesColumnar
+        return int(obj.nbytes)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        elements = list(obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        elements = list(obj) if not isinstance(obj, (list, tuple)) else obj
+    elif hasattr(obj, "__dict__"):
+        elements = list(vars(obj).values())
+        size += sys.getsizeof(vars(obj))
+    else:
+        return size
+    if len(elements) > SAMPLES:
+        step = len(elements) / SAMPLES
+        sample = [elements[int(index * step)] for index in range(SAMPLES)]
+        return size + sum((get_size(element, memo) for element in sample)) * len(elements) // SAMPLES
+    return size + sum((get_size(element, memo) for element in elements))
+
+
+class ObjectCache(object):
+    """
+    LRU cache with byte budget, thread safe
+    """
+
+    def __init__(self, max_bytes):
+        """
+        parameters:
+        max_bytes <int> budget of all entries, estimated
+        """
+        self.__max_bytes = max_bytes
+        self.__entries = collections.OrderedDict() # key -> [value, size, version], oldest first
+        self.__bytes = 0
+        self.__lock = threading.RLock()
+        self.__loading = {} # key -> threading.Lock held while loading
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    @property
+    def max_bytes(self):
+        return self.__max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value):
+        with self.__lock:
+            self.__max_bytes = value
+            self.__evict()
+
+    @property
+    def nbytes(self):
+        """estimated size of all entries"""
+        return self.__bytes
+
+    def get(self, key, version=None):
+        """
+        return cached value, raises KeyError if not found or
+        stored with other version
+
+        parameters:
+        key <tuple>
+        version <object> compared to version given at set()
+
+        returns:
+        <object>
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[2] != version:
+                logging.debug("cached %s is outdated, version %s != %s", key, entry[2], version)
+                self.__remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                raise KeyError(key)
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, version=None, size=None):
+        """
+        store value, evicting least recently used entries if necessary,
+        values larger than the whole budget are not stored
+
+        parameters:
+        key <tuple>
+        value <object>
+        version <object>
+        size <int> size in bytes, estimated if not given
+        """
+        if size is None:
+            size = get_size(value)
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+            if size > self.__max_bytes:
+                logging.info("%s with %d bytes exceeds whole cache budget, not cached", key, size)
+                return
+            self.__entries[key] = [value, size, version]
+            self.__bytes += size
+            self.__evict()
+
+    def get_or_load(self, key, loader, version=None):
+        """
+        return cached value, or call loader and store its result,
+        the cache lock is not held while loading, only callers of the
+        same key wait for each other
+
+        parameters:
+        key <tuple>
+        loader <callable> without arguments returning value
+        version <object> compared to version given at set()
+
+        returns:
+        <object>
+        """
+        try:
+            return self.get(key, version)
+        except KeyError:
+            pass
+        with self.__lock:
+            load_lock = self.__loading.setdefault(key, threading.Lock())
+        with load_lock:
+            try:
+                return self.get(key, version) # loaded by other thread meanwhile
+            except KeyError:
+                value = loader()
+                self.set(key, value, version)
+                return value
+            finally:
+                with self.__lock:
+                    if self.__loading.get(key) is load_lock:
+                        del self.__loading[key]
+
+    def resize(self, key):
+        """
+        estimate size of entry again, objects like TimeseriesArray grow
+        while data is loaded on demand
+
+        parameters:
+        key <tuple>
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return
+            size = get_size(entry[0])
+            self.__bytes += size - entry[1]
+            entry[1] = size
+            self.__evict()
+
+    def __remove(self, key):
+        _, size, _ = self.__entries.pop(key)
+        self.__bytes -= size
+
+    def __evict(self):
+        """remove least recently used entries until budget is met"""
+        while self.__bytes > self.__max_bytes and self.__entries:
+            key = next(iter(self.__entries))
+            logging.debug("evicting %s from object cache", key)
+            self.__remove(key)
+            self.evictions += 1
+
+    def invalidate(self, prefix=()):
+        """
+        remove all entries with keys starting with prefix, all if prefix is empty
+
+        parameters:
+        prefix <tuple>
+        """
+        with self.__lock:
+            for key in [key for key in self.__entries if key[:len(prefix)] == prefix]:
+                self.__remove(key)
+                self.invalidations += 1
+
+    def stats(self):
+        """return counters and usage"""
+        return {
+            "entries" : len(self.__entries),
+            "bytes" : self.__bytes,
+            "max_bytes" : self.__max_bytes,
+            "hits" : self.hits,
+            "misses" : self.misses,
+            "evictions" : self.evictions,
+            "invalidations" : self.invalidations
+        }
@@ -1,18 +1,129 @@
 #!/usr/bin/pypy
 # pylint: disable=line-too-long
+"""
+distribution of values of every Timeseries in 5 quantiles, between
+minimum and maximum of all Timeseries of one value_keyname
+
+all keys of one value_keyname are binned at once with numpy.bincount,
+in batches of about BATCH_VALUES values.
+
+files of one table-day, stored beside other cache files
+
+    quantile.npy    <int64> in numpy format, shape (keys, value_keynames, 5),
+                    -1 if not calculated for this key and value_keyname
+    quantile_index.json {
+        "keys" : [<list> key, ...] position in list is position in quantile.npy,
+        "value_keynames" : <list>,
+        "maxx" : <dict> value_keyname -> maximum, only for calculated value_keynames
+    }
+
+quantile.npy is memory mapped, so single keys are read without loading
+the whole file. Older quantile.json files are still read, without eval.
+"""
+import ast
 import json
 import os
 import logging
+# non std
+import numpy
 # own modules
 from datalogger4.CustomExceptions import *
 from datalogger4.TimeseriesArrayStats import TimeseriesArrayStats
+from datalogger4.Rollup import get_matrix
+
+QUANTS = 5 # number of quantiles
+WIDTH = 20 # width of one quantile in percent
+BATCH_VALUES = 1 << 22 # number of values binned at once
+
+
+def histogram(series, minn, maxx):
+    """
+    count values of every series in QUANTS quantiles between minn and maxx,
+    the maximum is counted in the last quantile
+
+    parameters:
+    series <list> of <numpy.ndarray>
+    minn <float> minimum of all series
+    maxx <float> maximum of all series
+
+    returns:
+    <numpy.ndarray> shape (len(series), QUANTS) of <int64>,
+        -1 for series with values outside minn to maxx or NaN
+    """
+    counts = numpy.zeros((len(series), QUANTS), dtype=numpy.int64)
+    value_range = abs(maxx - minn)
+    # if value_range is zero, skip calculations
+    if value_range == 0.0 or not series:
+        return counts
+    lengths = [len(serie) for serie in series]
+    values = numpy.concatenate([numpy.asarray(serie, dtype=numpy.float64) for serie in series])
+    positions = numpy.repeat(numpy.arange(len(series)), lengths)
+    with numpy.errstate(invalid="ignore"):
+        quants = (100 * numpy.abs(values - minn) / value_range) / WIDTH # same operations as on single values
+        valid = quants < QUANTS + 1 # False for NaN
+        quants = numpy.where(valid, quants, 0).astype(numpy.int64)
+    quants[quants == QUANTS] = QUANTS - 1 # this is the case if value == maxx
+    counts += numpy.bincount(positions[valid] * QUANTS + quants[valid], minlength=len(series) * QUANTS).reshape((len(series), QUANTS))
+    invalid = numpy.bincount(positions[~valid], minlength=len(series)) > 0
+    if invalid.any():
+        logging.error("values outside of %s to %s in %d series, skipping", minn, maxx, invalid.sum())
+        counts[invalid] = -1
+    return counts
+
+
+def calculate(tsa, tsastats, value_keynames):
+    """
+    calculate quantiles of all keys and value_keynames in batches,
+    every Timeseries is converted only once
+
+    parameters:
+    tsa <TimeseriesArray>
+    tsastats <TimeseriesArrayStats> of tsa
+    value_keynames <tuple>
+
+    returns:
+    <dict> value_keyname -> maximum of all Timeseries
+    <numpy.ndarray> shape (keys, value_keynames, QUANTS), -1 if not calculated
+    """
+    if len(tsa) == 0:
+        raise QuantileError("EmptyTsaException detected, not possible to calculate anything with nothing")
+    # get min and max over all available timeseries
+    maxx = dict(((value_keyname, max((tsstats[value_keyname]["max"] for key, tsstats in tsastats.items()))) for value_keyname in value_keynames))
+    minn = dict(((value_keyname, min((tsstats[value_keyname]["min"] for key, tsstats in tsastats.items()))) for value_keyname in value_keynames))
+    counts = numpy.full((len(tsa), len(value_keynames), QUANTS), -1, dtype=numpy.int64)
+    batch = [] # (position, values, available value_keynames)
+    batch_values = 0
+    def flush():
+        for index, value_keyname in enumerate(value_keynames):
+            entries = [(position, values[index]) for position, values, available in batch if value_keyname in available]
+            if entries:
+                counts[[position for position, _ in entries], index] = histogram([serie for _, serie in entries], minn[value_keyname], maxx[value_keyname])
+        del batch[:]
+    for position, key in enumerate(tsa.keys()):
+        try:
+            tsstats = tsastats[key]
+        except KeyError:
+            # if there is no timeseriesstats value for this particular tsa, skip it
+            logging.debug("no timeseriesstats available for index_key = %s, skipping", key)
+            continue
+        available = set((value_keyname for value_keyname in value_keynames if value_keyname in tsstats.keys()))
+        _, values = get_matrix(tsa[key], value_keynames)
+        batch.append((position, values, available))
+        batch_values += values.size
+        if batch_values >= BATCH_VALUES:
+            flush()
+            batch_values = 0
+    flush()
+    return maxx, counts
 
 
 class QuantileArray(object):
     """
     hold a number of Quantile Objects
     """
-    __filename = "quantile.json"
+    __filename = "quantile_index.json"
+    __data_filename = "quantile.npy"
+    __legacy_filename = "quantile.json"
 
     def __init__(self, tsa, tsastats=None):
         """
@@ -21,15 +132,16 @@ class QuantileArray(object):
         parameters:
         tsa <TimeseriesArray>
         """
-        self.__data = {}
         self.__keys = tuple(tsa.keys())
         self.__value_keynames = tuple(tsa.value_keynames)
-        for value_keyname in self.__value_keynames:
-            try:
-                self.__data[value_keyname] = Quantile(tsa, value_keyname, tsastats=tsastats)
-            except QuantileError as exc:
-                logging.exception(exc)
-                logging.error("skipping value_key %s", value_keyname)
+        try:
+            self.__maxx, self.__counts = calculate(tsa, tsastats, self.__value_keynames)
+        except QuantileError as exc:
+            logging.exception(exc)
+            logging.error("skipping value_keys %s", self.__value_keynames)
+            self.__maxx = {}
+            self.__counts = numpy.full((len(self.__keys), len(self.__value_keynames), QUANTS), -1, dtype=numpy.int64)
+        self.__positions = dict(((key, position) for position, key in enumerate(self.__keys)))
 
     def keys(self):
         """all available index_keys"""
@@ -43,6 +155,13 @@ class QuantileArray(object):
     def __str__(self):
         return json.dumps(self.to_data(), indent=4)
 
+    def __quantile(self, value_keyname):
+        """return Quantile of one value_keyname, raises KeyError if not calculated"""
+        if value_keyname not in self.__maxx:
+            raise KeyError("no quantile calculated for value_keyname %s" % value_keyname)
+        index = self.__value_keynames.index(value_keyname)
+        return Quantile.from_counts(self.__keys, self.__counts[:, index], self.__maxx[value_keyname])
+
     def __getitem__(self, key):
         """
         overloaded __getitem__
@@ -54,9 +173,15 @@ class QuantileArray(object):
         returns: <Quantile>
         """
         if isinstance(key, tuple):
-            return dict(((value_keyname, self.__data[value_keyname][key]) for value_keyname in self.__value_keynames))
+            row = numpy.array(self.__counts[self.__positions[key]]).tolist() # reads only this key
+            ret_data = {}
+            for value_keyname, counts in zip(self.__value_keynames, row):
+                if value_keyname not in self.__maxx or counts[0] < 0:
+                    raise KeyError("no quantile calculated for key %s and value_keyname %s" % (key, value_keyname))
+                ret_data[value_keyname] = dict(enumerate(counts))
+            return ret_data
         elif isinstance(key, str):
-            return self.__data[key]
+            return self.__quantile(key)
         else:
             raise KeyError("key %s not found" % key)
 
@@ -64,13 +189,13 @@ class QuantileArray(object):
         """test for equality"""
         try:
             assert type(self) == type(other)
-            assert self.__keys == other.keys
+            assert self.__keys == other.keys()
             assert self.__value_keynames == other.value_keynames
-            for key in self.__data.keys():
-                assert self.__data[key] == other[key]
+            for value_keyname in self.__maxx:
+                assert self.__quantile(value_keyname) == other[value_keyname]
             return True
-        except AssertionError as exc:
-            logging.debug("%s, %s", self.__keys, other.keys)
+        except (AssertionError, KeyError) as exc:
+            logging.debug("%s, %s", self.__keys, other.keys())
             logging.debug("%s, %s", self.__value_keynames, other.value_keynames)
             logging.exception(exc)
             return False
@@ -79,13 +204,27 @@ class QuantileArray(object):
     def get_dumpfilename(cls, outdir):
         return os.path.join(outdir, cls.__filename)
 
+    @classmethod
+    def exists(cls, outdir):
+        """True if there is a stored QuantileArray, in binary or older json format"""
+        return os.path.isfile(cls.get_dumpfilename(outdir)) or os.path.isfile(os.path.join(outdir, cls.__legacy_filename))
+
     def dump(self, outdir):
         """
-        dump internal data to filehandle
+        store in binary format, quantile.npy is written first, the index
+        afterwards, so the index exists only if the data is complete
         """
-        quantille_data = dict(((key, quantille.dumps()) for key, quantille in self.__data.items()))
-        with open(os.path.join(outdir, self.__filename), "wt") as outfile:
-            json.dump((quantille_data, self.__keys, self.__value_keynames), outfile)
+        data_filename = os.path.join(outdir, self.__data_filename)
+        with open(data_filename + ".tmp", "wb") as outfile:
+            numpy.save(outfile, numpy.asarray(self.__counts))
+        os.rename(data_filename + ".tmp", data_filename)
+        with open(self.get_dumpfilename(outdir) + ".tmp", "wt") as outfile:
+            json.dump({
+                "keys" : [list(key) for key in self.__keys],
+                "value_keynames" : list(self.__value_keynames),
+                "maxx" : self.__maxx
+            }, outfile)
+        os.rename(self.get_dumpfilename(outdir) + ".tmp", self.get_dumpfilename(outdir))
 
     def to_data(self):
         return {
@@ -97,24 +236,47 @@ class QuantileArray(object):
         """
         dump internal data to json
         """
-        quantille_data = dict(((key, quantille.dumps()) for key, quantille in self.__data.items()))
+        quantille_data = dict(((value_keyname, self.__quantile(value_keyname).dumps()) for value_keyname in self.__maxx))
         return json.dumps((quantille_data, self.__keys, self.__value_keynames))
 
+    @staticmethod
+    def __from_quantiles(quantille_data, keys, value_keynames):
+        """recreate from <dict> value_keyname -> <Quantile>, as stored in older format"""
+        qa = QuantileArray.__new__(QuantileArray)
+        # convert to tuple, to be equal to normal initialization
+        qa.__keys = tuple((tuple(key) for key in keys))
+        qa.__value_keynames = tuple(value_keynames)
+        qa.__positions = dict(((key, position) for position, key in enumerate(qa.__keys)))
+        qa.__maxx = {}
+        qa.__counts = numpy.full((len(qa.__keys), len(qa.__value_keynames), QUANTS), -1, dtype=numpy.int64)
+        for value_keyname, quantille in quantille_data.items():
+            index = qa.__value_keynames.index(value_keyname)
+            qa.__maxx[value_keyname] = quantille.maxx
+            for key, quants in quantille.quantile.items():
+                if key in qa.__positions: # skip quantile values stored as keys
+                    qa.__counts[qa.__positions[key], index] = [quants[quant] for quant in range(QUANTS)]
+        return qa
+
     @classmethod
     def load(cls, outdir):
         """
-        load data from stores json file on disk
+        load data from stored files on disk, quantile data is memory mapped
 
         parameter:
-        filehandle <file> to read from, json expected
+        outdir <str> cache directory
         """
+        if not os.path.isfile(cls.get_dumpfilename(outdir)):
+            with open(os.path.join(outdir, cls.__legacy_filename), "rt") as infile:
+                quantille_data, keys, value_keynames = json.load(infile)
+            return cls.__from_quantiles(dict(((value_keyname, Quantile.loads(data)) for value_keyname, data in quantille_data.items())), keys, value_keynames)
         qa = QuantileArray.__new__(QuantileArray)
-        with open(os.path.join(outdir, cls.__filename), "rt") as infile:
-            quantille_data, qa.__keys, qa.__value_keynames = json.load(infile)
-        # convert to tuple, to be equal to normal initialization
-        qa.__keys = tuple((tuple(key) for key in qa.__keys))
-        qa.__value_keynames = tuple(qa.__value_keynames)
-        qa.__data = dict(((key, Quantile.loads(data)) for key, data in quantille_data.items()))
+        with open(cls.get_dumpfilename(outdir), "rt") as infile:
+            meta = json.load(infile)
+        qa.__keys = tuple((tuple(key) for key in meta["keys"]))
+        qa.__value_keynames = tuple(meta["value_keynames"])
+        qa.__maxx = meta["maxx"]
+        qa.__positions = dict(((key, position) for position, key in enumerate(qa.__keys)))
+        qa.__counts = numpy.load(os.path.join(outdir, cls.__data_filename), mmap_mode="r")
         return qa
 
     @staticmethod
@@ -125,13 +287,8 @@ class QuantileArray(object):
         parameters:
         json_data <basestring> json encoded
         """
-        qa = QuantileArray.__new__(QuantileArray)
-        quantille_data, qa.__keys, qa.__value_keynames = json.loads(json_data)
-        # convert to tuple, to be equal to normal initialization
-        qa.__keys = tuple((tuple(key) for key in qa.__keys))
-        qa.__value_keynames = tuple(qa.__value_keynames)
-        qa.__data = dict(((key, Quantile.loads(data)) for key, data in quantille_data.items()))
-        return qa
+        quantille_data, keys, value_keynames = json.loads(json_data)
+        return QuantileArray.__from_quantiles(dict(((value_keyname, Quantile.loads(data)) for value_keyname, data in quantille_data.items())), keys, value_keynames)
 
 
 
@@ -140,51 +297,42 @@ class Quantile(object):
     """
     class to calulate and store quantile for one TimeseriesArray value_key
     """
-    __quants = {
-        0 : 0,
-        1 : 0,
-        2 : 0,
-        3 : 0,
-        4 : 0,
-    }
-    __width = 20
 
     def __init__(self, tsa, value_key, tsastats):
         """
         parameters:
         tsa <TimeseriesArray>
         value_key <str> must be a value_key of the Timeseries used in tsa
-        maxx    <None> to autoscale max value upon all given Timeseries in tsa
-                <float> for specific maximum value to use
+        tsastats <TimeseriesArrayStats> of tsa, used to get minimum and maximum
         """
-        self.__quantile = {}
         self.__sortlist = None
-        if len(tsa) == 0:
-            raise QuantileError("EmptyTsaException detected, not possible to calculate anything with nothing")
-        # get min and max over all available timeseries
-        self.__maxx = max((tsstats[value_key]["max"] for key, tsstats in tsastats.items()))
-        self.__minn = min((tsstats[value_key]["min"] for key, tsstats in tsastats.items()))
-        # do the calculations
-        # width of each quantile
-        width = int(100 / (len(self.__quants.keys()) - 1))
-        # if __maxx or width is equal zero, empty Data
-        if (self.__maxx == 0.0) or  (width == 0):
-            self.__quantile = self.__quants.copy()
-            logging.debug("either length of data or maximum is zero, so all quantile values will be zero")
-        try:
-            for key in tsa.keys():
-                try:
-                    # if there is no timeseriesstats value for this particular tsa.
-                    # skip it
-                    tsastats[key][value_key]
-                    self.__quantile[key] = self.__calculate(tsa[key][value_key])
-                except KeyError as exc:
-                    logging.debug("no timeseriesstats available for index_key = %s and value_key = %s, skipping", key, value_key)
-        except Exception as exc:
-            logging.exception(exc)
-            logging.error("an error occured with value_key %s", value_key)
-            raise exc
-        # self.sort() # do initial sort
+        maxx, counts = calculate(tsa, tsastats, (value_key, ))
+        self.__maxx = maxx[value_key]
+        self.__quantile = self.__get_quantile(tsa.keys(), counts[:, 0])
+
+    @staticmethod
+    def __get_quantile(keys, counts):
+        """return <dict> key -> <dict> quant -> count, of calculated keys only"""
+        return dict(((key, dict(enumerate(quants))) for key, quants in zip(keys, numpy.asarray(counts).tolist()) if quants[0] >= 0))
+
+    @staticmethod
+    def from_counts(keys, counts, maxx):
+        """
+        create from calculated counts
+
+        parameters:
+        keys <tuple> of index keys
+        counts <numpy.ndarray> shape (keys, QUANTS), -1 if not calculated
+        maxx <float>
+
+        returns:
+        <Quantile>
+        """
+        quantille = Quantile.__new__(Quantile)
+        quantille.__sortlist = None
+        quantille.__maxx = maxx
+        quantille.__quantile = Quantile.__get_quantile(keys, counts)
+        return quantille
 
     @property
     def quantile(self):
@@ -209,10 +357,12 @@ class Quantile(object):
     @staticmethod
     def loads(data):
         """
-        recreate object from data string in json format
+        recreate object from data string in json format,
+        only literals are evaluated
         """
         quantille = Quantile.__new__(Quantile)
-        quantille.__quantile, quantille.__maxx = eval(json.loads(data))
+        quantille.__sortlist = None
+        quantille.__quantile, quantille.__maxx = ast.literal_eval(json.loads(data))
         #quantille.sort()
         return quantille
 
@@ -229,31 +379,6 @@ class Quantile(object):
     def __getitem__(self, key):
         return self.__quantile[key]
 
-    def __calculate(self, series):
-        """
-        actually do the calculations
-        """
-        quants = self.__quants.copy()
-        # TODO: Performance Optimization needed
-        # the range from __minn to __maxx
-        # __maxx and __minn both can be negative
-        value_range = abs(self.__maxx - self.__minn)
-        # if value_range is zero, skip calculations
-        if value_range == 0.0:
-            return quants
-        for value in series:
-            quant = (100 * abs(value - self.__minn) / value_range) / self.__width
-            try:
-                quants[int(quant)] += 1
-            except KeyError as exc:
-                # this is the case if value == __maxx
-                if int(quant) == len(quants):
-                    quants[int(quant) - 1] += 1
-                else:
-                    logging.error("quant = %s, value = %s, __maxx = %s, __minn = %s, width = %s", quant, value, self.__maxx, self.__minn, self.__width)
-                    raise exc
-        return quants
-
     def head(self, maxlines=10):
         """
         output head
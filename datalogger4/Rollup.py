@@ -0,0 +1,210 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+multi-resolution rollup pyramid of all Timeseries of one table-day
+
+like Timeseries.resample, values are aggregated in buckets of fixed
+time intervals, but instead of one aggregation function, min, max, avg
+and count of every bucket are stored, so a series could be drawn as
+average line with min/max band at every tier.
+
+buckets of every tier are aligned to multiples of the coarsest tier,
+starting before the first timestamp of this day, there are so many
+buckets as needed to hold the last timestamp of this day. Raw data
+of one day is not always aligned to local midnight.
+Tiers are stored in one file per tier, in columnar layout
+
+    key x bucket x value_keyname x (min, max, avg, count)
+
+files of one table-day, stored beside other cache files
+
+    rollup_<interval>.npy   <float64> in numpy format, buckets without data are NaN
+    rollup.json {
+        "start_ts" : <float> start of first bucket,
+        "tiers" : <list> of <int> intervals in seconds,
+        "value_keynames" : <list>,
+        "keys" : [<list> key, ...] position in list is position in tier files
+    }
+
+the daily tier is not stored here, the LongtimeStats of this table
+already hold min, max, avg and count of every day
+"""
+import os
+import json
+import logging
+# non std
+import numpy
+
+TIERS = (300, 3600) # intervals of stored tiers in seconds
+FUNCS = ("min", "max", "avg", "count") # aggregations of every bucket
+
+
+def get_matrix(timeseries, headers):
+    """
+    return timestamps and values of Timeseries or TimeseriesColumnar
+
+    parameters:
+    timeseries <Timeseries> or <TimeseriesColumnar>
+    headers <list> order of value rows, converted columns could be
+        in another order than value_keynames of TimeseriesArray
+
+    returns:
+    <numpy.ndarray> shape (length, ) of timestamps
+    <numpy.ndarray> shape (headers, length) of values
+    """
+    order = [list(timeseries.headers).index(header) for header in headers]
+    if hasattr(timeseries, "times"): # TimeseriesColumnar
+        return timeseries.times, timeseries.values[order]
+    matrix = numpy.array(timeseries.data, dtype=numpy.float64).reshape((len(timeseries), len(timeseries.headers) + 1))
+    return matrix[:, 0], matrix[:, 1:].T[order]
+
+
+def rollup(times, values, start_ts, interval, buckets):
+    """
+    aggregate values in buckets of interval seconds, starting at start_ts,
+    values outside of all buckets are ignored
+
+    parameters:
+    times <numpy.ndarray> steadily increasing timestamps
+    values <numpy.ndarray> shape (headers, length)
+    start_ts <float> begin of first bucket
+    interval <int> length of one bucket in seconds
+    buckets <int> number of buckets
+
+    returns:
+    <numpy.ndarray> shape (buckets, headers, len(FUNCS)), NaN in buckets without data
+    """
+    ret_data = numpy.full((buckets, values.shape[0], len(FUNCS)), numpy.nan)
+    bucket_nums = numpy.floor((numpy.asarray(times) - start_ts) / interval).astype(numpy.int64)
+    valid = (bucket_nums >= 0) & (bucket_nums < buckets)
+    bucket_nums = bucket_nums[valid]
+    if not len(bucket_nums):
+        return ret_data
+    values = numpy.asarray(values, dtype=numpy.float64)[:, valid]
+    # timestamps are increasing, so every bucket is one slice of values
+    used, starts = numpy.unique(bucket_nums, return_index=True)
+    counts = numpy.diff(numpy.append(starts, len(bucket_nums)))
+    ret_data[used, :, 0] = numpy.minimum.reduceat(values, starts, axis=1).T
+    ret_data[used, :, 1] = numpy.maximum.reduceat(values, starts, axis=1).T
+    ret_data[used, :, 2] = (numpy.add.reduceat(values, starts, axis=1) / counts).T
+    ret_data[used, :, 3] = counts[:, numpy.newaxis]
+    return ret_data
+
+
+class Rollup(object):
+    """
+    read access to stored rollup tiers of one table-day
+    """
+    __filename = "rollup.json"
+
+    def __init__(self, path):
+        """
+        parameters:
+        path <str> cache directory of one table-day
+        """
+        self.__path = path
+        with open(self.get_dumpfilename(path), "rt") as infile:
+            meta = json.load(infile)
+        self.__start_ts = meta["start_ts"]
+        self.__tiers = meta["tiers"]
+        self.__value_keynames = meta["value_keynames"]
+        self.__keys = dict(((tuple(key), position) for position, key in enumerate(meta["keys"])))
+
+    def __contains__(self, key):
+        return key in self.__keys
+
+    @property
+    def start_ts(self):
+        return self.__start_ts
+
+    @property
+    def tiers(self):
+        return self.__tiers
+
+    @property
+    def value_keynames(self):
+        return self.__value_keynames
+
+    def keys(self):
+        """mimic dict"""
+        return self.__keys.keys()
+
+    def get(self, key, interval):
+        """
+        return rollup of one key at one tier
+
+        parameters:
+        key <tuple>
+        interval <int> one of tiers
+
+        returns:
+        <numpy.ndarray> shape (buckets, value_keynames, len(FUNCS))
+        """
+        data = numpy.load(self.get_tier_filename(self.__path, interval), mmap_mode="r")
+        return numpy.array(data[self.__keys[key]])
+
+    def get_rows(self, key, interval, value_keyname):
+        """
+        return buckets with data of one key and value_keyname
+
+        parameters:
+        key <tuple>
+        interval <int> one of tiers
+        value_keyname <str>
+
+        returns:
+        <list> of [ts, min, max, avg, count]
+        """
+        data = self.get(key, interval)[:, self.__value_keynames.index(value_keyname)]
+        return [[self.__start_ts + bucket * interval, ] + row for bucket, row in enumerate(data.tolist()) if row[3] == row[3]] # NaN != NaN
+
+    @classmethod
+    def get_dumpfilename(cls, path):
+        return os.path.join(path, cls.__filename)
+
+    @staticmethod
+    def get_tier_filename(path, interval):
+        return os.path.join(path, "rollup_%d.npy" % interval)
+
+    @staticmethod
+    def exists(path):
+        """True if there are stored rollup tiers in path"""
+        return os.path.isfile(Rollup.get_dumpfilename(path))
+
+    @staticmethod
+    def dump(path, tsa, tiers=TIERS):
+        """
+        calculate and store all tiers of TimeseriesArray
+
+        parameters:
+        path <str> cache directory of one table-day
+        tsa <TimeseriesArray> of this day, finalized
+        tiers <tuple> intervals in seconds, every one a multiple of the finer ones
+        """
+        keys = list(tsa.keys())
+        lengths = [len(tsa[key]) for key in keys]
+        first_ts = min([float(tsa[key].start_ts) for key, length in zip(keys, lengths) if length] or [0.0])
+        last_ts = max([float(tsa[key].stop_ts) for key, length in zip(keys, lengths) if length] or [0.0])
+        start_ts = first_ts - first_ts % max(tiers)
+        # written key by key to memory mapped files, so no tier is held in memory
+        tier_data = {}
+        for interval in tiers:
+            buckets = int((last_ts - start_ts) // interval) + 1
+            tier_data[interval] = numpy.lib.format.open_memmap(Rollup.get_tier_filename(path, interval) + ".tmp", mode="w+", dtype=numpy.float64, shape=(len(keys), buckets, len(tsa.value_keynames), len(FUNCS)))
+        for position, key in enumerate(keys):
+            times, values = get_matrix(tsa[key], tsa.value_keynames)
+            for interval, data in tier_data.items():
+                data[position] = rollup(times, values, start_ts, interval, data.shape[1])
+        for interval, data in tier_data.items():
+            data.flush()
+            os.rename(Rollup.get_tier_filename(path, interval) + ".tmp", Rollup.get_tier_filename(path, interval))
+        tier_data.clear() # unmap files
+        with open(Rollup.get_dumpfilename(path) + ".tmp", "wt") as outfile:
+            json.dump({
+                "start_ts" : start_ts,
+                "tiers" : list(tiers),
+                "value_keynames" : list(tsa.value_keynames),
+                "keys" : [list(key) for key in keys]
+            }, outfile)
+        os.rename(Rollup.get_dumpfilename(path) + ".tmp", Rollup.get_dumpfilename(path))
+        logging.debug("written rollup tiers %s of %d keys to %s", tiers, len(keys), path)
@@ -0,0 +1,221 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+trigram index of all index keys of all tables of one datestring
+
+every index key is searched by its string representation, like
+str(("srv1", "eth0")), for every trigram of this string there is a list
+of entries containing this trigram. To find a pattern only the entries
+of the rarest trigrams of the pattern are compared, not every key
+of every table.
+
+stored in <cachedir>/<datestring>/searchindex.json and updated table by
+table, everytime the caches of one table are generated
+"""
+import os
+import json
+import fcntl
+import logging
+
+
+class SearchIndex(object):
+    """
+    trigram index of index keys of many tables
+    """
+    __filename = "searchindex.json"
+
+    def __init__(self):
+        self.__tables = [] # [project, tablename, index_keynames] or None if removed
+        self.__entries = [] # [table number, key] or None if removed
+        self.__trigrams = {} # trigram -> list of entry numbers
+        self.__removed = 0 # number of removed entries
+
+    def __len__(self):
+        return len(self.__entries) - self.__removed
+
+    @staticmethod
+    def get_trigrams(text):
+        """
+        return all distinct trigrams of text
+
+        parameters:
+        text <str>
+
+        returns:
+        <set> of <str>
+        """
+        return set((text[pos:pos + 3] for pos in range(len(text) - 2)))
+
+    def tables(self):
+        """return list of indexed (project, tablename)"""
+        return [(table[0], table[1]) for table in self.__tables if table is not None]
+
+    def __get_table(self, project, tablename):
+        """return number of table or None"""
+        for tablenum, table in enumerate(self.__tables):
+            if table is not None and table[0] == project and table[1] == tablename:
+                return tablenum
+        return None
+
+    def remove(self, project, tablename):
+        """
+        remove all keys of one table
+
+        parameters:
+        project <str>
+        tablename <str>
+        """
+        tablenum = self.__get_table(project, tablename)
+        if tablenum is None:
+            return
+        for entrynum, entry in enumerate(self.__entries):
+            if entry is not None and entry[0] == tablenum:
+                self.__entries[entrynum] = None # trigram lists are cleaned on dump
+                self.__removed += 1
+        self.__tables[tablenum] = None
+
+    def update(self, project, tablename, index_keynames, keys):
+        """
+        replace all keys of one table
+
+        parameters:
+        project <str>
+        tablename <str>
+        index_keynames <tuple>
+        keys <iterable> of <tuple>
+        """
+        self.remove(project, tablename)
+        tablenum = len(self.__tables)
+        self.__tables.append([project, tablename, list(index_keynames)])
+        for key in keys:
+            entrynum = len(self.__entries)
+            self.__entries.append([tablenum, tuple(key)])
+            for trigram in self.get_trigrams(str(tuple(key))):
+                self.__trigrams.setdefault(trigram, []).append(entrynum)
+
+    def search(self, pattern, limit=None):
+        """
+        return all keys containing pattern in their string representation,
+        best matches first:
+            1. one index value is equal to pattern
+            2. one index value starts with pattern
+            3. pattern is somewhere in key
+        shorter keys are ranked higher within the same group
+
+        parameters:
+        pattern <str> at least 3 characters long
+        limit <int> return only this number of matches, default all
+
+        returns:
+        <list> of (project <str>, tablename <str>, index_keynames <tuple>, key <tuple>)
+        """
+        if len(pattern) < 3:
+            raise AttributeError("pattern must be at least 3 characters long")
+        candidates = None
+        for trigram in sorted(self.get_trigrams(pattern), key=lambda trigram: len(self.__trigrams.get(trigram, ()))): # rarest first
+            entries = self.__trigrams.get(trigram)
+            if not entries:
+                return []
+            candidates = set(entries) if candidates is None else candidates.intersection(entries)
+            if not candidates:
+                return []
+        matches = []
+        for entrynum in candidates:
+            entry = self.__entries[entrynum]
+            if entry is None:
+                continue
+            tablenum, key = entry
+            str_key = str(key)
+            if pattern not in str_key: # trigrams could be found in different places
+                continue
+            if pattern in key:
+                rank = 0
+            elif any((value.startswith(pattern) for value in key)):
+                rank = 1
+            else:
+                rank = 2
+            project, tablename, index_keynames = self.__tables[tablenum]
+            matches.append(((rank, len(str_key), project, tablename, str_key), (project, tablename, tuple(index_keynames), key)))
+        matches.sort(key=lambda match: match[0])
+        return [match[1] for match in matches[:limit]]
+
+    def to_data(self):
+        """return data used to further encode via json, removed entries are dropped"""
+        if self.__removed or None in self.__tables:
+            self.__compact()
+        return {
+            "tables" : self.__tables,
+            "entries" : [[tablenum, list(key)] for tablenum, key in self.__entries],
+            "trigrams" : self.__trigrams
+        }
+
+    def __compact(self):
+        """rebuild index without removed tables and entries"""
+        data = [(table, [entry[1] for entry in self.__entries if entry is not None and entry[0] == tablenum]) for tablenum, table in enumerate(self.__tables) if table is not None]
+        self.__init__()
+        for (project, tablename, index_keynames), keys in data:
+            self.update(project, tablename, index_keynames, keys)
+
+    @staticmethod
+    def from_data(data):
+        """recreate from to_data() output"""
+        search_index = SearchIndex()
+        search_index.__tables = data["tables"]
+        search_index.__entries = [[tablenum, tuple(key)] for tablenum, key in data["entries"]]
+        search_index.__trigrams = data["trigrams"]
+        return search_index
+
+    @classmethod
+    def get_dumpfilename(cls, path):
+        return os.path.join(path, cls.__filename)
+
+    def dump(self, path):
+        """
+        store in path, written to temporary file and renamed afterwards,
+        so readers never see partial data
+
+        parameters:
+        path <str> cache directory of one datestring
+        """
+        filename = self.get_dumpfilename(path)
+        with open(filename + ".tmp", "wt") as outfile:
+            json.dump(self.to_data(), outfile)
+        os.rename(filename + ".tmp", filename)
+        logging.debug("written SearchIndex with %d keys to %s", len(self), filename)
+
+    @classmethod
+    def load(cls, path):
+        """load from path"""
+        with open(cls.get_dumpfilename(path), "rt") as infile:
+            return cls.from_data(json.load(infile))
+
+    @classmethod
+    def exists(cls, path):
+        """True if there is a stored SearchIndex in path"""
+        return os.path.isfile(cls.get_dumpfilename(path))
+
+    @classmethod
+    def update_file(cls, path, project, tablename, index_keynames=None, keys=None):
+        """
+        replace keys of one table in stored SearchIndex, or remove this
+        table if keys is None. The stored index is created if not existing.
+        Several processes could generate caches of the same datestring,
+        so read and write is done holding an exclusive lock.
+
+        parameters:
+        path <str> cache directory of one datestring
+        project <str>
+        tablename <str>
+        index_keynames <tuple>
+        keys <iterable> of <tuple> or None
+        """
+        if keys is None and not cls.exists(path):
+            return
+        with open(cls.get_dumpfilename(path) + ".lock", "wt") as lockfile:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            search_index = cls.load(path) if cls.exists(path) else cls()
+            if keys is None:
+                search_index.remove(project, tablename)
+            else:
+                search_index.update(project, tablename, index_keynames, keys)
+            search_index.dump(path)
@@ -0,0 +1,136 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+merge statistics of many Timeseries to statistics of groups of them,
+without loading any Timeseries, like all Timeseries of one hostname,
+or all Timeseries of a table to total statistics
+
+the statistics of one group are the statistics of all values of its
+Timeseries, merged from TimeseriesStats and their partials
+
+    count, sum, inc, dec    sum of all
+    min, max                minimum, maximum of all
+    avg, mean               sum / count
+    std                     population standard deviation of all values,
+                            from sums of squared deviations m2
+    first, last             value of Timeseries with earliest first_ts,
+                            latest last_ts, in given order if unknown
+    diff                    last - first
+    median                  median of medians weighted by count,
+                            the only approximated value
+
+all groups and value_keynames are merged at once with numpy ufunc.at
+"""
+# non std
+import numpy
+# own modules
+from datalogger4.TimeseriesStats import TimeseriesStats, derive_partials
+
+PARTIAL_NAMES = ("count", "sum", "min", "max", "avg", "first", "last", "median", "inc", "dec")
+
+
+def get_partials(tsstats_list, value_keynames):
+    """
+    collect statistics and partials of many Timeseries in arrays
+
+    parameters:
+    tsstats_list <list> of <TimeseriesStats> or <dict> like TimeseriesStats.stats
+    value_keynames <list>
+
+    returns:
+    <dict> name of PARTIAL_NAMES or m2 -> <numpy.ndarray> shape (tsstats, value_keynames),
+        first_ts, last_ts -> <numpy.ndarray> shape (tsstats, ), NaN if unknown
+    """
+    shape = (len(tsstats_list), len(value_keynames))
+    partials = dict(((name, numpy.empty(shape)) for name in PARTIAL_NAMES + ("m2", )))
+    partials["first_ts"] = numpy.full(len(tsstats_list), numpy.nan)
+    partials["last_ts"] = numpy.full(len(tsstats_list), numpy.nan)
+    for row, tsstats in enumerate(tsstats_list):
+        if isinstance(tsstats, TimeseriesStats):
+            tsstats_partials = tsstats.partials
+        else: # for example LiveStats
+            tsstats_partials = derive_partials(tsstats)
+        if tsstats_partials["first_ts"] is not None:
+            partials["first_ts"][row] = tsstats_partials["first_ts"]
+            partials["last_ts"][row] = tsstats_partials["last_ts"]
+        for col, value_keyname in enumerate(value_keynames):
+            stats = tsstats[value_keyname]
+            for name in PARTIAL_NAMES:
+                partials[name][row, col] = stats[name]
+            partials["m2"][row, col] = tsstats_partials["m2"][value_keyname]
+    return partials
+
+
+def merge(tsstats_list, group_keys, value_keynames):
+    """
+    merge statistics of all Timeseries with the same group key
+
+    parameters:
+    tsstats_list <list> of <TimeseriesStats> or <dict> like TimeseriesStats.stats
+    group_keys <list> of <tuple> group key of every item of tsstats_list
+    value_keynames <list>
+
+    returns:
+    <dict> group key -> (<dict> like TimeseriesStats.stats, <dict> like TimeseriesStats.partials)
+    """
+    distinct = {}
+    groups = numpy.array([distinct.setdefault(group_key, len(distinct)) for group_key in group_keys], dtype=numpy.int64)
+    if not distinct:
+        return {}
+    partials = get_partials(tsstats_list, value_keynames)
+    shape = (len(distinct), len(value_keynames))
+    def reduce(ufunc, values, initial):
+        reduced = numpy.full(shape, initial)
+        ufunc.at(reduced, groups, values)
+        return reduced
+    count = reduce(numpy.add, partials["count"], 0.0)
+    total = reduce(numpy.add, partials["sum"], 0.0)
+    avg = total / count
+    # Chan et al., sum of squared deviations from avg of group
+    m2 = reduce(numpy.add, partials["m2"] + partials["count"] * (partials["avg"] - avg[groups]) ** 2, 0.0)
+    merged = {
+        "min" : reduce(numpy.minimum, partials["min"], numpy.inf),
+        "max" : reduce(numpy.maximum, partials["max"], -numpy.inf),
+        "avg" : avg,
+        "sum" : total,
+        "std" : numpy.sqrt(m2 / count),
+        "median" : numpy.empty(shape),
+        "count" : count,
+        "first" : None,
+        "last" : None,
+        "mean" : avg,
+        "inc" : reduce(numpy.add, partials["inc"], 0.0),
+        "dec" : reduce(numpy.add, partials["dec"], 0.0),
+        "diff" : None,
+    }
+    # sorted by group, then by timestamp, unknown timestamps (NaN) last,
+    # ties in given order for first, in reversed order for last
+    starts = numpy.searchsorted(numpy.sort(groups), numpy.arange(len(distinct)))
+    rows = numpy.arange(len(groups))
+    first_rows = numpy.lexsort((rows, partials["first_ts"], groups))[starts]
+    last_rows = numpy.lexsort((-rows, -partials["last_ts"], groups))[starts]
+    merged["first"] = partials["first"][first_rows]
+    merged["last"] = partials["last"][last_rows]
+    merged["diff"] = merged["last"] - merged["first"]
+    # weighted median, first median of group reaching half of count
+    for col in range(len(value_keynames)):
+        order = numpy.lexsort((partials["median"][:, col], groups))
+        cumulated = numpy.cumsum(partials["count"][order, col])
+        before = numpy.concatenate(([0.0, ], cumulated))[starts]
+        merged["median"][:, col] = partials["median"][order[numpy.searchsorted(cumulated, before + count[:, col] / 2.0)], col]
+    merged = dict(((name, values.tolist()) for name, values in merged.items()))
+    first_ts = numpy.where(numpy.isnan(partials["first_ts"][first_rows]), None, partials["first_ts"][first_rows]).tolist()
+    last_ts = numpy.where(numpy.isnan(partials["last_ts"][last_rows]), None, partials["last_ts"][last_rows]).tolist()
+    m2 = m2.tolist()
+    ret_data = {}
+    for group_key, group in distinct.items():
+        stats = {}
+        for col, value_keyname in enumerate(value_keynames):
+            stats[value_keyname] = dict(((name, merged[name][group][col]) for name in TimeseriesStats.stat_funcs))
+            stats[value_keyname]["count"] = int(stats[value_keyname]["count"])
+        ret_data[group_key] = (stats, {
+            "first_ts" : first_ts[group],
+            "last_ts" : last_ts[group],
+            "m2" : dict(zip(value_keynames, m2[group]))
+        })
+    return ret_data
@@ -2,7 +2,11 @@
 # pylint: disable=line-too-long
 """Module for class Timeseries"""
 import logging
+# non std
+import numpy
 # own modules
+from datalogger4 import Datatypes
+from datalogger4 import TimeseriesBinary
 from datalogger4.CustomExceptions import *
 from datalogger4.TimeseriesStats import TimeseriesStats
 
@@ -719,6 +723,31 @@ class Timeseries(object):
         else:
             self.append(newcolname, newseries)
 
+    def convert_many(self, datatypes):
+        """
+        convert many existing columns to given datatypes in one pass,
+        same result as calling convert(colname, datatype, None) for every
+        item in datatypes, converted columns are moved to the end
+
+        parameters:
+        datatypes <dict> colname -> datatype, datatype "asis" will be skipped
+
+        returns:
+        <None>
+        """
+        colnames = [colname for colname, datatype in datatypes.items() if datatype != "asis"]
+        if not colnames:
+            return
+        if not self.data:
+            logging.error("Empty Timeseries, nothing to convert")
+            return
+        colnums = [self.__get_colnum(colname) for colname in colnames]
+        matrix = numpy.array(self.data, dtype=numpy.float64)
+        converted = Datatypes.convert_columns(matrix[:, 0], matrix[:, colnums].T, [datatypes[colname] for colname in colnames])
+        keep = [colnum for colnum in range(len(self.__headers) + 1) if colnum not in colnums]
+        self.data = numpy.concatenate((matrix[:, keep], converted.T), axis=1).tolist()
+        self.__headers = [header for header in self.__headers if header not in colnames] + colnames
+
     def add_derive_col(self, colname, colname_d):
         self.logger.info("DEPRECATED function add_derive_col use convert(%s, 'derive', %s)", colname, colname_d)
         return self.convert(colname, "derive", colname_d)
@@ -902,3 +931,26 @@ class Timeseries(object):
             logging.error("Error while reading from filehandle")
             raise exc
     load_from_csv = load
+
+    def dump_binary(self, filehandle):
+        """
+        write internal data to filehandle in binary format,
+        see module TimeseriesBinary
+
+        parameters:
+        filehandle <file> opened in binary mode
+        """
+        matrix = numpy.array(self.data, dtype=numpy.float64).reshape((len(self.data), len(self.__headers) + 1))
+        TimeseriesBinary.dump_columns(filehandle, self.__ts_keyname, self.__headers, matrix[:, 0], matrix[:, 1:].T)
+
+    @staticmethod
+    def load_binary(filehandle):
+        """
+        recreate Timeseries Object from binary filehandle,
+        written by dump_binary
+        """
+        ts_keyname, headers, times, values = TimeseriesBinary.load_columns(filehandle)
+        timeseries = Timeseries(headers, ts_keyname)
+        for row in numpy.column_stack((times, values.T)).tolist():
+            timeseries.add_from_csv(row[0], row[1:])
+        return timeseries
@@ -8,9 +8,13 @@ import re
 import logging
 import json
 import os
+import io
 import gzip
 # own modules
+from datalogger4 import TimeseriesBinary
 from datalogger4.Timeseries import Timeseries
+from datalogger4.TimeseriesPack import TimeseriesPack
+from datalogger4.KeyIndex import KeyIndex
 from datalogger4.TimeseriesArrayStats import TimeseriesArrayStats
 from datalogger4.b64 import b64encode, b64decode, b64eval
 
@@ -37,22 +41,27 @@ class TimeseriesArray(object):
         "len" : len,
     }
 
-    def __init__(self, index_keynames, value_keynames, ts_key="ts", datatypes=None, cache=False):
+    def __init__(self, index_keynames, value_keynames, ts_key="ts", datatypes=None, cache=False, timeseries_class=Timeseries, use_mmap=False):
         """
         index_keys <tuple> column names of index columns
         value_keys <tuple> column names of value columns
         ts_key <str> name of timestamp column
         datatypes <list> list of used datatypes
         cache <bool> should already loaded timeseries be cached, useful to calculate quantiles
+        timeseries_class <class> Timeseries implementation to use, Timeseries or TimeseriesColumnar
+        use_mmap <bool> memory map uncompressed binary Timeseries files, if timeseries_class supports it
         """
         self.__index_keynames = tuple([value for value in index_keynames])
         self.__value_keynames = list([value for value in value_keynames])
         self.__ts_key = ts_key
         self.__cache = cache
+        self.__timeseries_class = timeseries_class
+        self.__use_mmap = use_mmap
         # define instance data
         self.__debug = False
         self.__data = {} # holds data
         self.ts_autoload = {} # holds key to ts filename dict
+        self.pack = None # TimeseriesPack if Timeseries are stored in one container file
         self.datatypes = datatypes
         self.__group_keyname = None # for future use
         self.__group_func = None # for future use
@@ -150,6 +159,16 @@ class TimeseriesArray(object):
         """keyname of timestamp"""
         return self.__ts_key
 
+    @property
+    def timeseries_class(self):
+        """class used to create and load Timeseries objects"""
+        return self.__timeseries_class
+
+    @property
+    def use_mmap(self):
+        """True if uncompressed binary Timeseries files are memory mapped"""
+        return self.__use_mmap
+
     @property
     def stats(self):
         """return TimeseriesArrayStats from self"""
@@ -252,7 +271,7 @@ class TimeseriesArray(object):
             if index_key not in self.keys():
                 # if this key is new, create empty Timeseries object
                 logging.debug("first entry for index_key : %s", index_key)
-                self[index_key] = Timeseries(self.__value_keynames)
+                self[index_key] = self.__timeseries_class(self.__value_keynames)
             if group_func is not None:
                 self[index_key].group_add(ts, values, group_func)
             else:
@@ -348,10 +367,7 @@ class TimeseriesArray(object):
             raise AttributeError("operation only applicable in cache mode, set <TimeseriesArray>.cache=True")
         # convert raw timeseries to datatype specified
         for timeseries in self.__data.values():
-            for colname, datatype in self.datatypes.items():
-                if datatype == "asis":
-                    continue
-                timeseries.convert(colname, datatype, None)
+            timeseries.convert_many(self.datatypes)
         self.__finalized = True
 
     def convert(self, colname, datatype, newcolname=None):
@@ -447,7 +463,7 @@ class TimeseriesArray(object):
         returns:
         TimeseriesArray
         """
-        ret_data = TimeseriesArray(index_keynames=self.__index_keynames, value_keynames=colnames, ts_key=self.__ts_key)
+        ret_data = TimeseriesArray(index_keynames=self.__index_keynames, value_keynames=colnames, ts_key=self.__ts_key, timeseries_class=self.__timeseries_class)
         for key in self.keys():
             ret_data[key] = self[key].slice(colnames)
         return ret_data
@@ -471,14 +487,16 @@ class TimeseriesArray(object):
                 row.update(key_dict) # add index_keys to every row
                 yield row
 
-    def dump(self, outpath, overwrite=False):
+    def dump(self, outpath, overwrite=False, fmt="csv"):
         """
-        dump all data to directory in csv format, filename will be auto generated
+        dump all data to directory in csv or binary format, filename will be auto generated
 
         parameters:
         outpath <str> must be existing directory
         overwrite <bool> overwrite existing Timeseries files, or not
             the TimeseriesArray file is witten nonetheless if this options is set or not
+        fmt <str> format of Timeseries files, one of TimeseriesBinary.ts_formats
+            or "pack", "pack.zlib" to store all Timeseries in one container file
         """
         tsa_filename = self.get_dumpfilename(self.__index_keynames)
         logging.debug("tsa_filename: %s", tsa_filename)
@@ -489,33 +507,52 @@ class TimeseriesArray(object):
             "ts_key" : self.__ts_key,
             "ts_filenames" : []
         }
-        for key in self.keys():
-            timeseries = self[key]
-            ts_filename = self.get_ts_dumpfilename(key)
-            # skip dump, if file exists, and overwrite=False
-            ts_outfilename = os.path.join(outpath, ts_filename)
-            if not os.path.isfile(ts_outfilename) or overwrite:
-                logging.debug("dumping key %s to filename %s", key, ts_filename)
-                with gzip.open(ts_outfilename, "wt") as outfile:
-                    timeseries.dump(outfile)
-            outbuffer["ts_filenames"].append(ts_filename)
+        if fmt in ("pack", "pack.zlib"):
+            pack_filename = TimeseriesPack.get_dumpfilename(self.__index_keynames)
+            logging.debug("dumping all keys to container file %s", pack_filename)
+            TimeseriesPack.write(os.path.join(outpath, pack_filename), self.__index_keynames, self.__value_keynames, self.__ts_key, self.__get_binary_records(), compress=(fmt == "pack.zlib"))
+            outbuffer["pack_filename"] = pack_filename
+        else:
+            for key in self.keys():
+                timeseries = self[key]
+                ts_filename = self.get_ts_dumpfilename(key, fmt)
+                # skip dump, if file exists, and overwrite=False
+                ts_outfilename = os.path.join(outpath, ts_filename)
+                if not os.path.isfile(ts_outfilename) or overwrite:
+                    logging.debug("dumping key %s to filename %s", key, ts_filename)
+                    if fmt == "csv":
+                        with gzip.open(ts_outfilename, "wt") as outfile:
+                            timeseries.dump(outfile)
+                    else:
+                        with TimeseriesBinary.open_file(ts_outfilename, "wb") as outfile:
+                            timeseries.dump_binary(outfile)
+                outbuffer["ts_filenames"].append(ts_filename)
         with open(tsa_outfilename, "wt") as outfile:
             json.dump(outbuffer, outfile)
             outfile.flush()
+        KeyIndex(self.__index_keynames, self.keys(), ts_format=fmt).dump(outpath)
     dump_split = dump
 
+    def __get_binary_records(self):
+        """yield (key, Timeseries in binary format) for every key"""
+        for key in self.keys():
+            outbuffer = io.BytesIO()
+            self[key].dump_binary(outbuffer)
+            yield key, outbuffer.getvalue()
+
     @staticmethod
-    def get_ts_dumpfilename(key):
+    def get_ts_dumpfilename(key, fmt="csv"):
         """
         return filename of Timeseries dump File
 
         parameters:
         key <tuple> index_key of this particular Timeseries
+        fmt <str> format of Timeseries file, one of TimeseriesBinary.ts_formats
 
         returns:
         <str>
         """
-        return "ts_%s.csv.gz" % b64encode(key)
+        return "ts_%s%s" % (b64encode(key), TimeseriesBinary.ts_formats[fmt])
 
     @staticmethod
     def get_dumpfilename(index_keys):
@@ -540,31 +577,29 @@ class TimeseriesArray(object):
         {hostname : test}
         {hostname : test, instance: None, other: None}
 
-        TODO: to be improved
-        """
-        assert matchtype in ("and", "or")
-        matched = 0
-        for key in filterkeys.keys():
-            if filterkeys[key] is None: # ignore keys with value None
-                if matchtype == "and": # and count them as matched
-                    matched += 1
-                continue
-            if key_dict[key] == filterkeys[key]:
-                matched += 1
-        # every key must match at AND
-        if (matchtype == "and") and (matched == len(filterkeys.keys())):
-            return True
-        # at least one key must match at OR
-        elif (matchtype == "or") and (matched > 0):
-            return True
-        return False
+        see KeyIndex for possible filter conditions
+        """
+        return KeyIndex.filtermatch(key_dict, filterkeys, matchtype)
 
     @staticmethod
-    def get_ts_filenames(path, index_keys, filterkeys=None, matchtype="and"):
+    def get_ts_filenames(path, index_keys, filterkeys=None, matchtype="and", pack=None, keyindex=None):
         """
         filterkeys could be a part of existing index_keys
         all matching keys will be used
+
+        if the Timeseries are stored in one container file, the filename
+        of this container will be returned for every key, to avoid reading
+        the index of the container twice, an already opened TimeseriesPack
+        could be given in pack
+
+        if a KeyIndex is given, filterkeys are resolved with its inverted lists,
+        without reading the TimeseriesArray file
         """
+        if keyindex is not None and filterkeys is not None and keyindex.ts_format is not None:
+            if keyindex.ts_format in ("pack", "pack.zlib"):
+                pack_filename = os.path.join(path, TimeseriesPack.get_dumpfilename(index_keys))
+                return dict(((key, pack_filename) for key in keyindex.filter(filterkeys, matchtype)))
+            return dict(((key, os.path.join(path, TimeseriesArray.get_ts_dumpfilename(key, keyindex.ts_format))) for key in keyindex.filter(filterkeys, matchtype)))
         tsa_filename = TimeseriesArray.get_dumpfilename(index_keys)
         logging.debug("tsa_filename: %s", tsa_filename)
         with open(os.path.join(path, tsa_filename), "rt") as infile:
@@ -574,11 +609,18 @@ class TimeseriesArray(object):
         logging.debug("value_keys: %s", data["value_keys"])
         logging.debug("ts_key: %s", data["ts_key"])
         logging.debug("number of ts files: %s", len(data["ts_filenames"]))
+        if "pack_filename" in data:
+            if pack is None:
+                with TimeseriesPack(os.path.join(path, data["pack_filename"])) as pack:
+                    keys = [(key, data["pack_filename"]) for key in pack.keys()]
+            else:
+                keys = [(key, data["pack_filename"]) for key in pack.keys()]
+        else:
+            # only this pattern ts_(.*).csv.gz or ts_(.*).bin[.gz]
+            keys = [(b64eval(filename.split(".")[0][3:]), filename) for filename in data["ts_filenames"]]
         filenames = {}
-        for filename in data["ts_filenames"]:
+        for key, filename in keys:
             logging.debug("parsing Timeseries filename %s", filename)
-            enc_key = filename.split(".")[0][3:] # only this pattern ts_(.*).csv.gz
-            key = b64eval(enc_key)
             key_dict = dict(zip(index_keys, key))
             if filterkeys is not None:
                 if TimeseriesArray.filtermatch(key_dict, filterkeys, matchtype):
@@ -591,7 +633,7 @@ class TimeseriesArray(object):
         return filenames
 
     @staticmethod
-    def load(path, index_keys, filterkeys=None, index_pattern=None, matchtype="and", datatypes=None):
+    def load(path, index_keys, filterkeys=None, index_pattern=None, matchtype="and", datatypes=None, timeseries_class=Timeseries, use_mmap=False):
         """
         load stored tsa data from directory <path>
 
@@ -599,9 +641,11 @@ class TimeseriesArray(object):
         all matching keys will be used
 
         index_keys <tuple> * required
-        filterkeys <tuple> default None
+        filterkeys <dict> default None, see KeyIndex for possible conditions
         matchtype <str> default "and"
         index_pattern <str> for use in re.compile(index_pattern)
+        timeseries_class <class> Timeseries implementation used for autoloading
+        use_mmap <bool> memory map uncompressed binary Timeseries files, without copying data
 
         return:
         <TimeseriesArray>
@@ -611,16 +655,21 @@ class TimeseriesArray(object):
         with open(os.path.join(path, tsa_filename), "rt") as infile:
             data = json.load(infile)
         # create object
-        tsa = TimeseriesArray(data["index_keys"], data["value_keys"], data["ts_key"], datatypes=datatypes)
+        tsa = TimeseriesArray(data["index_keys"], data["value_keys"], data["ts_key"], datatypes=datatypes, timeseries_class=timeseries_class, use_mmap=use_mmap)
+        if "pack_filename" in data: # open container only once
+            tsa.pack = TimeseriesPack(os.path.join(path, data["pack_filename"]), use_mmap=use_mmap)
+        keyindex = None
+        if filterkeys is not None and KeyIndex.exists(path, index_keys):
+            keyindex = KeyIndex.load(path, index_keys)
         # load full or filter some keys
         if index_pattern is None:
-            for key, filename in tsa.get_ts_filenames(path, index_keys, filterkeys, matchtype).items():
+            for key, filename in tsa.get_ts_filenames(path, index_keys, filterkeys, matchtype, tsa.pack, keyindex).items():
                 tsa.ts_autoload[key] = filename
                 tsa[key] = None
         else:
             logging.info("using index_pattern %s to filter index_keys", index_pattern)
             rex = re.compile(index_pattern)
-            for key, filename in tsa.get_ts_filenames(path, index_keys, filterkeys, matchtype).items():
+            for key, filename in tsa.get_ts_filenames(path, index_keys, filterkeys, matchtype, tsa.pack, keyindex).items():
                 m = rex.match(str(key))
                 if m is not None:
                     tsa.ts_autoload[key] = filename
@@ -641,15 +690,36 @@ class TimeseriesArray(object):
         if key in self.ts_autoload:
             filename = self.ts_autoload[key]
             logging.debug("auto-loading Timeseries from file %s", filename)
-            with gzip.open(filename, "rt") as infile:
-                timeseries = Timeseries.load_from_csv(infile)
-            # convert raw timeseries to datatype
-            for colname, datatype in self.datatypes.items():
-                if datatype == "asis":
-                    continue
-                timeseries.convert(colname, datatype, None)
+            if self.pack is not None and filename == self.pack.filename:
+                timeseries = self.pack.load(key, self.__timeseries_class)
+            elif TimeseriesBinary.get_format(filename) == "csv":
+                with gzip.open(filename, "rt") as infile:
+                    timeseries = self.__timeseries_class.load_from_csv(infile)
+            elif self.__use_mmap and TimeseriesBinary.get_format(filename) == "bin" and hasattr(self.__timeseries_class, "from_buffer"):
+                timeseries = self.__timeseries_class.from_buffer(TimeseriesBinary.map_file(filename))
+            else:
+                with TimeseriesBinary.open_file(filename, "rb") as infile:
+                    timeseries = self.__timeseries_class.load_binary(infile)
+            # convert raw timeseries to datatype, all columns at once
+            timeseries.convert_many(self.datatypes)
             return timeseries
         else:
             raise KeyError("key %s not in TimeseriesArray", key)
 
+    def prefetch(self, keys):
+        """
+        give the kernel a hint, that Timeseries of given keys will be read soon,
+        so the disk reads could be done in background
+
+        parameters:
+        keys <iterable> of <tuple>
+        """
+        keys = [key for key in keys if key in self.ts_autoload]
+        if self.pack is not None:
+            self.pack.prefetch(keys)
+        for key in keys:
+            filename = self.ts_autoload[key]
+            if self.pack is None or filename != self.pack.filename:
+                TimeseriesBinary.prefetch_file(filename)
+
 TimeseriesArrayLazy = TimeseriesArray
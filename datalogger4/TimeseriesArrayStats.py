@@ -12,6 +12,8 @@ import os
 import logging
 # own modules
 from datalogger4.TimeseriesStats import TimeseriesStats
+from datalogger4.KeyIndex import KeyIndex
+from datalogger4.TimeseriesPack import TimeseriesPack
 from datalogger4.CustomExceptions import *
 from datalogger4.b64 import b64encode, b64decode, b64eval
 
@@ -32,6 +34,7 @@ class TimeseriesArrayStats(object):
         # define instance data
         self.__stats = {}
         self.__autoload = {} # holding filenames to load key data
+        self.__pack = None # TimeseriesPack if TimeseriesStats are stored in one container file
         self.__index_keynames = tuple(tsa.index_keynames)
         self.__value_keynames = tuple(tsa.value_keynames)
         for index_key in tsa.keys():
@@ -65,7 +68,7 @@ class TimeseriesArrayStats(object):
         autoload tsstats if key is found and value is None
         """
         if self.__stats[key] is None:
-            self.__stats[key] = self.__autoload_tsstats(self.__autoload[key])
+            self.__stats[key] = self.__autoload_tsstats(key)
         return self.__stats[key]
 
     def __delitem__(self, key):
@@ -119,7 +122,9 @@ class TimeseriesArrayStats(object):
             data = {}
             for value_key in value_keys:
                 data[value_key] = tsstat[value_key]
-            tsstat_data.append((key, json.dumps(data)))
+            partials = tsstat.partials
+            data["__partials__"] = dict(partials, m2=dict(((value_key, partials["m2"][value_key]) for value_key in value_keys)))
+            tsstat_data.append((key, data))
         outdata.append(tsstat_data)
         new_tsastat = TimeseriesArrayStats.from_json(json.dumps(outdata))
         return new_tsastat
@@ -177,10 +182,25 @@ class TimeseriesArrayStats(object):
         """
         return "tsastat_%s.json" % b64encode(index_keys)
 
+    @staticmethod
+    def get_pack_dumpfilename(index_keys):
+        """
+        create filename of container file holding all TimeseriesStats
+        from given index_keys
+
+        parameters:
+        index_keys <tuple>
+
+        returns:
+        <str>
+        """
+        return "tsastat_%s.dat" % b64encode(index_keys)
+
     def dump(self, outpath, overwrite=False):
         """
-        dump internal data to json file
-        the filename is automatically created from index_keys
+        dump internal data to json file, all TimeseriesStats are stored
+        in one TimeseriesPack container file, one json record per key
+        the filenames are automatically created from index_keys
 
         parameters:
         outpath <str> path wehere json file will be placed
@@ -188,18 +208,15 @@ class TimeseriesArrayStats(object):
         """
         #logging.info("index_keys: %s", self.__index_keynames)
         outfilename = os.path.join(outpath, self.get_dumpfilename(self.__index_keynames))
+        pack_filename = self.get_pack_dumpfilename(self.__index_keynames)
+        if (not os.path.isfile(os.path.join(outpath, pack_filename))) or (overwrite is True):
+            records = ((key, tsstats.to_json().encode("utf-8")) for key, tsstats in self.items())
+            TimeseriesPack.write(os.path.join(outpath, pack_filename), self.__index_keynames, self.__value_keynames, None, records)
         outdata = {
             "index_keys" : self.__index_keynames,
             "value_keys" : self.__value_keynames,
-            "tsstat_filenames" : []
+            "pack_filename" : pack_filename
         }
-        for key, tsstats in self.items():
-            filename = self._get_tsstat_dumpfilename(key)
-            fullfilename = os.path.join(outpath, filename)
-            if (not os.path.isfile(fullfilename)) or (overwrite is True):
-                with open(fullfilename, "wt") as outfile:
-                    tsstats.dump(outfile)
-            outdata["tsstat_filenames"].append(filename)
         with open(outfilename, "wt") as outfile:
             json.dump(outdata, outfile)
 
@@ -211,26 +228,29 @@ class TimeseriesArrayStats(object):
 
         filterkey is part
         {hostname : test}
+
+        see KeyIndex for possible filter conditions
         """
-        assert matchtype in ("and", "or")
-        matched = 0
-        for key in filterkeys.keys():
-            if key_dict[key] == filterkeys[key]:
-                matched += 1
-        # every key must match at AND
-        if (matchtype == "and") and (matched == len(filterkeys.keys())):
-            return True
-        # at least one key must match at OR
-        elif (matchtype == "or") and (matched > 0):
-            return True
-        return False
+        return KeyIndex.filtermatch(key_dict, filterkeys, matchtype)
 
     @staticmethod
     def _get_load_filenames(path, index_keys, filterkeys=None, matchtype="and"):
         """
         filterkeys could be a part of existing index_keys
         all matching keys will be used
+
+        if there is a KeyIndex in path, filterkeys are resolved with its
+        inverted lists, only stats files of matching keys are checked
+
+        only used for files of former versions, with one tsstat file per key
         """
+        if filterkeys is not None and KeyIndex.exists(path, index_keys):
+            filenames = {}
+            for key in KeyIndex.load(path, index_keys).filter(filterkeys, matchtype):
+                filename = os.path.join(path, TimeseriesArrayStats._get_tsstat_dumpfilename(key))
+                if os.path.isfile(filename): # there are no stats of empty Timeseries
+                    filenames[key] = filename
+            return filenames
         tsastat_filename = TimeseriesArrayStats.get_dumpfilename(index_keys)
         logging.debug("tsastat_filename: %s", tsastat_filename)
         with open(os.path.join(path, tsastat_filename), "rt") as infile:
@@ -242,12 +262,7 @@ class TimeseriesArrayStats(object):
         filenames = {}
         for filename in data["tsstat_filenames"]:
             logging.debug("reading key for tsstat from file %s", filename)
-            key_enc = filename.split(".")[0][7:] # only this pattern tsstat_(.*).json
-            # key_dec = b64decode(key_enc)
-            # to not use eval
-            # something like: "(u'srvcx221v2.tilak.cc', u'D:\\', u'HOST-RESOURCES-TYPES::hrStorageCompactDisc')" 
-            # key = tuple(key_dec.replace("(", "").replace("u'","").replace("', ", " ").replace("')", "").split())
-            key = b64eval(key_enc) # must be str not unicode
+            key = TimeseriesArrayStats._decode_tsstat_filename(filename)
             key_dict = dict(zip(index_keys, key))
             if filterkeys is not None:
                 if TimeseriesArrayStats._filtermatch(key_dict, filterkeys, matchtype):
@@ -259,6 +274,45 @@ class TimeseriesArrayStats(object):
                 filenames[key] = os.path.join(path, filename)
         return filenames
 
+    @staticmethod
+    def _decode_tsstat_filename(filename):
+        """
+        return key of tsstat file of former versions
+
+        parameters:
+        filename <str> like tsstat_<b64 key>.json
+
+        returns:
+        <tuple>
+        """
+        key_enc = filename.split(".")[0][7:] # only this pattern tsstat_(.*).json
+        # key_dec = b64decode(key_enc)
+        # to not use eval
+        # something like: "(u'srvcx221v2.tilak.cc', u'D:\\', u'HOST-RESOURCES-TYPES::hrStorageCompactDisc')"
+        # key = tuple(key_dec.replace("(", "").replace("u'","").replace("', ", " ").replace("')", "").split())
+        return b64eval(key_enc) # must be str not unicode
+
+    @staticmethod
+    def get_stored_keys(path, index_keys):
+        """
+        return keys of all stored TimeseriesStats, reading only the
+        index of the container file, or for files of former versions
+        the list of tsstat files, without listing the directory
+
+        parameters:
+        path <str>
+        index_keys <tuple>
+
+        returns:
+        <dict> key <tuple> -> filename <str> of container or tsstat file
+        """
+        with open(os.path.join(path, TimeseriesArrayStats.get_dumpfilename(index_keys)), "rt") as infile:
+            data = json.load(infile)
+        if "pack_filename" in data:
+            with TimeseriesPack(os.path.join(path, data["pack_filename"])) as pack:
+                return dict(((key, data["pack_filename"]) for key in pack.keys()))
+        return dict(((TimeseriesArrayStats._decode_tsstat_filename(filename), filename) for filename in data["tsstat_filenames"]))
+
     @staticmethod
     def load(path, index_keys, filterkeys=None, matchtype="and"):
         """
@@ -286,6 +340,19 @@ class TimeseriesArrayStats(object):
         tsastats.__value_keynames = tuple(indata["value_keys"])
         tsastats.__stats = {}
         tsastats.__autoload = {}
+        tsastats.__pack = None
+        if "pack_filename" in indata:
+            tsastats.__pack = TimeseriesPack(os.path.join(path, indata["pack_filename"]))
+            if filterkeys is None:
+                keys = tsastats.__pack.keys()
+            elif KeyIndex.exists(path, index_keys):
+                keys = [key for key in KeyIndex.load(path, index_keys).filter(filterkeys, matchtype) if key in tsastats.__pack]
+            else:
+                keys = [key for key in tsastats.__pack.keys() if TimeseriesArrayStats._filtermatch(dict(zip(index_keys, key)), filterkeys, matchtype)]
+            for key in keys:
+                tsastats.__autoload[key] = None # read from container
+                tsastats.__stats[key] = None
+            return tsastats
         #for filename in indata["tsstat_filenames"]:
         for key, filename in tsastats._get_load_filenames(path, index_keys, filterkeys, matchtype).items():
             #logging.info("loading TimeseriesStats object from %s", fullfilename)
@@ -295,11 +362,13 @@ class TimeseriesArrayStats(object):
             tsastats.__stats[key] = None
         return tsastats
 
-    def __autoload_tsstats(self, filename):
+    def __autoload_tsstats(self, key):
         """
         autoload some stores TimeseriesStats from disk
         """
-        with open(filename, "rt") as infile:
+        if self.__pack is not None:
+            return TimeseriesStats.from_json(self.__pack.read(key).decode("utf-8"))
+        with open(self.__autoload[key], "rt") as infile:
             return TimeseriesStats.load(infile)
 
     def to_data(self):
@@ -310,8 +379,8 @@ class TimeseriesArrayStats(object):
         ret_data = {
             "index_keynames" : self.__index_keynames,
             "value_keynames" : self.__value_keynames,
-            "tsstats_filenames" : [self._get_tsstat_dumpfilename(key) for key in self.keys()],
-            "tsastats_filename" : self.get_dumpfilename(self.__index_keynames)
+            "tsastats_filename" : self.get_dumpfilename(self.__index_keynames),
+            "pack_filename" : self.get_pack_dumpfilename(self.__index_keynames)
             }
         return ret_data
 
@@ -334,6 +403,8 @@ class TimeseriesArrayStats(object):
         tsastats.__index_keynames = tuple(indata[0])
         tsastats.__value_keynames = tuple(indata[1])
         tsastats.__stats = {}
+        tsastats.__autoload = {}
+        tsastats.__pack = None
         for key, tsstats in indata[2]:
             # from json there are only list, but these are not hashable,
             # so convert key to tuple
@@ -0,0 +1,172 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+binary file format for Timeseries dumps
+
+layout of one file, all numbers little endian:
+
+    8 bytes  magic b"DLTSBIN1"
+    4 bytes  <uint32> length of json header in bytes
+    n bytes  json header {"ts_keyname": <str>, "headers": <list>, "length": <int>, "dtype": "<f8"},
+             padded with spaces, so the following data starts 8 byte aligned
+    8 bytes * length                  timestamps as float64
+    8 bytes * length * len(headers)   value columns as float64, column after column
+
+files ending with .gz are gzip compressed, uncompressed files could be
+memory mapped and used without copying any data
+"""
+import os
+import gzip
+import json
+import mmap
+import struct
+# non std
+import numpy
+# own modules
+from datalogger4.CustomExceptions import *
+
+MAGIC = b"DLTSBIN1"
+ALIGNMENT = 8
+DTYPE = "<f8"
+# possible formats of Timeseries dumps and their file endings
+ts_formats = {
+    "csv" : ".csv.gz",
+    "bin" : ".bin",
+    "bin.gz" : ".bin.gz",
+}
+
+
+def get_format(filename):
+    """
+    return format name of given Timeseries dump filename
+
+    parameters:
+    filename <str>
+
+    returns:
+    <str> one of ts_formats.keys()
+    """
+    for fmt, ending in ts_formats.items():
+        if filename.endswith(ending):
+            return fmt
+    raise DataFormatError("unknown Timeseries file format of filename %s" % filename)
+
+def open_file(filename, mode="rb"):
+    """
+    open binary Timeseries file, honor gzip compression by file ending
+
+    parameters:
+    filename <str>
+    mode <str> either "rb" or "wb"
+
+    returns:
+    <file>
+    """
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode)
+    return open(filename, mode)
+
+def dump_columns(filehandle, ts_keyname, headers, times, values):
+    """
+    write columns to filehandle in binary format
+
+    parameters:
+    filehandle <file> opened in binary mode
+    ts_keyname <str>
+    headers <list> of value column names
+    times <iterable> of <float>
+    values <iterable> of columns of <float>, one for every header
+    """
+    times = numpy.ascontiguousarray(times, dtype=DTYPE)
+    values = numpy.ascontiguousarray(values, dtype=DTYPE).reshape((len(headers), len(times)))
+    header = json.dumps({
+        "ts_keyname" : ts_keyname,
+        "headers" : list(headers),
+        "length" : len(times),
+        "dtype" : DTYPE
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % ALIGNMENT)
+    filehandle.write(MAGIC)
+    filehandle.write(struct.pack("<I", len(header)))
+    filehandle.write(header)
+    filehandle.write(times.tobytes())
+    filehandle.write(values.tobytes())
+
+def parse_header(data):
+    """
+    parse header of binary Timeseries data
+
+    parameters:
+    data <bytes> at least the header part of binary data
+
+    returns:
+    <tuple> (<dict> header, <int> offset of first data byte)
+    """
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise DataFormatError("data is not in binary Timeseries format")
+    header_length = struct.unpack("<I", bytes(data[len(MAGIC):len(MAGIC) + 4]))[0]
+    offset = len(MAGIC) + 4 + header_length
+    header = json.loads(bytes(data[len(MAGIC) + 4:offset]).decode("utf-8"))
+    return header, offset
+
+def columns_from_buffer(data):
+    """
+    return views of columns in binary Timeseries data, without copying
+
+    parameters:
+    data <bytes> or any other object providing the buffer interface
+
+    returns:
+    <tuple> (ts_keyname <str>, headers <list>, times <numpy.ndarray>, values <numpy.ndarray>)
+    """
+    header, offset = parse_header(data)
+    length = header["length"]
+    headers = header["headers"]
+    array = numpy.frombuffer(data, dtype=header["dtype"], count=length * (len(headers) + 1), offset=offset)
+    return header["ts_keyname"], headers, array[:length], array[length:].reshape((len(headers), length))
+
+def load_columns(filehandle):
+    """
+    read columns in binary format from filehandle
+
+    parameters:
+    filehandle <file> opened in binary mode
+
+    returns:
+    <tuple> (ts_keyname <str>, headers <list>, times <numpy.ndarray>, values <numpy.ndarray>)
+        arrays are writeable copies in native float64
+    """
+    ts_keyname, headers, times, values = columns_from_buffer(filehandle.read())
+    return ts_keyname, headers, times.astype(numpy.float64), values.astype(numpy.float64)
+
+def map_file(filename):
+    """
+    return read-only memory map of whole uncompressed file,
+    the map stays valid as long as some array references it
+
+    parameters:
+    filename <str>
+
+    returns:
+    <mmap.mmap>
+    """
+    with open(filename, "rb") as infile:
+        return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+def prefetch_file(filename, offset=0, length=0):
+    """
+    give the kernel a hint, that this part of the file will be read soon,
+    length 0 means until end of file
+
+    parameters:
+    filename <str>
+    offset <int>
+    length <int>
+    """
+    if not hasattr(os, "posix_fadvise"): # not available on every platform
+        return
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
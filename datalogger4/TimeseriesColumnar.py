@@ -0,0 +1,732 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+Module for class TimeseriesColumnar
+
+numpy backed drop-in replacement for Timeseries, timestamps and every
+value column are stored in contiguous float64 arrays instead of a list of
+row lists
+"""
+import logging
+# non std
+import numpy
+# own modules
+from datalogger4 import Datatypes
+from datalogger4 import TimeseriesBinary
+from datalogger4.CustomExceptions import *
+from datalogger4.TimeseriesStats import TimeseriesStats
+
+
+class TimeseriesColumnar(object):
+    """
+    Timeseries Object for one specific index combination, columnar storage
+
+    times  -> [ ts1, ts2, ts3, ... ]
+    values -> [ [ col1_ts1, col1_ts2, ... ],
+                [ col2_ts1, col2_ts2, ... ],
+                ... ]
+
+    the public API mimics Timeseries, rows are returned as <list>,
+    columns (get_serie, self[colname]) are returned as read-only
+    <numpy.ndarray> views of the internal storage
+
+    all column values have to be numerical
+    """
+
+    datatype_mapper = Datatypes.datatype_mapper
+
+    def __init__(self, headers, ts_keyname="ts"):
+        """
+        headers <list> column names of values
+        ts_keyname <str> name of timestamp column
+
+        all header columns have to be strictly numeric
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.__ts_keyname = ts_keyname
+        self.__headers = list([value for value in headers]) # also the number of columns
+        self.__length = 0 # used rows in buffers
+        self.__steady = True # True as long as timestamps are strictly increasing
+        # define new data, buffers will grow on demand
+        self.__times = numpy.empty(0, dtype=numpy.float64)
+        self.__values = numpy.empty((len(self.__headers), 0), dtype=numpy.float64)
+
+    @staticmethod
+    def from_columns(headers, times, values, ts_keyname="ts"):
+        """
+        create TimeseriesColumnar from already existing columns, no copy
+        of data will be made if the given arrays are already float64
+
+        parameters:
+        headers <list> column names of values
+        times <iterable> of <float> timestamps
+        values <iterable> of columns, every column the same length as times
+        ts_keyname <str> name of timestamp column
+
+        returns:
+        <TimeseriesColumnar>
+        """
+        timeseries = TimeseriesColumnar(headers, ts_keyname)
+        times = numpy.asarray(times, dtype=numpy.float64)
+        if len(headers) == 0:
+            values = numpy.empty((0, len(times)), dtype=numpy.float64)
+        else:
+            values = numpy.asarray(values, dtype=numpy.float64)
+        if values.shape != (len(headers), len(times)):
+            raise DataFormatError("values of shape %s do not match %d headers and %d timestamps" % (values.shape, len(headers), len(times)))
+        timeseries.__times = times
+        timeseries.__values = values
+        timeseries.__length = len(times)
+        timeseries.__steady = bool(numpy.all(times[1:] > times[:-1]))
+        return timeseries
+
+    @staticmethod
+    def from_buffer(data):
+        """
+        create TimeseriesColumnar directly on data in TimeseriesBinary format,
+        without copying, for example on a memory map.
+        The data stays read-only until it is modified, then a private copy is made
+
+        parameters:
+        data <bytes>, <mmap.mmap>, <memoryview> or any other buffer
+
+        returns:
+        <TimeseriesColumnar>
+        """
+        ts_keyname, headers, times, values = TimeseriesBinary.columns_from_buffer(data)
+        return TimeseriesColumnar.from_columns(headers, times, values, ts_keyname=ts_keyname)
+
+    @property
+    def ts_keyname(self):
+        """name of timestamp key"""
+        return self.__ts_keyname
+
+    @ts_keyname.setter
+    def ts_keyname(self, value):
+        assert value not in self.__headers
+        self.__ts_keyname = value
+
+    @property
+    def headers(self):
+        """return list of headers (without timestamp)"""
+        return self.__headers
+
+    @headers.setter
+    def headers(self, value):
+        assert len(value) == len(self.__headers)
+        self.__headers = list(value)
+
+    @property
+    def colnames(self):
+        """return list of columns (including timestamp)"""
+        colnames = [self.__ts_keyname, ] + self.__headers
+        return tuple(colnames)
+
+    @property
+    def start_ts(self):
+        """return first recorded timestamp"""
+        return self[0][0]
+
+    @property
+    def stop_ts(self):
+        """return last recorded timestamp"""
+        return self[-1][0]
+
+    @property
+    def stats(self):
+        """return TimeseriesStats"""
+        return TimeseriesStats(self)
+
+    @property
+    def interval(self):
+        """
+        return median time interval between two entries
+        """
+        times = self.times
+        steps = (times - times[0]) / numpy.arange(1, len(times) + 1)
+        return sum(steps.tolist()) / len(times)
+
+    @property
+    def datatypes(self):
+        return list(self.datatype_mapper.keys())
+
+    @property
+    def times(self):
+        """read-only view of timestamp column"""
+        return self.__readonly(self.__times[:self.__length])
+
+    @property
+    def values(self):
+        """read-only 2-dimensional view of value columns, one row per header"""
+        return self.__readonly(self.__values[:, :self.__length])
+
+    @property
+    def data(self):
+        """
+        return data in row format like Timeseries.data
+        this is a copy, modifications will not be reflected
+        """
+        return [row for row in self]
+
+    @property
+    def nbytes(self):
+        """number of bytes used for data buffers"""
+        return self.__times.nbytes + self.__values.nbytes
+
+    @staticmethod
+    def __readonly(array):
+        view = array.view()
+        view.flags.writeable = False
+        return view
+
+    def __eq__(self, other):
+        if self.__headers != other.headers:
+            raise AssertionError("headers are different")
+        if self.ts_keyname != other.ts_keyname:
+            raise AssertionError("ts_keyname is different")
+        if len(self) != len(other):
+            raise AssertionError("data length is different, self %d, other %d" % (len(self), len(other)))
+        if not all(numpy.array_equal(self[colname], other[colname]) for colname in self.colnames):
+            raise AssertionError("data is different")
+        return True
+
+    def __len__(self):
+        """
+        return length of timeseries data
+        """
+        return self.__length
+
+    def __contains__(self, value):
+        """
+        mimic contains behaviour
+        something in self
+        """
+        if len(value) != len(self.__headers) + 1:
+            return False
+        mask = self.times == value[0]
+        for colnum, colvalue in enumerate(value[1:]):
+            mask &= self.__values[colnum, :self.__length] == colvalue
+        return bool(mask.any())
+
+    def __iter__(self):
+        """
+        mimic iter behaviour, yields every row as <list>
+        """
+        columns = [self.times.tolist(), ] + self.values.tolist()
+        for row in zip(*columns):
+            yield list(row)
+
+    def __row(self, rownum):
+        """return <list> of timestamp and values of row number given"""
+        if not -self.__length <= rownum < self.__length:
+            raise IndexError("row index %d out of range" % rownum)
+        return [self.__times[rownum % self.__length].item(), ] + self.__values[:, rownum % self.__length].tolist()
+
+    def __get_rownum(self, timestamp):
+        """return row number of given timestamp, raise KeyError if not found"""
+        times = self.times
+        if self.__steady:
+            rownum = int(numpy.searchsorted(times, timestamp))
+            if rownum < len(times) and times[rownum] == timestamp:
+                return rownum
+        else:
+            found = numpy.flatnonzero(times == timestamp)
+            if len(found) > 0:
+                return int(found[0])
+        raise KeyError("Timstamp %f not found in dataset" % timestamp)
+
+    def __getitem__(self, key):
+        """
+        implement sophisticated __getitem__ function
+
+        self[<int>row] -> returns row -> <list>
+        self[<float>timestamp] -> returns row where timestamp matches -> <list>
+        self[colname] -> returns column of colname -> <numpy.ndarray>
+        self[<int>row, <int>col] -> returns value at row, col -> <float>
+        self[<int>row, colname] -> returns value at row, colname -> <float>
+        """
+        # if key is int treat it as row of data
+        if isinstance(key, int):
+            return self.__row(key)
+        # if key is double-item tuple treat it position in matrix
+        elif isinstance(key, tuple):
+            row, col = key
+            rownum = None
+            colnum = None
+            # convert row to rownum, depending on type
+            if isinstance(row, int):
+                rownum = row
+            elif isinstance(row, float):
+                rownum = self.__get_rownum(row)
+            else:
+                raise KeyError("Row must be either int (index)  or float (timestamp) not %s" % type(row))
+            # convert col to something useful
+            if isinstance(col, str):
+                colnum = self.colnames.index(col)
+            else:
+                colnum = col
+            return self.__row(rownum)[colnum]
+        # if key is float treat it as timestamp
+        elif isinstance(key, float):
+            return self.__row(self.__get_rownum(key))
+        # if key is text treat it as column name
+        elif isinstance(key, str):
+            if key == self.__ts_keyname:
+                return self.times
+            return self.get_serie(key)
+        else:
+            raise KeyError("%s of type %s is no valid key" % (key, type(key)))
+
+    def __str__headers(self, delimiter="\t"):
+        """generates and returns column names string"""
+        colnames = [self.__ts_keyname, ]
+        colnames += self.__headers
+        return delimiter.join(colnames)
+
+    def __reserve(self, length):
+        """grow internal buffers to hold at least length rows"""
+        capacity = len(self.__times)
+        if length <= capacity:
+            return
+        capacity = max(16, capacity * 2, length)
+        times = numpy.empty(capacity, dtype=numpy.float64)
+        times[:self.__length] = self.__times[:self.__length]
+        values = numpy.empty((len(self.__headers), capacity), dtype=numpy.float64)
+        values[:, :self.__length] = self.__values[:, :self.__length]
+        self.__times = times
+        self.__values = values
+
+    def __has_timestamp(self, timestamp):
+        """True if timestamp is already stored"""
+        if self.__length == 0:
+            return False
+        if self.__steady and timestamp > self.__times[self.__length - 1]:
+            return False
+        return bool((self.times == timestamp).any())
+
+    def __add(self, timestamp, values):
+        """
+        private method to add data to internal data storage
+        timstamp should be float
+        values should be array of float
+
+        if the timestamp is already in the internal array,
+        this data will be skipped
+
+        parameters:
+        timestamp <float>
+        values <iterable> of float
+
+        raises:
+        DataformatError if TypeError occurs
+        """
+        if self.__has_timestamp(timestamp):
+            return
+        try:
+            self.__reserve(self.__length + 1)
+            self.__values[:, self.__length] = values
+            if self.__length > 0 and timestamp <= self.__times[self.__length - 1]:
+                self.__steady = False
+            self.__times[self.__length] = timestamp
+            self.__length += 1
+        except (TypeError, ValueError) as exc:
+            logging.exception(exc)
+            logging.error("ts : %s, values: %s", timestamp, values)
+            raise DataFormatError("TypeError: some values are not of type <float>")
+
+    def head(self, delimiter="\t", nrows=5, headers=True):
+        """return printable string for first ncols rows"""
+        lbuffer = []
+        if headers:
+            lbuffer.append(self.__str__headers(delimiter))
+        for rownum in range(min(nrows, self.__length)):
+            lbuffer.append(delimiter.join((str(value) for value in self.__row(rownum))))
+        return "\n".join(lbuffer)
+
+    def tail(self, delimiter="\t", nrows=5, headers=True):
+        """return printable string for last ncols rows"""
+        lbuffer = []
+        if headers:
+            lbuffer.append(self.__str__headers(delimiter))
+        for rownum in range(max(0, self.__length - nrows), self.__length):
+            lbuffer.append(delimiter.join((str(value) for value in self.__row(rownum))))
+        return "\n".join(lbuffer)
+
+    def __str__(self):
+        """return printable string head(), ..., tail()"""
+        lbuffer = []
+        lbuffer.append(self.head())
+        lbuffer.append("...")
+        lbuffer.append(self.tail(headers=False))
+        return "\n".join(lbuffer)
+
+    def add(self, timestamp, values, suppress_non_steady_ts=True):
+        """
+        add new data to timeseries
+        ts should be increasing, values have to be numeric
+
+        parameters:
+        ts <float> timestamp, has to be increasing, otherwise data will be ignored
+        values <tuple> of <float> the actual values for this timestamp
+        suppress_non_steady_ts <bool> show messages, if timestamp is not steadily increasing, or not
+        """
+        try:
+            assert isinstance(timestamp, float)
+            assert all((isinstance(value, float) for value in values))
+            assert len(values) == len(self.__headers)
+        except AssertionError:
+            raise DataFormatError("Values %s are not the same length as format specification %s" % (values, self.__headers))
+        if self.__length > 0 and not self.__times[self.__length - 1] < timestamp:
+            if not suppress_non_steady_ts:
+                logging.debug("timestamp %s is not steadily increasing, ignoring this dataset, last_ts=%s", timestamp, self.__times[self.__length - 1])
+        # skip this data if timeseries already in data
+        if self.__has_timestamp(timestamp):
+            logging.debug("skipping new data, timestamp already stored")
+            return
+        # finally add to datastore
+        self.__add(timestamp, values)
+
+    def add_from_csv(self, timestamp, values):
+        """
+        add new data to timeseries, used to add value from trusted sources like CSV files
+
+        parameters:
+        ts <float> timestamp, has to be increasing, otherwise data will be ignored
+        values <tuple> of <float> the actual values for this timestamp
+        """
+        self.__add(timestamp, values)
+
+    def group_add(self, timestamp, values, group_func):
+        """
+        function to add new data, and if data exists, aggregate existing data with new ones
+        if there is no existing data for this timestamp, simply call add()
+
+        parameters:
+        timestamp <float>
+        values <tuple> of <floats>
+        group_func <func> will be called with existing and new values
+
+        returns:
+        None
+        """
+        assert isinstance(timestamp, float)
+        assert isinstance(values, list)
+        assert all((isinstance(value, float) for value in values))
+        if not self.__has_timestamp(timestamp):
+            self.__add(timestamp, values)
+        else:
+            if not self.__values.flags.writeable: # copy on write, data is shared
+                self.__values = self.__values.copy()
+            rownum = self.__get_rownum(timestamp)
+            old_data = self.__values[:, rownum].tolist()
+            self.__values[:, rownum] = [group_func(old_data[index], float(values[index])) for index in range(len(values))]
+
+    def __get_colnum(self, colname):
+        """
+        return index of given column name in internal values array
+        """
+        return self.__headers.index(colname)
+
+    def resample(self, time_interval, func):
+        """
+        resample data to time interval given
+        using func as aggregation function for values in between
+        aggregation function is called for every series on its own,
+        so you get a iterable with numerical values and has to return one single value
+
+        parameters:
+        time_interval <int> something above actual interval
+        func - something like lambda values : sum(values)
+
+        returns:
+        <TimeseriesColumnar>
+        """
+        ret_data = TimeseriesColumnar(self.__headers, ts_keyname=self.__ts_keyname)
+        times = self.times.tolist()
+        first_ts = times[0]
+        last_ts = None
+        start = 0 # first row of subsample
+        for rownum, timestamp in enumerate(times):
+            if timestamp > (first_ts + time_interval):
+                # subsample is full, aggregate
+                if rownum > start:
+                    ret_data.add(last_ts, [float(func(column)) for column in self.__values[:, start:rownum].tolist()])
+                first_ts = timestamp # new starting ts for next subsample
+                start = rownum + 1 # same behaviour as Timeseries, actual row is skipped
+            last_ts = timestamp
+        return ret_data
+
+    def to_data(self, value_keynames=None, start_ts=None, stop_ts=None):
+        """
+        return internal data as list of dicts for every row
+        """
+        if value_keynames is None:
+            value_keynames = self.__headers # use all columns if None
+        try:
+            if start_ts is not None:
+                assert isinstance(start_ts, int)
+            if stop_ts is not None:
+                assert isinstance(stop_ts, int)
+        except AssertionError as exc:
+            logging.exception("start_ts and stop_ts has to be the same type and int")
+            logging.error("start_ts=%s, stop_ts=%s", start_ts, stop_ts)
+            raise exc
+        mask = self.__get_mask(start_ts, stop_ts)
+        columns = [self.__values[self.__get_colnum(value_keyname), :self.__length][mask].tolist() for value_keyname in value_keynames]
+        keynames = list(value_keynames) + [self.ts_keyname, ]
+        for row in zip(*(columns + [self.times[mask].tolist(), ])):
+            yield dict(zip(keynames, row))
+
+    def __get_mask(self, start_ts, stop_ts):
+        """return boolean mask of rows between start_ts and stop_ts, or slice for all"""
+        if start_ts is None:
+            return slice(None)
+        times = self.times
+        return (start_ts <= times) & (times <= stop_ts)
+
+    def to_csv(self, value_keynames=None, headers=True, delimiter=",", start_ts=None, stop_ts=None):
+        """
+        return internal data csv formatted
+
+        value_keyname <tuple> which column names to add in data
+        headers <bool>  add header row or not, default True
+        delimiter <str> delimiter to use for csv, default ','
+        start_ts <None> or <int> starting time to use
+        stop_ts <None> or <int> stopping time to use
+        """
+        if value_keynames is None:
+            value_keynames = self.__headers
+        try:
+            if start_ts is not None:
+                assert isinstance(start_ts, int)
+            if stop_ts is not None:
+                assert isinstance(stop_ts, int)
+        except AssertionError as exc:
+            logging.exception("start_ts and stop_ts has to be the same type and int")
+            logging.error("start_ts=%s, stop_ts=%s", start_ts, stop_ts)
+            raise exc
+        mask = self.__get_mask(start_ts, stop_ts)
+        columns = [self.times[mask].tolist(), ] + [self.__values[self.__get_colnum(key), :self.__length][mask].tolist() for key in value_keynames]
+        headline = [self.ts_keyname, ]
+        headline.extend(value_keynames)
+        for row in zip(*columns):
+            if headers is True:
+                yield "%s" % delimiter.join(headline)
+                headers = False
+            yield delimiter.join((str(value) for value in row))
+
+    def get_serie(self, colname):
+        """
+        returning all values for given colname
+
+        parameters:
+        colname <str> - must be in self.headers
+
+        returns:
+        return <numpy.ndarray> of <float64>, read-only view
+        """
+        return self.__readonly(self.__values[self.__get_colnum(colname), :self.__length])
+
+    def slice(self, colnames):
+        """
+        return new TimeseriesColumnar object with only in colnames given columns
+
+        parameters:
+        colnames <tuple>
+
+        returns:
+        <TimeseriesColumnar>
+        """
+        assert not isinstance(colnames, str)
+        colnums = [self.__get_colnum(colname) for colname in colnames]
+        values = self.__values[colnums, :self.__length] # fancy indexing returns copy
+        return TimeseriesColumnar.from_columns(colnames, self.times.copy(), values, ts_keyname=self.ts_keyname)
+
+    def convert(self, colname, datatype, newcolname=None):
+        """
+        convert some existing columns to given datatype and add this column to Timeseries
+
+        parameters:
+        colname <str> - must be in colnames
+        datatype <str> - must be in datatypes
+        newcolname <str> - must not be in colnames
+
+        returns:
+        <None>
+        """
+        if self.__length == 0:
+            logging.error("Empty Timeseries, nothing to convert")
+            return
+        newseries = self.datatype_mapper[datatype](self.times, self.get_serie(colname))
+        if newcolname is None: # overwrite existing column, moved to the end like Timeseries does
+            self.remove_col(colname)
+            self.append(colname, newseries)
+        else:
+            self.append(newcolname, newseries)
+
+    def convert_many(self, datatypes):
+        """
+        convert many existing columns to given datatypes in one pass,
+        same result as calling convert(colname, datatype, None) for every
+        item in datatypes, converted columns are moved to the end
+
+        parameters:
+        datatypes <dict> colname -> datatype, datatype "asis" will be skipped
+
+        returns:
+        <None>
+        """
+        colnames = [colname for colname, datatype in datatypes.items() if datatype != "asis"]
+        if not colnames:
+            return
+        if self.__length == 0:
+            logging.error("Empty Timeseries, nothing to convert")
+            return
+        colnums = [self.__get_colnum(colname) for colname in colnames]
+        converted = Datatypes.convert_columns(self.times, self.__values[colnums, :self.__length], [datatypes[colname] for colname in colnames])
+        keep = [colnum for colnum in range(len(self.__headers)) if colnum not in colnums]
+        self.__times = self.__times[:self.__length].copy()
+        self.__values = numpy.concatenate((self.__values[keep, :self.__length], converted), axis=0)
+        self.__headers = [header for header in self.__headers if header not in colnames] + colnames
+
+    def add_derive_col(self, colname, colname_d):
+        self.logger.info("DEPRECATED function add_derive_col use convert(%s, 'derive', %s)", colname, colname_d)
+        return self.convert(colname, "derive", colname_d)
+
+    def add_per_s_col(self, colname, colname_d):
+        self.logger.info("DEPRECATED function add_per_s_col use convert(%s, 'persecond', %s)", colname, colname_d)
+        return self.convert(colname, "persecond", colname_d)
+
+    def add_calc_col_single(self, colname, newcolname, func):
+        """
+        use func to generate colname_c from colname
+        colname_c = func(colname)
+
+        parameters:
+        colname <str> original existing colname
+        newcolname <str> new column name added
+        func <func> function which returns <float>,
+            ex lambda a<float>: a<float>
+        """
+        assert newcolname not in self.__headers
+        self.append(newcolname, [func(value) for value in self.get_serie(colname).tolist()])
+
+    def add_calc_col_full(self, newcolname, func):
+        """
+        use func to generate newcolname from existing data at this timestamp
+        newcol = func(existing data at this timestamp)
+
+        the parameters for func are delivered as dict
+
+        parameters:
+        newcolname <str> new column name
+        func <func> function which returns <float>,
+            ex lambda a<dict>: a<float>
+        """
+        assert newcolname not in self.__headers
+        headers = list(self.__headers)
+        self.append(newcolname, [func(dict(zip(headers, row))) for row in zip(*self.values.tolist())])
+
+    def remove_col(self, colname):
+        """
+        remove column with name colname from internal data structure
+
+        parameters:
+        colname <str> schould be in self.headers
+        """
+        colnum = self.__get_colnum(colname)
+        self.__values = numpy.delete(self.__values, colnum, axis=0)
+        self.__headers.remove(colname)
+
+    def append(self, colname, series):
+        """
+        append given series to internal data structure and give it the name colname
+
+        parameters:
+        colanme <str> must not be in headers
+        series <tuple> of <floats> must be the same length as existing data
+
+        returns:
+        None
+        """
+        assert colname not in self.__headers
+        if len(series) != self.__length:
+            msg = "new series of length %s, is not the same as existing datalength of %s" % (len(series), self.__length)
+            logging.error(msg)
+            raise AssertionError(msg)
+        values = numpy.empty((len(self.__headers) + 1, self.__length), dtype=numpy.float64)
+        values[:-1] = self.__values[:, :self.__length]
+        values[-1] = series
+        self.__times = self.__times[:self.__length].copy()
+        self.__values = values
+        self.__headers.append(colname)
+
+    def dump(self, filehandle):
+        """
+        write internal data to filehandle in CSV format,
+        the same format as Timeseries.dump
+
+        parameters:
+        filehandle <file>
+        """
+        header_line = [self.__ts_keyname, ]
+        header_line.extend(self.__headers)
+        filehandle.write(";".join(header_line) + "\n")
+        for row in self:
+            filehandle.write(";".join((str(item) for item in row)) + "\n")
+
+    @staticmethod
+    def load(filehandle):
+        """
+        recreate TimeseriesColumnar Object from CSV Filehandle,
+        written by Timeseries.dump or TimeseriesColumnar.dump
+        """
+        try:
+            header_line = None
+            rows = []
+            for row in filehandle:
+                if not row:
+                    continue # skip empty lines
+                if header_line is None:
+                    header_line = row.strip().split(";")
+                else:
+                    rows.append(row.strip().split(";"))
+            if header_line is None:
+                return None
+            rows = [row for row in rows if row != [""]]
+            try:
+                matrix = numpy.array(rows, dtype=numpy.float64).reshape((len(rows), len(header_line)))
+            except ValueError as exc:
+                logging.error("Error parsing rows of file with header %s", header_line)
+                raise exc
+            times = matrix[:, 0]
+            # keep only first occurence of every timestamp, like Timeseries does
+            _, first = numpy.unique(times, return_index=True)
+            if len(first) < len(times):
+                first.sort()
+                matrix = matrix[first]
+            return TimeseriesColumnar.from_columns(header_line[1:], matrix[:, 0].copy(), matrix[:, 1:].T.copy(), ts_keyname=header_line[0])
+        except IOError as exc:
+            logging.exception(exc)
+            logging.error("Error while reading from filehandle")
+            raise exc
+    load_from_csv = load
+
+    def dump_binary(self, filehandle):
+        """
+        write internal data to filehandle in binary format,
+        see module TimeseriesBinary
+
+        parameters:
+        filehandle <file> opened in binary mode
+        """
+        TimeseriesBinary.dump_columns(filehandle, self.__ts_keyname, self.__headers, self.times, self.values)
+
+    @staticmethod
+    def load_binary(filehandle):
+        """
+        recreate TimeseriesColumnar Object from binary filehandle,
+        written by dump_binary
+        """
+        ts_keyname, headers, times, values = TimeseriesBinary.load_columns(filehandle)
+        return TimeseriesColumnar.from_columns(headers, times, values, ts_keyname=ts_keyname)
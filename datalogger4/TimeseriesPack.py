@@ -0,0 +1,262 @@
+#!/usr/bin/python
+# pylint: disable=line-too-long
+"""
+container format holding all Timeseries of one TimeseriesArray in one file
+
+layout of one file, all numbers little endian:
+
+    8 bytes  magic b"DLTSPAK1"
+    8 bytes  <uint64> offset of json index
+    8 bytes  <uint64> length of json index in bytes
+    records  every Timeseries in TimeseriesBinary format, back to back,
+             optionally zlib compressed, uncompressed records are 8 byte aligned
+    json index {
+        "index_keys" : <list>,
+        "value_keys" : <list>,
+        "ts_key" : <str>,
+        "compression" : null or "zlib",
+        "entries" : [[<list> key, <int> offset, <int> length], ...]
+    }
+
+so only the index has to be read to know every key, and every
+Timeseries could be read with one seek and one read, or if the file
+is not compressed, used directly from a memory map of the whole file
+
+TimeseriesArrayStats uses the same layout to store json records of
+TimeseriesStats, with ts_key null
+"""
+import os
+import io
+import json
+import mmap
+import struct
+import zlib
+import logging
+# own modules
+from datalogger4 import TimeseriesBinary
+from datalogger4.b64 import b64encode
+from datalogger4.CustomExceptions import *
+
+MAGIC = b"DLTSPAK1"
+HEADER = struct.Struct("<8sQQ")
+
+
+class TimeseriesPack(object):
+    """
+    read access to one container file, the file is opened once
+    and every Timeseries is read by seeking to its offset
+    """
+
+    def __init__(self, filename, use_mmap=False):
+        """
+        parameters:
+        filename <str> path to container file
+        use_mmap <bool> map uncompressed file into memory, and use records without copying
+        """
+        self.__filename = filename
+        self.__map = None
+        self.__fh = open(filename, "rb")
+        magic, index_offset, index_length = HEADER.unpack(self.__fh.read(HEADER.size))
+        if magic != MAGIC:
+            self.__fh.close()
+            raise DataFormatError("file %s is not in TimeseriesPack format" % filename)
+        self.__fh.seek(index_offset)
+        index = json.loads(self.__fh.read(index_length).decode("utf-8"))
+        self.__index_keys = tuple(index["index_keys"])
+        self.__value_keys = list(index["value_keys"])
+        self.__ts_key = index["ts_key"]
+        self.__compression = index["compression"]
+        self.__entries = dict(((tuple(key), (offset, length)) for key, offset, length in index["entries"]))
+        if use_mmap and self.__compression is None:
+            self.__map = mmap.mmap(self.__fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def close(self):
+        """close underlying filehandle and memory map"""
+        self.__fh.close()
+        if self.__map is not None:
+            try:
+                self.__map.close()
+            except BufferError:
+                # there are still arrays using this map,
+                # it will be closed if the last one is gone
+                pass
+            self.__map = None
+
+    @property
+    def filename(self):
+        """path of container file"""
+        return self.__filename
+
+    @property
+    def index_keys(self):
+        """index keynames of stored TimeseriesArray"""
+        return self.__index_keys
+
+    @property
+    def value_keys(self):
+        """value keynames of stored TimeseriesArray"""
+        return self.__value_keys
+
+    @property
+    def ts_key(self):
+        """timestamp keyname of stored TimeseriesArray"""
+        return self.__ts_key
+
+    @property
+    def mapped(self):
+        """True if records are used from memory map"""
+        return self.__map is not None
+
+    @property
+    def compression(self):
+        """None or "zlib" """
+        return self.__compression
+
+    def keys(self):
+        """mimic dict, return all stored index keys"""
+        return self.__entries.keys()
+
+    def get_offset(self, key):
+        """
+        return position of record in file
+
+        parameters:
+        key <tuple>
+
+        returns:
+        <tuple> (offset <int>, length <int>)
+        """
+        return self.__entries[key]
+
+    def read(self, key):
+        """
+        read and return uncompressed record of given key in TimeseriesBinary format,
+        could be called concurrently from several threads
+
+        parameters:
+        key <tuple>
+
+        returns:
+        <bytes>
+        """
+        offset, length = self.__entries[key]
+        data = os.pread(self.__fh.fileno(), length, offset) # no shared file position, safe in threads
+        if self.__compression == "zlib":
+            data = zlib.decompress(data)
+        return data
+
+    def view(self, key):
+        """
+        return record of given key as memoryview of the memory map, without copying
+
+        parameters:
+        key <tuple>
+
+        returns:
+        <memoryview>
+        """
+        if self.__map is None:
+            raise AttributeError("TimeseriesPack is not memory mapped, use read()")
+        offset, length = self.__entries[key]
+        return memoryview(self.__map)[offset:offset + length]
+
+    def load(self, key, timeseries_class):
+        """
+        return Timeseries stored under key, if memory mapped and
+        timeseries_class supports it, the data is not copied
+
+        parameters:
+        key <tuple>
+        timeseries_class <class> Timeseries or TimeseriesColumnar
+
+        returns:
+        <timeseries_class>
+        """
+        if self.__map is not None and hasattr(timeseries_class, "from_buffer"):
+            return timeseries_class.from_buffer(self.view(key))
+        return timeseries_class.load_binary(io.BytesIO(self.read(key)))
+
+    def prefetch(self, keys):
+        """
+        give the kernel a hint, that records of given keys will be read soon
+
+        parameters:
+        keys <iterable> of <tuple>
+        """
+        for key in keys:
+            if key not in self.__entries:
+                continue
+            offset, length = self.__entries[key]
+            if self.__map is not None and hasattr(self.__map, "madvise"):
+                start = offset - offset % mmap.PAGESIZE # has to be page aligned
+                self.__map.madvise(mmap.MADV_WILLNEED, start, offset + length - start)
+            elif hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(self.__fh.fileno(), offset, length, os.POSIX_FADV_WILLNEED)
+
+    @staticmethod
+    def get_dumpfilename(index_keys):
+        """
+        return filename of container file
+
+        parameters:
+        index_keys <tuple> index keynames of TimeseriesArray
+
+        returns:
+        <str>
+        """
+        return "tspack_%s.dat" % b64encode(index_keys)
+
+    @staticmethod
+    def write(filename, index_keys, value_keys, ts_key, records, compress=False):
+        """
+        write container file, to be atomic the data is first written to
+        a temporary file, which is renamed afterwards
+
+        parameters:
+        filename <str>
+        index_keys <tuple> index keynames of TimeseriesArray
+        value_keys <list> value keynames of TimeseriesArray
+        ts_key <str> timestamp keyname
+        records <iterable> of (key <tuple>, data <bytes> in TimeseriesBinary format)
+        compress <bool> compress every record with zlib
+
+        returns:
+        <int> number of records written
+        """
+        entries = []
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, "wb") as outfile:
+            outfile.write(HEADER.pack(MAGIC, 0, 0)) # placeholder
+            for key, data in records:
+                if compress:
+                    data = zlib.compress(data)
+                entries.append([list(key), outfile.tell(), len(data)])
+                outfile.write(data)
+                if not compress: # keep records 8 byte aligned
+                    outfile.write(b"\0" * (-len(data) % TimeseriesBinary.ALIGNMENT))
+            index = json.dumps({
+                "index_keys" : list(index_keys),
+                "value_keys" : list(value_keys),
+                "ts_key" : ts_key,
+                "compression" : "zlib" if compress else None,
+                "entries" : entries
+            }).encode("utf-8")
+            index_offset = outfile.tell()
+            outfile.write(index)
+            outfile.seek(0)
+            outfile.write(HEADER.pack(MAGIC, index_offset, len(index)))
+        os.rename(tmp_filename, filename)
+        logging.debug("written %d records to %s", len(entries), filename)
+        return len(entries)
@@ -5,6 +5,8 @@ Modules deals with timeseries statistics
 """
 import json
 import logging
+# non std
+import numpy
 # own modules
 from datalogger4.CustomExceptions import *
 
@@ -67,12 +69,91 @@ def decrements(data):
     """
     return float(sum([data[index] - data[index + 1] for index in range(len(data)-1) if data[index + 1] < data[index]]))
 
+def stats_kernel(matrix):
+    """
+    calculate all statistical values of TimeseriesStats.stat_funcs
+    for every row of matrix at once, every row is one series
+
+    the results are identical to the ones of the single functions,
+    summation is done in series order with builtin sum, the median is
+    selected with one partition step for all series
+
+    parameters:
+    matrix <numpy.ndarray> of <float>, shape (number of series, length), length > 1
+
+    returns:
+    <list> of <dict> one dict for every row
+    """
+    matrix = numpy.asarray(matrix, dtype=numpy.float64)
+    length = matrix.shape[1]
+    half = length // 2
+    # one selection step for all series
+    kth = [half - 1, half] if not length % 2 else [half, ]
+    selected = numpy.partition(matrix, kth, axis=1)[:, kth].tolist()
+    diffs = matrix[:, 1:] - matrix[:, :-1]
+    mins = matrix.min(axis=1).tolist()
+    maxs = matrix.max(axis=1).tolist()
+    firsts = matrix[:, 0].tolist()
+    lasts = matrix[:, -1].tolist()
+    ret_data = []
+    for rownum, series in enumerate(matrix.tolist()):
+        total = sum(series)
+        avg = total / float(length)
+        deviations = ((matrix[rownum] - avg) ** 2).tolist()
+        diff = diffs[rownum]
+        if len(kth) == 2:
+            median_value = (selected[rownum][0] + selected[rownum][1]) / 2.0
+        else:
+            median_value = selected[rownum][0]
+        ret_data.append({
+            "min" : mins[rownum],
+            "max" : maxs[rownum],
+            "avg" : avg,
+            "sum" : total,
+            "std" : (sum(deviations) / length)**0.5,
+            "median" : median_value,
+            "count" : length,
+            "first" : firsts[rownum],
+            "last" : lasts[rownum],
+            "mean" : avg,
+            "inc" : float(sum(diff[diff > 0.0].tolist())),
+            "dec" : float(sum((-diff[diff < 0.0]).tolist())),
+            "diff" : lasts[rownum] - firsts[rownum],
+        })
+    return ret_data
+
+
+def derive_partials(stats):
+    """
+    return partials of statistics stored without them, the sum of squared
+    deviations is derived from std, timestamps are unknown
+
+    parameters:
+    stats <dict> value_keyname -> <dict> statistical values
+
+    returns:
+    <dict> like TimeseriesStats.partials
+    """
+    return {
+        "first_ts" : None,
+        "last_ts" : None,
+        "m2" : dict(((key, values["count"] * values["std"] * values["std"]) for key, values in stats.items())),
+    }
+
 
 class TimeseriesStats(object):
     """
     Statistics for one sepcific Timeseries Object
 
     separated to cache statistics in own files
+
+    besides the statistical values the partials needed to merge statistics
+    of many Timeseries exactly are stored under key "__partials__",
+    see StatsMerge, count, sum, min, max, first and last are part of the
+    statistical values already
+        first_ts    <float> timestamp of first value
+        last_ts     <float> timestamp of last value
+        m2          <dict> value_keyname -> sum of squared deviations from avg
     """
     stat_funcs = {
         "min" : min,
@@ -101,29 +182,42 @@ class TimeseriesStats(object):
         """
         # define new data
         self.__stats = {}
-        # calculate statisticsi, if timeseries given
-        for key in timeseries.headers:
-            series = timeseries.get_serie(key)
-            if len(series) == 0:
-                logging.error("%s %s", key, len(timeseries))
-                raise TimeseriesEmptyError("Timeseries without data cannot have statistics")
-            elif len(series) > 1:
+        self.__partials = None
+        if not timeseries.headers:
+            return
+        # calculate statistics for all columns at once
+        matrix = numpy.array([timeseries.get_serie(key) for key in timeseries.headers], dtype=numpy.float64)
+        if matrix.shape[1] == 0:
+            logging.error("%s %s", timeseries.headers[0], len(timeseries))
+            raise TimeseriesEmptyError("Timeseries without data cannot have statistics")
+        m2 = ((matrix - matrix.mean(axis=1)[:, numpy.newaxis]) ** 2).sum(axis=1)
+        self.__partials = {
+            "first_ts" : float(timeseries.start_ts),
+            "last_ts" : float(timeseries.stop_ts),
+            "m2" : dict(zip(timeseries.headers, m2.tolist())),
+        }
+        if matrix.shape[1] > 1:
+            for key, stats in zip(timeseries.headers, stats_kernel(matrix)):
                 self.__stats[key] = {}
                 for func_name, func in self.stat_funcs.items():
-                    self.__stats[key][func_name] = func(series)
-            elif len(series) == 1: # special case if there is only one value a day
-                logging.debug("special case single-value-day detected")
+                    if func_name in stats:
+                        self.__stats[key][func_name] = stats[func_name]
+                    else: # additional function, not known by kernel
+                        self.__stats[key][func_name] = func(timeseries.get_serie(key))
+        else: # special case if there is only one value a day
+            logging.debug("special case single-value-day detected")
+            for key, (value, ) in zip(timeseries.headers, matrix.tolist()):
                 self.__stats[key] = {
-                    "min" : series[0],
-                    "max" : series[0],
-                    "avg" : series[0],
-                    "sum" : series[0],
+                    "min" : value,
+                    "max" : value,
+                    "avg" : value,
+                    "sum" : value,
                     "std" : 0.0,
-                    "median" : series[0],
+                    "median" : value,
                     "count" : 1,
-                    "first" : series[0],
-                    "last" : series[0],
-                    "mean" : series[0],
+                    "first" : value,
+                    "last" : value,
+                    "mean" : value,
                     "inc" : 0.0,
                     "dec" : 0.0,
                     "diff" : 0.0,
@@ -206,8 +300,27 @@ class TimeseriesStats(object):
 
     @stats.setter
     def stats(self, value):
-        """set statistics dictionary"""
+        """set statistics dictionary, stored partials do not match anymore"""
         self.__stats = value
+        self.__partials = None
+
+    @property
+    def partials(self):
+        """partials to merge statistics, derived if not stored"""
+        if self.__partials is None:
+            return derive_partials(self.__stats)
+        return self.__partials
+
+    def __get_stored(self):
+        """statistical values and partials, like stored in json format"""
+        if self.__partials is None:
+            return self.__stats
+        return dict(self.__stats, __partials__=self.__partials)
+
+    def __set_stored(self, data):
+        """set statistical values and partials, if stored"""
+        self.__partials = data.pop("__partials__", None)
+        self.__stats = data
 
     @property
     def funcnames(self):
@@ -260,7 +373,7 @@ class TimeseriesStats(object):
         returns:
         <None>
         """
-        json.dump(self.__stats, filehandle)
+        json.dump(self.__get_stored(), filehandle)
         filehandle.flush()
 
     @staticmethod
@@ -275,7 +388,7 @@ class TimeseriesStats(object):
         <TimeseriesStats>
         """
         tsstats = TimeseriesStats.__new__(TimeseriesStats)
-        tsstats.__stats = json.load(filehandle)
+        tsstats.__set_stored(json.load(filehandle))
         return tsstats
 
     def to_json(self):
@@ -283,7 +396,7 @@ class TimeseriesStats(object):
         return json encoded statistics dictionary
         used to store data in file
         """
-        return json.dumps(self.__stats)
+        return json.dumps(self.__get_stored())
 
     def to_data(self):
         """
@@ -297,5 +410,5 @@ class TimeseriesStats(object):
         create class from json encoded statistics dictionary
         """
         tsstats = TimeseriesStats.__new__(TimeseriesStats)
-        tsstats.__stats = json.loads(jsondata)
+        tsstats.__set_stored(json.loads(jsondata))
         return tsstats
@@ -24,11 +24,13 @@ __version__ = "$Revision: 4.0.0 $"
 print("running __init__")
 from .DataLogger import DataLogger as DataLogger
 from .Timeseries import Timeseries as Timeseries
+from .TimeseriesColumnar import TimeseriesColumnar as TimeseriesColumnar
 from .TimeseriesArray import TimeseriesArray as TimeseriesArray
 from .TimeseriesStats import TimeseriesStats as TimeseriesStats
 from .TimeseriesArrayStats import TimeseriesArrayStats as TimeseriesArrayStats
 from .Quantile import QuantileArray as QuantileArray
 from .Quantile import Quantile as Quantile
+from .LiveStats import LiveStats as LiveStats
 from .CorrelationMatrix import CorrelationMatrixArray as CorrelationMatrixArray
 from .CorrelationMatrixTime import CorrelationMatrixTime as CorrelationMatrixTime
 from .FastTsa import fast_tsa
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import io
+import json
+# non std
+import numpy
+# own modules
+from datalogger4.DataLogger import DataLogger
+from datalogger4.CorrelationMatrix import CorrelationMatrixArray, CorrelationMatrix, get_distance_matrix, get_mse_sorted_norm
+
+
+def reference(series_list):
+    """pairwise distances like the former implementation, later series first"""
+    data = {}
+    for index, series in enumerate(series_list):
+        data[index] = {}
+        for otherindex, otherseries in enumerate(series_list):
+            if len(series) == len(otherseries):
+                if otherindex < index:
+                    data[index][otherindex] = get_mse_sorted_norm(series, otherseries)
+                    data[otherindex][index] = data[index][otherindex]
+                elif otherindex == index:
+                    data[index][index] = get_mse_sorted_norm(series, series)
+    return data
+
+
+class Test(unittest.TestCase):
+
+
+    def assert_matrix(self, matrix, data):
+        for index, row in enumerate(matrix):
+            assert sorted(data[index].keys()) == [otherindex for otherindex, value in enumerate(row) if value == value]
+            for otherindex, value in data[index].items():
+                assert abs(row[otherindex] - value) <= 1e-9 * max(1.0, abs(value))
+
+    def test_get_distance_matrix(self):
+        rng = numpy.random.default_rng(1)
+        series_list = [list(rng.uniform(0.0, 100.0, 288)) for _ in range(20)]
+        series_list[3] = [0.0] * 288 # maximum 0
+        series_list[5] = list(rng.uniform(0.0, 100.0, 100)) # other length
+        series_list[7] = list(series_list[2])
+        data = reference(series_list)
+        self.assert_matrix(get_distance_matrix(series_list), data)
+        self.assert_matrix(get_distance_matrix(series_list, block_rows=3), data)
+        self.assert_matrix(get_distance_matrix(series_list, workers=2, block_rows=4), data)
+
+    def test_correlation_matrix(self):
+        datalogger = DataLogger("testdata")
+        datalogger.setup("mysql", "performance", "2018-04-01")
+        datalogger.generate_caches()
+        tsa = datalogger["tsa"]
+        cma = CorrelationMatrixArray(tsa)
+        keys = list(tsa.keys())
+        for value_keyname in tsa.value_keynames:
+            cm = cma[value_keyname]
+            assert list(cm.keys()) == keys
+            self.assert_matrix(cm.matrix, reference([tsa[key][value_keyname] for key in keys]))
+            assert cm[(keys[0], keys[-1])] == cm[keys[-1]][keys[0]]
+            assert CorrelationMatrix.loads(cm.dumps()) == cm
+        # compact binary format
+        buf = io.BytesIO()
+        cma.dump(buf)
+        buf.seek(0)
+        assert CorrelationMatrixArray.load(buf) == cma
+        # json format of former versions
+        legacy = dict(((value_keyname, json.dumps(str(cma[value_keyname].data))) for value_keyname in cma.keys()))
+        assert CorrelationMatrixArray.load(io.BytesIO(json.dumps(legacy).encode("utf-8"))) == cma
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+# non std
+import numpy
+# own modules
+from datalogger4.DataLogger import DataLogger
+from datalogger4.CorrelationMatrixTime import CorrelationMatrixTime, get_distances, get_mse_sorted_norm_missing
+
+
+class Test(unittest.TestCase):
+
+
+    def test_get_distances(self):
+        rng = numpy.random.default_rng(1)
+        pairs = [(rng.uniform(0.0, 100.0, 288), rng.uniform(0.0, 100.0, 288)) for _ in range(10)]
+        pairs.append((rng.uniform(0.0, 100.0, 288), rng.uniform(0.0, 100.0, 270))) # less than 10% missing
+        pairs.append((rng.uniform(0.0, 100.0, 270), rng.uniform(0.0, 100.0, 288)))
+        pairs.append((numpy.zeros(288), rng.uniform(0.0, 100.0, 288))) # maximum 0
+        pairs.append((pairs[0][0], pairs[0][0]))
+        distances = get_distances(pairs)
+        for (series1, series2), distance in zip(pairs, distances):
+            value = get_mse_sorted_norm_missing(list(series1), list(series2))
+            assert abs(distance - value) <= 1e-9 * max(1.0, value)
+        assert distances[-1] == 0.0
+        # not comparable
+        distances = get_distances([(numpy.ones(288), numpy.ones(100)), (numpy.ones(0), numpy.ones(0))])
+        assert numpy.isnan(distances).all()
+
+    def test_correlation_matrix_time(self):
+        datalogger = DataLogger("testdata")
+        datalogger.setup("mysql", "performance", "2018-04-01")
+        datalogger.generate_caches()
+        tsa = datalogger["tsa"]
+        value_keyname = tsa.value_keynames[0]
+        cmt = CorrelationMatrixTime(tsa, tsa, value_keyname)
+        assert set(cmt.keys()) == set(tsa.keys())
+        assert all((mse == 0.0 for mse in cmt.values()))
+        assert CorrelationMatrixTime.loads(cmt.dumps()) == cmt
+        assert len(cmt.top(2)) == 2
+        assert [mse for _, mse in cmt.top()] == sorted(cmt.values(), reverse=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -7,6 +7,7 @@ import datetime
 import gzip
 import json
 import os
+import threading
 # own modules
 import datalogger4 # to use assertIsInstance for testing
 from datalogger4.DataLogger import DataLogger
@@ -79,6 +80,94 @@ class Test(unittest.TestCase):
         assert isinstance(quantile, dict)
         assert qa[("nagios.tilak.cc",)] == quantile
 
+    def test_table(self):
+        dl = DataLogger(self.basedir)
+        dl.setup(self.project, self.tablename, self.datestring)
+        dl.generate_caches()
+        context = dl.table(self.project, self.tablename, self.datestring)
+        assert context.is_context and not dl.is_context
+        assert context.meta == dl.meta
+        with self.assertRaises(AttributeError):
+            context.setup("sanportperf", "fcIfC3AccountingTable", self.datestring)
+        # setup of shared instance does not change context
+        dl.setup("sanportperf", "fcIfC3AccountingTable", self.datestring)
+        assert context.tablename == self.tablename
+        # loaded objects are shared between contexts
+        context2 = dl.table(self.project, self.tablename, self.datestring)
+        assert context2["tsa"] is context["tsa"]
+        # concurrent contexts of different tables
+        keys = list(context["tsa"].keys())
+        results = {}
+        def worker(num):
+            project, tablename = (self.project, self.tablename) if num % 2 else ("sanportperf", "fcIfC3AccountingTable")
+            worker_context = dl.table(project, tablename, self.datestring)
+            if num % 2:
+                results[num] = (worker_context.tablename, worker_context["tsa", keys[num % len(keys)]])
+            else:
+                results[num] = (worker_context.tablename, worker_context.meta)
+        threads = [threading.Thread(target=worker, args=(num, )) for num in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for num, (tablename, result) in results.items():
+            if num % 2:
+                assert tablename == self.tablename
+                assert result == context["tsa", keys[num % len(keys)]]
+            else:
+                assert tablename == "fcIfC3AccountingTable"
+                assert result["index_keynames"] == dl.index_keynames
+
+    def test_get_cache_version(self):
+        dl = DataLogger(self.basedir)
+        assert dl.get_cache_version(self.project, self.tablename, "1970-01-01") is None
+        dl.setup(self.project, self.tablename, self.datestring)
+        dl.generate_caches()
+        version = dl.get_cache_version(self.project, self.tablename, self.datestring)
+        assert version is not None
+        assert dl.get_cache_version(self.project, self.tablename, self.datestring) == version # stable while unchanged
+        dl.delete_caches()
+        assert dl.get_cache_version(self.project, self.tablename, self.datestring) != version
+        dl.generate_caches()
+
+    def test_load_correlation_time(self):
+        dl = DataLogger(self.basedir)
+        dl.setup(self.project, self.tablename, self.datestring)
+        dl.generate_caches()
+        tsa = dl["tsa"]
+        value_keyname = tsa.value_keynames[0]
+        version = dl.get_cache_version(self.project, self.tablename, self.datestring)
+        cmt = dl.load_correlation_time(self.datestring, value_keyname) # same day, no difference
+        assert set(cmt.keys()) == set(tsa.keys())
+        assert all((mse == 0.0 for mse in cmt.values()))
+        assert os.path.isfile(os.path.join(dl.derived_cachedir, "correlation_time_%s_%s_%s.json" % (self.datestring, version, version)))
+        assert dl.get_cache_version(self.project, self.tablename, self.datestring) == version # caches are unchanged
+        dl.object_cache.invalidate()
+        assert dl.load_correlation_time(self.datestring, value_keyname) == cmt # from cache file
+        with self.assertRaises(KeyError):
+            dl.load_correlation_time(self.datestring, "unknown")
+
+    def test_load_ts_many(self):
+        dl = DataLogger(self.basedir)
+        dl.setup(self.project, self.tablename, self.datestring)
+        dl.generate_caches()
+        tsa = dl["tsa"]
+        keys = list(tsa.keys())
+        loaded = list(dl.load_ts_many(keys=keys[::-1], workers=3))
+        assert [key for key, _ in loaded] == keys[::-1] # order of keys
+        for key, timeseries in loaded:
+            assert timeseries == tsa[key]
+        assert len(list(dl.load_ts_many())) == len(keys)
+        key_dict = tsa.get_index_dict(keys[0])
+        filtered = [key for key, _ in dl.load_ts_many(filterkeys=key_dict)]
+        assert filtered == [keys[0]]
+        with self.assertRaises(KeyError):
+            dl.load_ts_many(keys=[("unknown", )])
+        # consumer stops early
+        loaded = dl.load_ts_many(workers=2)
+        assert next(loaded)[0] == keys[0]
+        loaded.close()
+
     def test_load_tsa(self):
         print("testing delete_caches, load_tsa")
         dl = DataLogger("testdata")
@@ -156,6 +245,21 @@ class Test(unittest.TestCase):
         cache = dl["caches"]
         assert cache["ts"]["keys"]
 
+    def test_generate_caches_fused(self):
+        print("testing generate_caches in fused mode")
+        dl = DataLogger("testdata")
+        dl.setup("mysql", "performance", "2018-04-01")
+        dl.delete_caches()
+        dl.generate_caches(fused=True)
+        tsastats = dl.load_tsastats()
+        total_stats = dl.load_total_stats()
+        quantile = dl.load_quantile()
+        dl.delete_caches()
+        dl.generate_caches()
+        assert dl.load_tsastats() == tsastats
+        assert dl.load_total_stats() == total_stats
+        assert dl.load_quantile().to_data() == quantile.to_data()
+
     def test_add_table(self):
         print("testing add_table, delete_table")
         table_config = {
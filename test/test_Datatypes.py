@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import gzip
+# non std
+import numpy
+# own modules
+from datalogger4 import Datatypes
+from datalogger4 import Timeseries
+from datalogger4 import TimeseriesColumnar
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.testfile = "testdata/ts_KHUnc3J2d2Vic3FsMi50aWxhay5jYycsKQ==.csv.gz"
+        with gzip.open(self.testfile, "rt") as infile:
+            self.ts = Timeseries.load(infile)
+        self.times = [0.0, 10.0, 20.0, 20.0, 30.0, 45.0, 60.0]
+        # with overflow/reset at index 4 and zero duration at index 3
+        self.series = [100.0, 200.0, 300.0, 350.0, 50.0, 80.0, 80.0]
+
+    def test_reference(self):
+        for datatype, func in Timeseries.datatype_mapper.items():
+            expected = list(func(self.times, self.series))
+            assert Datatypes.datatype_mapper[datatype](self.times, self.series).tolist() == expected
+            for colname in self.ts.headers:
+                times = self.ts["ts"]
+                series = self.ts[colname]
+                try:
+                    expected = list(func(times, series))
+                except AssertionError:
+                    with self.assertRaises(AssertionError):
+                        Datatypes.datatype_mapper[datatype](times, series)
+                    continue
+                assert Datatypes.datatype_mapper[datatype](times, series).tolist() == expected
+
+    def test_batched(self):
+        values = numpy.array([self.series, [value * 2 for value in self.series]])
+        for datatype, func in Timeseries.datatype_mapper.items():
+            converted = Datatypes.datatype_mapper[datatype](self.times, values)
+            for row, series in zip(converted.tolist(), values.tolist()):
+                assert row == list(func(self.times, series))
+
+    def test_range_check(self):
+        series = list(self.series)
+        series[5] = -1.0
+        for datatype in ("counter32", "counter64", "gauge32"):
+            with self.assertRaises(AssertionError) as exc:
+                Datatypes.datatype_mapper[datatype](self.times, series)
+            assert "counter -1.000000 out of range at time 45.000000" in str(exc.exception)
+        series[5] = 2.0**33
+        with self.assertRaises(AssertionError):
+            Datatypes.datatype_counter32(self.times, series)
+        Datatypes.datatype_counter64(self.times, series)
+
+    def test_percent_zero(self):
+        assert Datatypes.datatype_percent(self.times, [0.0] * 7).tolist() == [0.0] * 7
+
+    def test_convert_columns(self):
+        values = numpy.array([self.series, self.series, self.series])
+        converted = Datatypes.convert_columns(self.times, values, ["asis", "counter32", "derive"])
+        assert converted[0].tolist() == self.series
+        assert converted[1].tolist() == Timeseries.datatype_mapper["counter32"](self.times, self.series)
+        assert converted[2].tolist() == Timeseries.datatype_mapper["derive"](self.times, self.series)
+
+    def test_convert_many(self):
+        datatypes = {
+            "com_select": "counter64",
+            "uptime": "asis",
+            "bytes_sent": "persecond",
+            "connections": "derive"
+        }
+        for timeseries_class in (Timeseries, TimeseriesColumnar):
+            with gzip.open(self.testfile, "rt") as infile:
+                ts1 = timeseries_class.load(infile)
+            with gzip.open(self.testfile, "rt") as infile:
+                ts2 = timeseries_class.load(infile)
+            ts1.convert_many(datatypes)
+            for colname, datatype in datatypes.items():
+                if datatype != "asis":
+                    ts2.convert(colname, datatype, None)
+            assert ts1.headers == ts2.headers
+            assert ts1.data == ts2.data
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
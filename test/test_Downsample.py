@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import math
+import random
+# non std
+import numpy
+# own modules
+from datalogger4.Downsample import downsample, lttb, minmax
+
+
+def lttb_reference(data, threshold):
+    """straight forward implementation of Largest-Triangle-Three-Buckets"""
+    every = (len(data) - 2) / (threshold - 2)
+    selected = [0, ]
+    last = 0
+    for bucket in range(threshold - 2):
+        start = int(math.floor(bucket * every)) + 1
+        stop = int(math.floor((bucket + 1) * every)) + 1
+        next_start = stop
+        next_stop = min(int(math.floor((bucket + 2) * every)) + 1, len(data))
+        if bucket == threshold - 3: # next bucket is last point
+            next_start, next_stop = len(data) - 1, len(data)
+        avg_x = sum(data[index][0] for index in range(next_start, next_stop)) / (next_stop - next_start)
+        avg_y = sum(data[index][1] for index in range(next_start, next_stop)) / (next_stop - next_start)
+        areas = [abs((data[last][0] - avg_x) * (data[index][1] - data[last][1]) - (data[last][0] - data[index][0]) * (avg_y - data[last][1])) for index in range(start, stop)]
+        last = start + areas.index(max(areas))
+        selected.append(last)
+    selected.append(len(data) - 1)
+    return selected
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.times = numpy.arange(8640) * 10.0
+        self.values = numpy.array([math.sin(index / 500.0) * 100.0 + random.random() for index in range(8640)])
+        self.values[4321] = 1000.0 # spike
+        self.values[1234] = -1000.0
+
+    def test_lttb(self):
+        selected = lttb(self.times, self.values, 500)
+        assert len(selected) == 500
+        assert selected[0] == 0 and selected[-1] == 8639
+        assert (numpy.diff(selected) > 0).all()
+        assert 4321 in selected and 1234 in selected
+        for length, threshold in ((1000, 100), (101, 50), (8640, 777)):
+            data = list(zip(self.times[:length].tolist(), self.values[:length].tolist()))
+            assert lttb(self.times[:length], self.values[:length], threshold).tolist() == lttb_reference(data, threshold)
+
+    def test_minmax(self):
+        selected = minmax(self.times, self.values, 500)
+        assert len(selected) <= 500
+        assert (numpy.diff(selected) > 0).all()
+        assert 4321 in selected and 1234 in selected
+        # every bucket contributes its extremes
+        bucket_nums = numpy.arange(8640) * 250 // 8640
+        for bucket in range(250):
+            indices = numpy.nonzero(bucket_nums == bucket)[0]
+            assert indices[numpy.argmax(self.values[indices])] in selected
+            assert indices[numpy.argmin(self.values[indices])] in selected
+
+    def test_downsample(self):
+        assert downsample(self.times[:10], self.values[:10], 100).tolist() == list(range(10))
+        assert len(downsample(self.times, self.values, 100, "minmax")) <= 100
+        with self.assertRaises(AttributeError):
+            downsample(self.times, self.values, 100, "unknown")
+        with self.assertRaises(AttributeError):
+            downsample(self.times, self.values, 2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
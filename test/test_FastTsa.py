@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import gzip
+import os
+import shutil
+# own modules
+from datalogger4 import DataLogger
+from datalogger4 import Timeseries
+from datalogger4 import TimeseriesBinary
+from datalogger4.FastTsa import get_raw_reader, get_raw_parallel_reader, get_byte_ranges, parse_raw_range, get_ts_binary_writer
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.datalogger = DataLogger("testdata")
+        self.datalogger.setup("mysql", "performance", "2018-04-01")
+        meta = self.datalogger.meta
+        self.delimiter = meta["delimiter"]
+        self.headers = list(meta["headers"])
+        self.tsa_def = {
+            "index_keys": list(meta["index_keynames"]),
+            "ts_key": meta["ts_keyname"],
+            "value_keys": list(meta["value_keynames"])
+        }
+        self.archive_filename = self.datalogger.raw_filename # gzipped raw input file
+        self.raw_filename = os.path.join(self.datalogger.cachedir, "performance_2018-04-01.csv")
+        with gzip.open(self.archive_filename, "rb") as infile:
+            with open(self.raw_filename, "wb") as outfile:
+                shutil.copyfileobj(infile, outfile)
+
+    def tearDown(self):
+        os.unlink(self.raw_filename)
+
+    def test_get_byte_ranges(self):
+        with open(self.raw_filename, "rb") as infile:
+            start = len(infile.readline())
+            infile.seek(0)
+            data = infile.read()
+        ranges = get_byte_ranges(self.raw_filename, start, 7, min_size=1)
+        assert len(ranges) == 7
+        assert ranges[0][0] == start
+        assert ranges[-1][1] == len(data)
+        for index, (start, stop) in enumerate(ranges):
+            assert data[stop - 1:stop] == b"\n"
+            if index > 0:
+                assert ranges[index - 1][1] == start
+
+    def test_parallel_reader(self):
+        tsa = get_raw_reader(self.archive_filename, self.delimiter, self.headers, self.tsa_def)()
+        assert len(tsa) > 0
+        for filename in (self.archive_filename, self.raw_filename):
+            tsa_parallel = get_raw_parallel_reader(filename, self.delimiter, self.headers, self.tsa_def, 3)()
+            assert tsa_parallel == tsa
+
+    def test_ts_binary_writer(self):
+        tsa = get_raw_reader(self.archive_filename, self.delimiter, self.headers, self.tsa_def)()
+        key = sorted(tsa.keys())[0]
+        filename = os.path.join(self.datalogger.cachedir, "ts_test.bin.gz")
+        get_ts_binary_writer(self.tsa_def["ts_key"], self.tsa_def["value_keys"])(filename, tsa[key])
+        try:
+            with TimeseriesBinary.open_file(filename, "rb") as infile:
+                ts = Timeseries.load_binary(infile)
+        finally:
+            os.unlink(filename)
+        assert ts.headers == self.tsa_def["value_keys"]
+        assert ts.data == [[ts, ] + tsa[key][ts] for ts in sorted(tsa[key])]
+
+    def test_parse_raw_range(self):
+        size = os.path.getsize(self.raw_filename)
+        with open(self.raw_filename, "rb") as infile:
+            start = len(infile.readline())
+        tsa, done, skipped = parse_raw_range(self.raw_filename, start, size, self.delimiter, self.headers, self.tsa_def)
+        assert done == sum((len(data) for data in tsa.values()))
+        assert skipped == 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import os
+# non std
+import numpy
+# own modules
+import datalogger4.Advanced as Advanced
+from datalogger4.DataLogger import DataLogger
+from datalogger4.b64 import b64encode
+from datalogger4.GroupBy import group_by, aggregate, GROUP_FUNCS
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.datalogger = DataLogger("testdata")
+        self.datalogger.setup("mysql", "performance", "2018-04-01")
+        self.datalogger.generate_caches()
+        self.tsa = self.datalogger["tsa"]
+        self.start_ts, _ = DataLogger.get_ts_for_datestring("2018-04-01")
+
+    def test_aggregate(self):
+        slots = numpy.array([3, 1, 3, 2, 1, 3])
+        values = numpy.array([[1.0, 2.0, 3.0, 4.0, 5.0, 6.0]])
+        expected = {
+            "sum" : [7.0, 4.0, 10.0],
+            "min" : [2.0, 4.0, 1.0],
+            "max" : [5.0, 4.0, 6.0],
+            "avg" : [3.5, 4.0, 10.0 / 3],
+            "count" : [2.0, 1.0, 3.0]
+        }
+        for group_func in GROUP_FUNCS:
+            distinct, aggregated = aggregate(slots, values, group_func)
+            assert distinct.tolist() == [1, 2, 3]
+            assert aggregated.tolist() == [expected[group_func]]
+        with self.assertRaises(AttributeError):
+            group_by(self.tsa, self.start_ts, (), "median")
+
+    def test_group_by(self):
+        # same result as calling group function for every value
+        legacy_funcs = {
+            "sum" : lambda a, b: a + b,
+            "min" : min,
+            "max" : max
+        }
+        for group_func, legacy_func in legacy_funcs.items():
+            grouped = Advanced.tsa_group_by(self.tsa, "2018-04-01", (), group_func, self.datalogger.interval)
+            legacy = Advanced.tsa_group_by(self.tsa, "2018-04-01", (), legacy_func, self.datalogger.interval)
+            assert list(grouped.keys()) == list(legacy.keys()) == [()]
+            expected = numpy.array([row[1:] for row in legacy[()].data])
+            # start of day returned by get_ts_for_datestring varies slightly with every call
+            assert numpy.allclose(grouped[()].times, [row[0] for row in legacy[()].data], rtol=0.0, atol=1.0)
+            assert numpy.allclose(grouped[()].values.T, expected, rtol=1e-12)
+        count = group_by(self.tsa, self.start_ts, (), "count", self.datalogger.interval)
+        assert count[()].values[0].sum() == sum((len(self.tsa[key]) for key in self.tsa.keys()))
+        # grouped by all index_keynames, nothing is aggregated
+        avg = group_by(self.tsa, self.start_ts, self.tsa.index_keynames, "avg", self.datalogger.interval)
+        assert set(avg.keys()) == set(self.tsa.keys())
+
+    def test_load_tsa_grouped(self):
+        version = self.datalogger.get_cache_version(self.datalogger.project, self.datalogger.tablename, self.datalogger.datestring)
+        grouped = self.datalogger.load_tsa_grouped((), "max")
+        assert os.path.isdir(os.path.join(self.datalogger.derived_cachedir, "group_max_%s_%s" % (b64encode(()), version)))
+        assert self.datalogger.get_cache_version(self.datalogger.project, self.datalogger.tablename, self.datalogger.datestring) == version
+        self.datalogger.object_cache.invalidate()
+        loaded = self.datalogger.load_tsa_grouped((), "max") # from cache directory
+        assert loaded == grouped
+        assert list(loaded[()].to_data()) == list(grouped[()].to_data())
+        self.datalogger.delete_caches()
+        assert not [entry for entry in os.listdir(self.datalogger.derived_cachedir) if entry.startswith("group_")]
+        self.datalogger.generate_caches()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import json
+# own modules
+from datalogger4.DataLogger import DataLogger
+from datalogger4.JsonStream import iter_json, iter_chunks, iter_envelope, BATCH_SIZE
+
+
+class Test(unittest.TestCase):
+
+
+    def test_iter_json(self):
+        data = {"a" : [1, 2.5, None, True], "b" : {"c" : "ä", "d" : (1, 2)}, "e" : [], "f" : {}}
+        assert json.loads("".join(iter_json(data))) == json.loads(json.dumps(data))
+        nested = {"rows" : (dict(((str(col), row * col) for col in range(3))) for row in range(100))}
+        assert json.loads("".join(iter_json(nested))) == {"rows" : [dict(((str(col), row * col) for col in range(3))) for row in range(100)]}
+        assert json.loads("".join(iter_json(iter([])))) == []
+
+    def test_iter_chunks(self):
+        chunks = list(iter_chunks(("x" * 10 for _ in range(25)), 100))
+        assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+
+    def test_iter_envelope(self):
+        data = json.loads("".join(iter_envelope(({"ts" : ts} for ts in range(1000)), chunk_size=128)))
+        assert data["results"] == [{"ts" : ts} for ts in range(1000)]
+        assert "duration" in data and "timestamp" in data
+        # exception while streaming, output is still valid json
+        def failing():
+            yield {"rows" : [1, 2]}
+            raise KeyError("broken")
+        data = json.loads("".join(iter_envelope({"series" : failing()})))
+        assert data["results"] == {"series" : [{"rows" : [1, 2]}]}
+        assert data["status_code"] == 500
+        # or transfer is aborted
+        with self.assertRaises(KeyError):
+            "".join(iter_envelope({"series" : failing()}, raise_errors=True))
+        # exception after several batches, items holding iterators
+        def failing_batches():
+            for index in range(3 * BATCH_SIZE):
+                yield {"index" : index, "values" : iter([1, 2])} if index == BATCH_SIZE else index
+            raise KeyError("broken")
+        data = json.loads("".join(iter_envelope({"series" : failing_batches()})))
+        assert len(data["results"]["series"]) == 3 * BATCH_SIZE
+        assert data["results"]["series"][BATCH_SIZE] == {"index" : BATCH_SIZE, "values" : [1, 2]}
+        assert data["status_code"] == 500
+
+    def test_timeseries(self):
+        datalogger = DataLogger("testdata")
+        datalogger.setup("mysql", "performance", "2018-04-01")
+        datalogger.generate_caches()
+        tsa = datalogger["tsa"]
+        key = list(tsa.keys())[0]
+        data = json.loads("".join(iter_envelope(tsa[key].to_data())))
+        assert data["results"] == json.loads(json.dumps(list(tsa[key].to_data())))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import os
+import re
+import shutil
+import tempfile
+# own modules
+from datalogger4.KeyIndex import KeyIndex
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.index_keynames = ("hostname", "ifname")
+        self.keys = [
+            ("srv1", "eth0"),
+            ("srv1", "eth1"),
+            ("srv2", "eth0"),
+            ("srv10", "lo"),
+            ("db1", "eth0"),
+        ]
+        self.keyindex = KeyIndex(self.index_keynames, self.keys, ts_format="bin")
+
+    def check(self, filterkeys, matchtype="and"):
+        """index result has to be the same as filtermatch on every key"""
+        expected = [key for key in self.keys if KeyIndex.filtermatch(dict(zip(self.index_keynames, key)), filterkeys, matchtype)]
+        assert self.keyindex.filter(filterkeys, matchtype) == expected
+        return expected
+
+    def test_filter(self):
+        assert self.check({"hostname" : "srv1"}) == [("srv1", "eth0"), ("srv1", "eth1")]
+        assert self.check({"hostname" : "srv1", "ifname" : None}) == [("srv1", "eth0"), ("srv1", "eth1")]
+        assert self.check({"hostname" : ["srv2", "db1"], "ifname" : "eth0"}) == [("srv2", "eth0"), ("db1", "eth0")]
+        assert self.check({"hostname" : {"prefix" : "srv1"}}) == [("srv1", "eth0"), ("srv1", "eth1"), ("srv10", "lo")]
+        assert self.check({"hostname" : {"regex" : "srv[0-9]$"}, "ifname" : "eth1"}) == [("srv1", "eth1")]
+        assert self.check({"hostname" : re.compile(".*1"), "ifname" : "lo"}) == [("srv10", "lo")]
+        assert self.check({"hostname" : "db1", "ifname" : "eth1"}, "or") == [("srv1", "eth1"), ("db1", "eth0")]
+        assert self.check({"hostname" : "nonexisting"}) == []
+        assert self.check({"hostname" : None, "ifname" : None}) == self.keys
+        assert self.check({"hostname" : None}, "or") == []
+
+    def test_values(self):
+        assert self.keyindex.values("hostname") == ["db1", "srv1", "srv10", "srv2"]
+        assert len(self.keyindex) == 5
+        assert ("srv2", "eth0") in self.keyindex
+        assert ("srv2", "eth1") not in self.keyindex
+
+    def test_dump_load(self):
+        outdir = tempfile.mkdtemp()
+        try:
+            assert not KeyIndex.exists(outdir, self.index_keynames)
+            self.keyindex.dump(outdir)
+            assert os.listdir(outdir) == [KeyIndex.get_dumpfilename(self.index_keynames)]
+            keyindex = KeyIndex.load(outdir, self.index_keynames)
+        finally:
+            shutil.rmtree(outdir)
+        assert keyindex.index_keynames == self.index_keynames
+        assert keyindex.ts_format == "bin"
+        assert keyindex.keys() == self.keys
+        assert keyindex.filter({"hostname" : {"prefix" : "srv"}, "ifname" : "eth0"}) == [("srv1", "eth0"), ("srv2", "eth0")]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
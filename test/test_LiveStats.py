@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import gzip
+import os
+import random
+import shutil
+import tempfile
+# own modules
+from datalogger4 import DataLogger
+from datalogger4 import TimeseriesArrayStats
+from datalogger4.LiveStats import LiveStats, RunningStats, convert_value
+from datalogger4.FastTsa import get_raw_reader, get_tsa
+from datalogger4.CustomExceptions import DataFormatError
+from datalogger4.TimeseriesStats import median
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.datalogger = DataLogger("testdata")
+        self.datalogger.setup("mysql", "performance", "2018-04-01")
+        meta = self.datalogger.meta
+        self.livestats = LiveStats(meta["index_keynames"], meta["value_keynames"], meta["ts_keyname"], self.datalogger.datatypes, "2018-04-01")
+        self.rows = []
+        with gzip.open(self.datalogger.raw_filename, "rt") as infile:
+            headers = infile.readline().strip().split(meta["delimiter"])
+            for line in infile:
+                self.rows.append(dict(zip(headers, line.strip().split(meta["delimiter"]))))
+        self.rows.sort(key=lambda row: float(row[meta["ts_keyname"]]))
+        for row in self.rows:
+            self.livestats.add(row)
+        # the same data analyzed like the nightly job does
+        tsa_def = {
+            "index_keys": list(meta["index_keynames"]),
+            "ts_key": meta["ts_keyname"],
+            "value_keys": list(meta["value_keynames"])
+        }
+        tsa = get_tsa(tsa_def, get_raw_reader(self.datalogger.raw_filename, meta["delimiter"], list(meta["headers"]), tsa_def)(), datatypes=self.datalogger.datatypes)
+        tsa.finalize()
+        self.tsastats = TimeseriesArrayStats(tsa)
+
+    def test_stats(self):
+        assert sorted(self.livestats.keys()) == sorted(self.tsastats.keys())
+        for key in self.tsastats.keys():
+            live = self.livestats[key]
+            for value_keyname in self.datalogger.value_keynames:
+                stats = self.tsastats[key][value_keyname]
+                for funcname in ("min", "max", "sum", "count", "first", "last", "inc", "dec", "diff", "avg"):
+                    assert live[value_keyname][funcname] == stats[funcname]
+                self.assertAlmostEqual(live[value_keyname]["std"], stats["std"], delta=abs(stats["std"]) * 1e-9)
+                assert stats["min"] <= live[value_keyname]["median"] <= stats["max"]
+
+    def test_total_stats(self):
+        total_stats = self.livestats.total_stats()
+        for value_keyname in self.datalogger.value_keynames:
+            assert total_stats[value_keyname]["count"] == sum(stats[value_keyname]["count"] for stats in self.tsastats.values())
+
+    def test_ignore_old_rows(self):
+        key = list(self.livestats.keys())[0]
+        count = self.livestats[key]["uptime"]["count"]
+        assert not self.livestats.add(self.rows[0])
+        assert self.livestats[key]["uptime"]["count"] == count
+
+    def test_invalid_first_row(self):
+        livestats = LiveStats(("h", ), ["v"], "ts", {"v" : "counter32"}, "2018-04-01")
+        with self.assertRaises(DataFormatError):
+            livestats.add({"h" : "a", "ts" : "1.0", "v" : "-5"})
+        assert ("a", ) not in livestats
+        assert livestats.add({"h" : "b", "ts" : "1.0", "v" : "5"})
+        assert livestats.keys() == [("b", )]
+        assert livestats.total_stats()["v"]["count"] == 1
+        assert livestats.add({"h" : "a", "ts" : "2.0", "v" : "5"}) # first valid row of key
+        assert livestats[("a", )]["v"]["count"] == 1
+
+    def test_convert_value(self):
+        assert convert_value("asis", None, None, 1.0, 5.0) == 5.0
+        assert convert_value("persecond", None, None, 1.0, 5.0) == 0.0
+        assert convert_value("persecond", 1.0, 5.0, 3.0, 9.0) == 2.0
+        assert convert_value("counter32", 1.0, 2.0**32 - 1.0, 2.0, 1.0) == 2.0
+        assert convert_value("counterreset", 1.0, 10.0, 2.0, 3.0) == 3.0
+
+    def test_median(self):
+        values = [random.gauss(100.0, 10.0) for _ in range(10000)]
+        running_stats = RunningStats()
+        for value in values[:5]:
+            running_stats.add(value)
+        assert running_stats.median == median(values[:5])
+        for value in values[5:]:
+            running_stats.add(value)
+        self.assertAlmostEqual(running_stats.median, median(values), delta=1.0)
+
+    def test_dump_load(self):
+        outdir = tempfile.mkdtemp()
+        try:
+            self.livestats.dump(outdir)
+            livestats = LiveStats.load(outdir)
+        finally:
+            shutil.rmtree(outdir)
+        assert livestats.stats == self.livestats.stats
+        row = dict(self.rows[-1])
+        row["ts"] = str(float(row["ts"]) + 300.0)
+        assert livestats.add(row) and self.livestats.add(row)
+        assert livestats.stats == self.livestats.stats
+
+    def test_update(self):
+        meta = self.datalogger.meta
+        outdir = tempfile.mkdtemp()
+        filename = os.path.join(outdir, "performance_2018-04-01.csv")
+        lines = ["\t".join([row[header] for header in meta["headers"]]) + "\n" for row in self.rows]
+        half = len(lines) // 2
+        livestats = LiveStats(meta["index_keynames"], meta["value_keynames"], meta["ts_keyname"], self.datalogger.datatypes, "2018-04-01")
+        try:
+            with open(filename, "wt") as outfile:
+                outfile.write("\t".join(meta["headers"]) + "\n")
+                outfile.writelines(lines[:half])
+                outfile.write(lines[half][:10]) # partially written line
+            assert livestats.update(filename) == half
+            assert livestats.dump(outdir)
+            # rows appended by another process
+            with open(filename, "at") as outfile:
+                outfile.write(lines[half][10:])
+                outfile.writelines(lines[half + 1:])
+            assert livestats.update(filename) == len(lines) - half
+            assert livestats.update(filename) == 0
+            assert livestats.stats == self.livestats.stats
+            assert livestats.position == os.path.getsize(filename)
+            # restart, rows appended since last dump are read again
+            restarted = LiveStats.load(outdir)
+            assert restarted.update(filename) == len(lines) - half
+            assert restarted.stats == self.livestats.stats
+            # older LiveStats of another process do not replace newer dump
+            older = LiveStats.load(outdir)
+            assert livestats.dump(outdir)
+            assert not older.dump(outdir)
+            assert LiveStats.load(outdir).position == livestats.position
+        finally:
+            shutil.rmtree(outdir)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import shutil
+import tempfile
+# own modules
+from datalogger4.DataLogger import DataLogger
+from datalogger4.LongtimeStats import LongtimeStats
+from datalogger4.CustomExceptions import DataFormatError
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.datalogger = DataLogger("testdata")
+        self.datalogger.setup("mysql", "performance", "2018-04-01")
+        self.tsastats = self.datalogger.load_tsastats()
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_add_get(self):
+        longtime_stats = LongtimeStats(self.path, 2018)
+        longtime_stats.add("2018-04-01", self.tsastats)
+        longtime_stats.add("2018-12-31", self.tsastats)
+        longtime_stats = LongtimeStats(self.path, 2018) # read from disk
+        assert sorted(longtime_stats.keys()) == sorted(self.tsastats.keys())
+        for key in self.tsastats.keys():
+            stats = longtime_stats.get_stats(key)
+            assert sorted(stats.keys()) == ["2018-04-01", "2018-12-31"]
+            assert stats["2018-04-01"] == self.tsastats[key].stats
+            assert list(longtime_stats.get_stats(key, "2018-04-02", "2018-12-30").keys()) == []
+        # replace day, keys missing on this day are removed
+        key = list(self.tsastats.keys())[0]
+        del self.tsastats[key]
+        longtime_stats.add("2018-04-01", self.tsastats)
+        assert list(longtime_stats.get_stats(key).keys()) == ["2018-12-31"]
+        with self.assertRaises(KeyError):
+            longtime_stats.get_day("2019-01-01")
+
+    def test_value_keynames(self):
+        longtime_stats = LongtimeStats(self.path, 2018)
+        longtime_stats.add("2018-04-01", self.tsastats)
+        self.tsastats.value_keynames = self.tsastats.value_keynames[1:]
+        with self.assertRaises(DataFormatError):
+            longtime_stats.add("2018-04-02", self.tsastats)
+
+    def test_datalogger(self):
+        self.datalogger.delete_caches()
+        self.datalogger.generate_caches()
+        self.tsastats = self.datalogger.load_tsastats()
+        key = list(self.tsastats.keys())[0]
+        stats = self.datalogger.load_longtime_stats(key, "2017-12-01", "2018-04-30")
+        assert stats == {"2018-04-01" : self.tsastats[key].stats}
+        value_keyname = self.datalogger.value_keynames[0]
+        ret_data = self.datalogger.get_tsastats_longtime_hc("2018-04", key, value_keyname)
+        assert ret_data["max"] == [("2018-04-01", self.tsastats[key][value_keyname]["max"])]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
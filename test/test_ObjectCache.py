@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import threading
+import time
+# non std
+import numpy
+# own modules
+from datalogger4.DataLogger import DataLogger
+from datalogger4.ObjectCache import ObjectCache, get_size
+
+
+class Test(unittest.TestCase):
+
+
+    def test_lru(self):
+        cache = ObjectCache(300)
+        cache.set(("a", ), "A", size=100)
+        cache.set(("b", ), "B", size=100)
+        cache.set(("c", ), "C", size=100)
+        assert cache.get(("a", )) == "A" # a is now most recently used
+        cache.set(("d", ), "D", size=100)
+        assert ("b", ) not in cache
+        assert sorted(key[0] for key in (("a", ), ("c", ), ("d", )) if key in cache) == ["a", "c", "d"]
+        with self.assertRaises(KeyError):
+            cache.get(("b", ))
+        cache.set(("e", ), "E", size=1000) # larger than budget
+        assert ("e", ) not in cache
+        assert cache.nbytes == 300
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+
+    def test_version_invalidate(self):
+        cache = ObjectCache(1000)
+        cache.set(("p", "t", "d1", "tsa"), 1, version=1)
+        cache.set(("p", "t", "d1", "qa"), 2, version=1)
+        cache.set(("p", "t", "d2", "tsa"), 3, version=1)
+        assert cache.get(("p", "t", "d1", "tsa"), 1) == 1
+        with self.assertRaises(KeyError):
+            cache.get(("p", "t", "d1", "tsa"), 2) # changed
+        assert ("p", "t", "d1", "tsa") not in cache
+        cache.invalidate(("p", "t", "d1"))
+        assert len(cache) == 1
+        assert cache.stats()["invalidations"] == 2
+
+    def test_get_or_load(self):
+        cache = ObjectCache(1000)
+        calls = []
+        def loader():
+            calls.append(1)
+            time.sleep(0.1) # other threads arrive while loading
+            return "loaded"
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_load(("a", ), loader, version=1))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == ["loaded"] * 4
+        assert len(calls) == 1 # loaded only once
+        assert cache.get_or_load(("a", ), loader, version=2) == "loaded" # outdated, loaded again
+        assert len(calls) == 2
+
+    def test_get_size(self):
+        array = numpy.zeros(1000)
+        assert get_size(array) == 8000
+        data = [[float(index), 1.0, 2.0] for index in range(10000)]
+        self.assertAlmostEqual(get_size(data), get_size(data[:16]) * 10000 / 16, delta=get_size(data) * 0.1)
+
+    def test_datalogger(self):
+        datalogger = DataLogger("testdata")
+        datalogger.setup("mysql", "performance", "2018-04-01")
+        datalogger.generate_caches()
+        cache = datalogger.object_cache
+        tsa = datalogger["tsa"]
+        tsa.cache = True # hold Timeseries after loading
+        key = list(tsa.keys())[0]
+        nbytes = cache.nbytes
+        datalogger["tsa", key]
+        assert cache.nbytes > nbytes # Timeseries loaded on demand
+        # other instance, other setup in between, loaded object is still available
+        datalogger2 = DataLogger("testdata")
+        datalogger2.setup("sanportperf", "fcIfC3AccountingTable", "2018-04-01")
+        datalogger.setup("sanportperf", "fcIfC3AccountingTable", "2018-04-01")
+        datalogger2.setup("mysql", "performance", "2018-04-01")
+        hits = cache.hits
+        assert datalogger2["tsa"] is tsa
+        assert cache.hits == hits + 1
+        # invalidated by delete_caches and generate_caches
+        datalogger2.delete_caches()
+        datalogger2.generate_caches()
+        assert datalogger2["tsa"] is not tsa
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+# non std
+import numpy
+# own modules
+from datalogger4.DataLogger import DataLogger
+from datalogger4.Quantile import QuantileArray, Quantile, histogram, QUANTS
+
+
+def reference(series, minn, maxx):
+    """quantiles of one series, value by value like the former implementation"""
+    quants = [0] * QUANTS
+    value_range = abs(maxx - minn)
+    if value_range == 0.0:
+        return quants
+    for value in series:
+        quant = int((100 * abs(value - minn) / value_range) / 20)
+        if quant == QUANTS:
+            quant -= 1
+        quants[quant] += 1
+    return quants
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_histogram(self):
+        rng = numpy.random.default_rng(1)
+        series = [rng.uniform(-5.0, 17.0, size) for size in (1, 10, 288, 0, 1000)]
+        series[2][7] = 17.0 # maximum belongs to last quantile
+        minn = min((serie.min() for serie in series if len(serie)))
+        maxx = 17.0
+        counts = histogram(series, minn, maxx)
+        assert counts.tolist() == [reference(serie, minn, maxx) for serie in series]
+        assert histogram(series, 3.0, 3.0).tolist() == [[0] * QUANTS] * len(series)
+        # series with values out of range or NaN are not calculated
+        counts = histogram([numpy.array([1.0, 2.0]), numpy.array([1.0, 50.0]), numpy.array([numpy.nan])], 0.0, 2.0)
+        assert counts.tolist() == [[0, 0, 1, 0, 1], [-1] * QUANTS, [-1] * QUANTS]
+
+    def test_quantile_array(self):
+        datalogger = DataLogger("testdata")
+        datalogger.setup("mysql", "performance", "2018-04-01")
+        datalogger.generate_caches()
+        tsa = datalogger["tsa"]
+        tsastats = datalogger["tsastats"]
+        qa = QuantileArray(tsa, tsastats)
+        for value_keyname in tsa.value_keynames:
+            maxx = max((tsstats[value_keyname]["max"] for tsstats in tsastats.values()))
+            minn = min((tsstats[value_keyname]["min"] for tsstats in tsastats.values()))
+            quantile = Quantile(tsa, value_keyname, tsastats)
+            assert quantile == qa[value_keyname]
+            for key in tsa.keys():
+                assert list(qa[key][value_keyname].values()) == reference(tsa[key][value_keyname], minn, maxx)
+        # binary format, memory mapped
+        qa.dump(self.tempdir)
+        assert sorted(os.listdir(self.tempdir)) == ["quantile.npy", "quantile_index.json"]
+        qa2 = QuantileArray.load(self.tempdir)
+        assert qa2 == qa
+        key = list(tsa.keys())[0]
+        assert qa2[key] == qa[key]
+        assert qa2.to_data() == qa.to_data()
+        assert QuantileArray.from_json(qa.to_json()) == qa
+
+    def test_load_legacy(self):
+        shutil.copy(os.path.join("testdata", "quantile.json"), self.tempdir)
+        assert QuantileArray.exists(self.tempdir)
+        qa = QuantileArray.load(self.tempdir)
+        assert qa[("nagios.tilak.cc", )]["com_select"] == {0: 288, 1: 0, 2: 0, 3: 0, 4: 0}
+        assert qa["com_select"].maxx == 308.92333333333335
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
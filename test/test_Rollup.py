@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+# non std
+import numpy
+# own modules
+from datalogger4 import Timeseries
+from datalogger4 import TimeseriesColumnar
+from datalogger4.DataLogger import DataLogger
+from datalogger4.Rollup import rollup, get_matrix
+
+
+class Test(unittest.TestCase):
+
+
+    def test_rollup(self):
+        times = numpy.array([-10.0, 0.0, 100.0, 250.0, 300.0, 900.0, 1000.0])
+        values = numpy.array([
+            [9.0, 1.0, 2.0, 6.0, 4.0, 5.0, 9.0],
+            [0.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+        ])
+        data = rollup(times, values, 0.0, 300, 3) # first and last value outside
+        assert data[0, 0].tolist() == [1.0, 6.0, 3.0, 3.0]
+        assert data[1, 0].tolist() == [4.0, 4.0, 4.0, 1.0]
+        assert numpy.isnan(data[2]).all() # no data
+        assert data[0, 1].tolist() == [1.0, 1.0, 1.0, 3.0]
+
+    def test_get_matrix(self):
+        ts = Timeseries(["a", "b"])
+        ts.add(1.0, [1.0, 2.0])
+        ts.add(2.0, [3.0, 4.0])
+        for timeseries in (ts, TimeseriesColumnar.from_columns(["a", "b"], [1.0, 2.0], [[1.0, 3.0], [2.0, 4.0]])):
+            times, values = get_matrix(timeseries, ["b", "a"])
+            assert times.tolist() == [1.0, 2.0]
+            assert values.tolist() == [[2.0, 4.0], [1.0, 3.0]]
+
+    def test_datalogger(self):
+        datalogger = DataLogger("testdata")
+        datalogger.setup("mysql", "performance", "2018-04-01")
+        datalogger.delete_caches()
+        datalogger.generate_caches()
+        tsastats = datalogger.load_tsastats()
+        key = list(tsastats.keys())[0]
+        for max_points, expected in ((1000, 300), (24, 3600), (23, 86400)):
+            interval, data = datalogger.load_rollup(key, "2018-04-01", "2018-04-01", max_points=max_points)
+            assert interval == expected
+            assert sorted(data.keys()) == sorted(datalogger.value_keynames)
+            for value_keyname, rows in data.items():
+                stats = tsastats[key][value_keyname]
+                assert 0 < len(rows) <= 86400 // interval + 1
+                assert [row[0] for row in rows] == sorted(set(row[0] for row in rows))
+                assert sum(row[4] for row in rows) == stats["count"]
+                assert min(row[1] for row in rows) == stats["min"]
+                assert max(row[2] for row in rows) == stats["max"]
+                self.assertAlmostEqual(sum(row[3] * row[4] for row in rows), stats["sum"], delta=abs(stats["sum"]) * 1e-9)
+        # days without data are missing
+        _, data1 = datalogger.load_rollup(key, "2018-04-01", "2018-04-01", value_keynames=["uptime"])
+        _, data2 = datalogger.load_rollup(key, "2018-03-31", "2018-04-02", value_keynames=["uptime"])
+        assert list(data2.keys()) == ["uptime"]
+        assert data1 == data2
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+# own modules
+from datalogger4.DataLogger import DataLogger
+from datalogger4.SearchIndex import SearchIndex
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.search_index = SearchIndex()
+        self.search_index.update("snmp", "ifTable", ("hostname", "ifname"), [("srv1", "eth0"), ("srv10", "eth0"), ("websrv1", "eth1")])
+        self.search_index.update("vmware", "vms", ("vmname", ), [("srv1", ), ("dbsrv1-clone", )])
+
+    def test_search(self):
+        matches = self.search_index.search("srv1")
+        assert [(match[0], match[3]) for match in matches] == [
+            ("vmware", ("srv1", )), # equal, shortest
+            ("snmp", ("srv1", "eth0")),
+            ("snmp", ("srv10", "eth0")), # starts with
+            ("vmware", ("dbsrv1-clone", )), # somewhere
+            ("snmp", ("websrv1", "eth1")),
+        ]
+        assert matches[1][2] == ("hostname", "ifname")
+        assert len(self.search_index.search("srv1", limit=2)) == 2
+        assert self.search_index.search("eth1")[0][3] == ("websrv1", "eth1")
+        assert self.search_index.search("', 'eth0") # pattern spanning index values
+        assert self.search_index.search("nonexisting") == []
+        assert self.search_index.search("srv1-eth0") == [] # all trigrams found, but not pattern
+        with self.assertRaises(AttributeError):
+            self.search_index.search("sr")
+
+    def test_update_remove(self):
+        self.search_index.update("vmware", "vms", ("vmname", ), [("srv2", )])
+        assert len(self.search_index) == 4
+        assert [match[0] for match in self.search_index.search("srv1")] == ["snmp"] * 3
+        self.search_index.remove("snmp", "ifTable")
+        assert self.search_index.tables() == [("vmware", "vms")]
+        assert self.search_index.search("srv1") == []
+        data = self.search_index.to_data() # compacted
+        assert data["entries"] == [[0, ["srv2"]]]
+        assert SearchIndex.from_data(data).search("srv2")[0][3] == ("srv2", )
+
+    def test_dump_load(self):
+        outdir = tempfile.mkdtemp()
+        try:
+            SearchIndex.update_file(outdir, "snmp", "ifTable", ("hostname", "ifname"), [("srv1", "eth0")])
+            SearchIndex.update_file(outdir, "vmware", "vms", ("vmname", ), [("srv1", )])
+            SearchIndex.update_file(outdir, "snmp", "ifTable")
+            search_index = SearchIndex.load(outdir)
+        finally:
+            shutil.rmtree(outdir)
+        assert search_index.tables() == [("vmware", "vms")]
+        assert search_index.search("srv1") == [("vmware", "vms", ("vmname", ), ("srv1", ))]
+
+    def test_datalogger(self):
+        dl = DataLogger("testdata")
+        dl.setup("mysql", "performance", "2018-04-01")
+        dl.generate_caches()
+        search_index = dl.load_search_index("2018-04-01")
+        assert ("mysql", "performance") in search_index.tables()
+        keys = dl["caches"]["ts"]["keys"]
+        matches = search_index.search("tilak")
+        assert sorted(str(match[3]) for match in matches if match[:2] == ("mysql", "performance")) == sorted(keys)
+        # held in memory until stored file changes
+        assert dl.load_search_index("2018-04-01") is search_index
+        # rebuilt from caches, if missing
+        os.unlink(SearchIndex.get_dumpfilename(os.path.join(dl.global_cachedir, "2018-04-01")))
+        assert len(dl.load_search_index("2018-04-01")) == 0
+        assert ("mysql", "performance") in dl.update_search_index("2018-04-01")
+        assert dl.update_search_index("2018-04-01") == []
+        assert sorted(dl.load_search_index("2018-04-01").search("tilak")) == sorted(matches)
+        dl.delete_caches()
+        assert ("mysql", "performance") not in dl.load_search_index("2018-04-01").tables()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
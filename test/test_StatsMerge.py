@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import io
+import copy
+# non std
+import numpy
+# own modules
+from datalogger4.DataLogger import DataLogger
+from datalogger4.TimeseriesStats import TimeseriesStats
+from datalogger4.StatsMerge import merge
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.datalogger = DataLogger("testdata")
+        self.datalogger.setup("mysql", "performance", "2018-04-01")
+        self.datalogger.delete_caches() # tsastats of partly read raw data could be left by other tests
+        self.datalogger.generate_caches()
+        self.tsa = self.datalogger["tsa"]
+        self.tsastats = self.datalogger["tsastats"]
+        self.keys = list(self.tsastats.keys())
+
+    def test_partials(self):
+        tsstats = TimeseriesStats(self.tsa[self.keys[0]])
+        partials = tsstats.partials
+        assert partials["first_ts"] == self.tsa[self.keys[0]].start_ts
+        for value_keyname in self.tsa.value_keynames:
+            stats = tsstats[value_keyname]
+            self.assertAlmostEqual(partials["m2"][value_keyname], stats["count"] * stats["std"] ** 2, delta=1e-6 * max(1.0, partials["m2"][value_keyname]))
+        buf = io.StringIO()
+        tsstats.dump(buf)
+        buf.seek(0)
+        loaded = TimeseriesStats.load(buf)
+        assert loaded == tsstats
+        assert loaded.partials == partials
+        assert "__partials__" not in loaded.keys()
+        assert TimeseriesStats.from_json(tsstats.to_json()).partials == partials
+
+    def test_merge(self):
+        merged = merge([self.tsastats[key] for key in self.keys], [()] * len(self.keys), self.tsa.value_keynames)
+        stats, partials = merged[()]
+        first_key = min(self.keys, key=lambda key: self.tsa[key].start_ts)
+        last_key = max(self.keys, key=lambda key: self.tsa[key].stop_ts)
+        for value_keyname in self.tsa.value_keynames:
+            values = numpy.concatenate([numpy.asarray(self.tsa[key].get_serie(value_keyname), dtype=numpy.float64) for key in self.keys])
+            total = stats[value_keyname]
+            assert total["count"] == len(values)
+            assert total["min"] == values.min()
+            assert total["max"] == values.max()
+            for name, value in (("sum", values.sum()), ("avg", values.mean()), ("std", values.std())):
+                self.assertAlmostEqual(total[name], value, delta=1e-9 * max(1.0, abs(value)))
+            assert total["first"] == self.tsastats[first_key][value_keyname]["first"]
+            assert total["last"] == self.tsastats[last_key][value_keyname]["last"]
+            assert total["inc"] == sum((self.tsastats[key][value_keyname]["inc"] for key in self.keys))
+            assert total["min"] <= total["median"] <= total["max"]
+        assert partials["first_ts"] == self.tsa[first_key].start_ts
+        # one group per key is the same as the statistics
+        merged = merge([self.tsastats[key] for key in self.keys], self.keys, self.tsa.value_keynames)
+        for key in self.keys:
+            for value_keyname in self.tsa.value_keynames:
+                for name, value in self.tsastats[key][value_keyname].items():
+                    self.assertAlmostEqual(merged[key][0][value_keyname][name], value, delta=1e-9 * max(1.0, abs(value)))
+
+    def test_merge_without_partials(self):
+        # statistics stored by former versions, or LiveStats
+        with_partials = merge([self.tsastats[key] for key in self.keys], [()] * len(self.keys), self.tsa.value_keynames)[()][0]
+        without = merge([self.tsastats[key].stats for key in self.keys], [()] * len(self.keys), self.tsa.value_keynames)[()][0]
+        for value_keyname in self.tsa.value_keynames:
+            for name, value in with_partials[value_keyname].items():
+                if name not in ("first", "last", "diff"): # order of Timeseries is unknown
+                    self.assertAlmostEqual(without[value_keyname][name], value, delta=1e-6 * max(1.0, abs(value)))
+
+    def test_merge_order(self):
+        # without timestamps first and last are taken in given order
+        value_keyname = self.tsa.value_keynames[0]
+        stats_list = [copy.deepcopy(self.tsastats[key].stats) for key in self.keys[:3]]
+        for index, stats in enumerate(stats_list):
+            stats[value_keyname]["first"] = 2.0 * index + 1.0
+            stats[value_keyname]["last"] = 2.0 * index + 2.0
+        total = merge(stats_list, [()] * 3, self.tsa.value_keynames)[()][0][value_keyname]
+        assert (total["first"], total["last"], total["diff"]) == (1.0, 6.0, 5.0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
@@ -6,6 +6,7 @@ import datetime
 import gzip
 import os
 import json
+import io
 # own modules
 from datalogger4 import Timeseries
 
@@ -115,6 +116,15 @@ class Test(unittest.TestCase):
         assert ts[0][0] == self.app[0][0]
         assert ts[-1][-1] == self.app[-1][-1]
 
+    def test_dump_binary(self):
+        print("testing dump_binary, load_binary")
+        outbuffer = io.BytesIO()
+        self.app.dump_binary(outbuffer)
+        outbuffer.seek(0)
+        ts = Timeseries.load_binary(outbuffer)
+        assert ts.headers == self.app.headers
+        assert ts.data == self.app.data
+
     def test_get_serie(self):
         print("testing get_serie")
         # TODO: useless, use getitem
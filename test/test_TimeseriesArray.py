@@ -6,11 +6,14 @@ logging.basicConfig(level=logging.INFO)
 import datetime
 import gzip
 import os
+import shutil
+import tempfile
 # own modules
 import datalogger4 # for assertIsInstance
 from datalogger4.Timeseries import Timeseries as Timeseries
 from datalogger4.TimeseriesArray import TimeseriesArray as TimeseriesArray
 from datalogger4.TimeseriesArrayStats import TimeseriesArrayStats as TimeseriesArrayStats
+from datalogger4.KeyIndex import KeyIndex
 
 meta2 = {
     "blacklist": [],
@@ -245,6 +248,81 @@ class Test(unittest.TestCase):
         tsa1 = TimeseriesArray.load(testdir, meta2["index_keynames"], datatypes=meta2["value_keynames"], filterkeys=None, index_pattern=None, matchtype="and")
         assert tsa == tsa1
 
+    def test_dump_binary(self):
+        print("testing dump, load in binary formats")
+        tsa = TimeseriesArray.load("testdata/fcIfC3AccountingTable", meta2["index_keynames"], datatypes={})
+        for fmt in ("bin", "bin.gz"):
+            testdir = tempfile.mkdtemp()
+            try:
+                tsa.dump(testdir, overwrite=True, fmt=fmt)
+                assert all(filename.endswith((".json", "." + fmt)) for filename in os.listdir(testdir))
+                tsa1 = TimeseriesArray.load(testdir, meta2["index_keynames"], datatypes={})
+                assert tsa == tsa1
+                for key in tsa.keys():
+                    assert tsa[key].data == tsa1[key].data
+            finally:
+                shutil.rmtree(testdir)
+
+    def test_dump_pack(self):
+        print("testing dump, load with container file")
+        tsa = TimeseriesArray.load("testdata/fcIfC3AccountingTable", meta2["index_keynames"], datatypes={})
+        for fmt in ("pack", "pack.zlib"):
+            testdir = tempfile.mkdtemp()
+            try:
+                tsa.dump(testdir, fmt=fmt)
+                assert len(os.listdir(testdir)) == 3 # tsa, tspack and keyindex file
+                tsa1 = TimeseriesArray.load(testdir, meta2["index_keynames"], datatypes={})
+                assert tsa == tsa1
+                for key in tsa.keys():
+                    assert tsa[key].data == tsa1[key].data
+                filterkeys = {"hostname" : "fca-sr2-8gb-21", "ifDescr" : None}
+                tsa2 = TimeseriesArray.load(testdir, meta2["index_keynames"], datatypes={}, filterkeys=filterkeys)
+                assert 0 < len(tsa2) < len(tsa1)
+                for key in tsa2.keys():
+                    assert key[0] == "fca-sr2-8gb-21"
+            finally:
+                shutil.rmtree(testdir)
+
+    def test_mmap(self):
+        print("testing load with memory mapped binary files, prefetch")
+        tsa = TimeseriesArray.load("testdata/fcIfC3AccountingTable", meta2["index_keynames"], datatypes={})
+        for fmt in ("bin", "pack"):
+            testdir = tempfile.mkdtemp()
+            try:
+                tsa.dump(testdir, fmt=fmt)
+                tsa1 = TimeseriesArray.load(testdir, meta2["index_keynames"], datatypes={}, timeseries_class=datalogger4.TimeseriesColumnar, use_mmap=True)
+                assert tsa1.use_mmap
+                tsa1.prefetch(tsa1.keys())
+                for key in tsa.keys():
+                    assert not tsa1[key].times.flags.writeable # not copied
+                    assert tsa[key].data == tsa1[key].data
+                del tsa1
+            finally:
+                shutil.rmtree(testdir)
+
+    def test_load_keyindex(self):
+        print("testing filtered load using KeyIndex")
+        tsa = TimeseriesArray.load("testdata/fcIfC3AccountingTable", meta2["index_keynames"], datatypes={})
+        for fmt in ("csv", "bin", "pack"):
+            testdir = tempfile.mkdtemp()
+            try:
+                tsa.dump(testdir, fmt=fmt)
+                assert KeyIndex.exists(testdir, meta2["index_keynames"])
+                for filterkeys, matchtype in (
+                        ({"hostname" : "fca-sr2-8gb-21", "ifDescr" : None}, "and"),
+                        ({"hostname" : {"prefix" : "fca-sr2"}, "ifDescr" : ["port-channel 1", "bay1"]}, "and"),
+                        ({"hostname" : "fca-sr2-8gb-21", "ifDescr" : {"regex" : "port-channel"}}, "or")):
+                    filenames = TimeseriesArray.get_ts_filenames(testdir, meta2["index_keynames"], filterkeys, matchtype, keyindex=KeyIndex.load(testdir, meta2["index_keynames"]))
+                    expected = [key for key in tsa.keys() if TimeseriesArray.filtermatch(dict(zip(meta2["index_keynames"], key)), filterkeys, matchtype)]
+                    assert 0 < len(expected) < len(tsa)
+                    assert sorted(filenames.keys()) == sorted(expected)
+                    tsa1 = TimeseriesArray.load(testdir, meta2["index_keynames"], datatypes={}, filterkeys=filterkeys, matchtype=matchtype)
+                    assert sorted(tsa1.keys()) == sorted(expected)
+                    for key in tsa1.keys():
+                        assert tsa1[key].data == tsa[key].data
+            finally:
+                shutil.rmtree(testdir)
+
     def test_load(self):
         print("testing load, get_ts_filename, filtermatch, get_dumpfilename")
         tsa = TimeseriesArray.load("testdata/fcIfC3AccountingTable", meta2["index_keynames"], datatypes=meta2["value_keynames"], filterkeys=None, index_pattern=None, matchtype="and")
@@ -7,6 +7,8 @@ import datetime
 import gzip
 import json
 import os
+import shutil
+import tempfile
 # own modules
 import datalogger4
 from datalogger4.Timeseries import Timeseries
@@ -146,6 +148,9 @@ class Test(unittest.TestCase):
     def test_slice(self):
         tsastats = self.tsastats.slice(("bytes_sent", "bytes_received"))
         assert tsastats.value_keynames == ("bytes_sent", "bytes_received")
+        key = list(tsastats.keys())[0]
+        assert tsastats[key]["bytes_sent"] == self.tsastats[key]["bytes_sent"]
+        assert list(tsastats[key].partials["m2"].keys()) == ["bytes_sent", "bytes_received"]
         print(tsastats)
 
     def test_get_stats(self):
@@ -159,6 +164,17 @@ class Test(unittest.TestCase):
         self.tsastats.dump(outdir, overwrite=True)
         tsastats = TimeseriesArrayStats.load(outdir, meta["index_keynames"], filterkeys=None, matchtype="and")
         assert tsastats == self.tsastats
+        # one container file instead of one file per key
+        outdir = tempfile.mkdtemp()
+        self.tsastats.dump(outdir)
+        assert sorted(os.listdir(outdir)) == [TimeseriesArrayStats.get_pack_dumpfilename(meta["index_keynames"]), TimeseriesArrayStats.get_dumpfilename(meta["index_keynames"])]
+        assert set(TimeseriesArrayStats.get_stored_keys(outdir, meta["index_keynames"]).keys()) == set(self.tsastats.keys())
+        key = list(self.tsastats.keys())[0]
+        tsastats = TimeseriesArrayStats.load(outdir, meta["index_keynames"], filterkeys=dict(zip(meta["index_keynames"], key)))
+        assert list(tsastats.keys()) == [key]
+        assert tsastats[key] == self.tsastats[key]
+        assert tsastats[key].partials == self.tsastats[key].partials
+        shutil.rmtree(outdir)
 
     def filtermatch(key_dict, filterkeys, matchtype):
         pass
@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import gzip
+import io
+import json
+# own modules
+from datalogger4 import Timeseries
+from datalogger4 import TimeseriesColumnar
+from datalogger4 import TimeseriesArray
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.testfile = "testdata/ts_KHUnc3J2d2Vic3FsMi50aWxhay5jYycsKQ==.csv.gz"
+        with gzip.open(self.testfile, "rt") as infile:
+            self.app = TimeseriesColumnar.load(infile)
+        with gzip.open(self.testfile, "rt") as infile:
+            self.ts = Timeseries.load(infile)
+
+    def test_headers(self):
+        assert self.app.headers == self.ts.headers
+        assert self.app.colnames == self.ts.colnames
+        assert self.app.ts_keyname == "ts"
+
+    def test_len(self):
+        assert len(self.app) == len(self.ts) == 288
+
+    def test_start_stop_ts(self):
+        assert self.app.start_ts == 1521500402.0
+        assert self.app.stop_ts == 1521586501.0
+        assert isinstance(self.app.start_ts, float)
+
+    def test_interval(self):
+        assert self.app.interval == self.ts.interval == 293.49193762983396
+
+    def test_getitem(self):
+        assert self.app[0] == self.ts[0]
+        assert self.app[-1] == self.ts[-1]
+        assert self.app[1521500402.0] == self.ts[1521500402.0]
+        assert self.app[(10, "com_select")] == 89359228.0 == self.app[(10, 1)] == self.app[10][1]
+        assert self.app[(1521586501.0, 1)] == 99254355.0 == self.app[(-1, 1)]
+        assert self.app["ts"][-1] == 1521586501.0
+        assert tuple(self.app["com_select"]) == self.ts["com_select"]
+        with self.assertRaises(KeyError):
+            self.app[1.0]
+        with self.assertRaises(IndexError):
+            self.app[288]
+
+    def test_readonly(self):
+        with self.assertRaises(ValueError):
+            self.app["com_select"][0] = 1.0
+
+    def test_data(self):
+        assert self.app.data == self.ts.data
+        assert list(self.app) == list(self.ts)
+        assert self.app[0] in self.app
+        assert [0.0] * 17 not in self.app
+
+    def test_eq(self):
+        assert self.app == self.ts
+        assert self.app == self.app.slice(self.app.headers)
+
+    def test_add(self):
+        ts = TimeseriesColumnar(("a", "b"))
+        for index in range(100):
+            ts.add(float(index), [float(index), float(index * 2)])
+        ts.add(5.0, [0.0, 0.0]) # duplicate timestamp, ignored
+        assert len(ts) == 100
+        assert ts[5.0] == [5.0, 5.0, 10.0]
+        ts.group_add(5.0, [1.0, 1.0], lambda a, b: a + b)
+        assert ts[5.0] == [5.0, 6.0, 11.0]
+        ts.add(-1.0, [1.0, 1.0]) # non steady timestamp
+        assert ts[-1.0] == [-1.0, 1.0, 1.0]
+        assert ts[50.0] == [50.0, 50.0, 100.0]
+
+    def test_to_csv(self):
+        assert list(self.app.to_csv(value_keynames=("uptime", "com_select"))) == list(self.ts.to_csv(value_keynames=("uptime", "com_select")))
+        start_ts = int(self.app[10][0])
+        stop_ts = int(self.app[20][0])
+        assert list(self.app.to_csv(start_ts=start_ts, stop_ts=stop_ts)) == list(self.ts.to_csv(start_ts=start_ts, stop_ts=stop_ts))
+
+    def test_to_data(self):
+        assert list(self.app.to_data()) == list(self.ts.to_data())
+        assert isinstance(json.dumps(list(self.app.to_data())), str)
+
+    def test_dump(self):
+        outbuffer1 = io.StringIO()
+        outbuffer2 = io.StringIO()
+        self.app.dump(outbuffer1)
+        self.ts.dump(outbuffer2)
+        assert outbuffer1.getvalue() == outbuffer2.getvalue()
+        outbuffer1.seek(0)
+        ts = TimeseriesColumnar.load(outbuffer1)
+        assert ts == self.app
+
+    def test_dump_binary(self):
+        outbuffer = io.BytesIO()
+        self.ts.dump_binary(outbuffer)
+        outbuffer.seek(0)
+        ts = TimeseriesColumnar.load_binary(outbuffer)
+        assert ts == self.app
+        ts.add(ts.stop_ts + 300.0, [0.0] * len(ts.headers)) # loaded data must be writeable
+
+    def test_resample(self):
+        ts1 = self.app.slice(("com_select",)).resample(3600, sum)
+        ts2 = self.ts.slice(("com_select",)).resample(3600, sum)
+        assert ts1.data == ts2.data
+
+    def test_convert(self):
+        for datatype in ("derive", "percent", "persecond", "counter32", "counter64", "gauge32", "counterreset"):
+            ts1 = self.app.slice(("com_select",))
+            ts2 = self.ts.slice(("com_select",))
+            ts1.convert("com_select", datatype, "new")
+            ts2.convert("com_select", datatype, "new")
+            assert ts1.data == ts2.data
+
+    def test_add_calc_col(self):
+        ts1 = self.app.slice(("bytes_sent", "bytes_received"))
+        ts1.add_calc_col_single("bytes_sent", "kbytes_sent", lambda a: a / 8)
+        ts1.add_calc_col_full("kbytes", lambda row: (row["bytes_sent"] + row["bytes_received"]) / 8)
+        assert ts1[0][1] == ts1[0][3] * 8
+        assert ts1[0][4] == (ts1[0][1] + ts1[0][2]) / 8
+
+    def test_remove_col(self):
+        ts = self.app.slice(('com_select', 'uptime'))
+        assert ts[0][2] == 926326.0
+        ts.remove_col("com_select")
+        assert ts[0][1] == 926326.0
+        assert ts.headers == ["uptime", ]
+
+    def test_stats(self):
+        stats1 = self.app.stats
+        stats2 = self.ts.stats
+        for colname in self.app.headers:
+            for funcname in ("min", "max", "sum", "count", "first", "last", "median"):
+                assert stats1[colname][funcname] == stats2[colname][funcname]
+
+    def test_tsa(self):
+        tsa = TimeseriesArray.load("testdata/", ("hostname",), datatypes={"com_select": "asis"}, timeseries_class=TimeseriesColumnar)
+        for key in tsa.keys():
+            assert isinstance(tsa[key], TimeseriesColumnar)
+        assert tsa.slice(("com_select",)).timeseries_class == TimeseriesColumnar
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
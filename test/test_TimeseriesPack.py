@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import gzip
+import io
+import os
+import tempfile
+# own modules
+from datalogger4 import Timeseries
+from datalogger4 import TimeseriesColumnar
+from datalogger4.TimeseriesPack import TimeseriesPack
+from datalogger4.CustomExceptions import DataFormatError
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.records = {}
+        self.timeseries = {}
+        for filename in os.listdir("testdata"):
+            if filename.startswith("ts_KHU") and filename.endswith(".csv.gz"):
+                with gzip.open(os.path.join("testdata", filename), "rt") as infile:
+                    ts = Timeseries.load(infile)
+                outbuffer = io.BytesIO()
+                ts.dump_binary(outbuffer)
+                key = (filename, )
+                self.records[key] = outbuffer.getvalue()
+                self.timeseries[key] = ts
+        self.filename = os.path.join(tempfile.mkdtemp(), TimeseriesPack.get_dumpfilename(("hostname", )))
+
+    def tearDown(self):
+        os.unlink(self.filename)
+        os.rmdir(os.path.dirname(self.filename))
+
+    def test_write_read(self):
+        for compress in (False, True):
+            TimeseriesPack.write(self.filename, ("hostname", ), self.timeseries[("ts_KHUnbmFnaW9zLnRpbGFrLmNjJywp.csv.gz", )].headers, "ts", self.records.items(), compress=compress)
+            with TimeseriesPack(self.filename) as pack:
+                assert pack.index_keys == ("hostname", )
+                assert pack.ts_key == "ts"
+                assert sorted(pack.keys()) == sorted(self.records.keys())
+                for key in reversed(sorted(self.records.keys())):
+                    assert key in pack
+                    assert pack.read(key) == self.records[key]
+                    if not compress:
+                        assert pack.get_offset(key)[0] % 8 == 0
+                    assert pack.load(key, Timeseries).data == self.timeseries[key].data
+                    assert pack.load(key, TimeseriesColumnar) == self.timeseries[key]
+
+    def test_mmap(self):
+        for compress in (False, True):
+            TimeseriesPack.write(self.filename, ("hostname", ), self.timeseries[("ts_KHUnbmFnaW9zLnRpbGFrLmNjJywp.csv.gz", )].headers, "ts", self.records.items(), compress=compress)
+            with TimeseriesPack(self.filename, use_mmap=True) as pack:
+                assert pack.mapped is not compress # compressed records could not be mapped
+                pack.prefetch(pack.keys())
+                for key in pack.keys():
+                    ts = pack.load(key, TimeseriesColumnar)
+                    assert ts == self.timeseries[key]
+                    if not compress:
+                        assert bytes(pack.view(key)) == self.records[key]
+                        assert not ts.values.base.flags.owndata # no copy
+                    ts.add(ts.stop_ts + 300.0, [0.0] * len(ts.headers)) # copy on write
+                    ts.group_add(ts.start_ts, [1.0] * len(ts.headers), lambda a, b: a + b)
+                    assert ts[0][1:] == [value + 1.0 for value in self.timeseries[key][0][1:]]
+                del ts
+
+    def test_format_error(self):
+        with open(self.filename, "wb") as outfile:
+            outfile.write(b"\0" * 64)
+        with self.assertRaises(DataFormatError):
+            TimeseriesPack(self.filename)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
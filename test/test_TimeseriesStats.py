@@ -6,9 +6,10 @@ import datetime
 import gzip
 import os
 import json
+import glob
 # own modules
 from datalogger4.Timeseries import Timeseries
-from datalogger4.TimeseriesStats import TimeseriesStats
+from datalogger4.TimeseriesStats import TimeseriesStats, stats_kernel
 
 
 class Test(unittest.TestCase):
@@ -55,6 +56,21 @@ class Test(unittest.TestCase):
     def test_get_stats(self):
         assert isinstance(self.tsstat.get_stats(), dict)
 
+    def test_stats_kernel(self):
+        # kernel must be identical to every single function
+        for testfile in glob.glob("testdata/ts_KHU*.csv.gz"):
+            with gzip.open(testfile, "rt") as infile:
+                ts = Timeseries.load(infile)
+            for length in (len(ts), len(ts) - 1, 2):
+                ts1 = ts.slice(ts.headers)
+                while len(ts1.data) > length:
+                    ts1.data.pop()
+                matrix = [list(ts1.get_serie(key)) for key in ts1.headers]
+                for series, stats in zip(matrix, stats_kernel(matrix)):
+                    for func_name, func in TimeseriesStats.stat_funcs.items():
+                        assert stats[func_name] == func(series)
+                        assert type(stats[func_name]) == type(func(series))
+
     def test_get_stat(self):
         assert self.tsstat.get_stat("min")['com_select'] == 89169365.0
 
@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import os
+import importlib.util
+try:
+    import flask
+except ImportError:
+    flask = None
+# own modules
+from datalogger4.DataLogger import DataLogger
+
+
+def load_app(basedir):
+    """load app.py like the WSGI server does, BASEDIR is set before"""
+    spec = importlib.util.spec_from_file_location("app", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app.py"))
+    app = importlib.util.module_from_spec(spec)
+    app.BASEDIR = basedir
+    spec.loader.exec_module(app)
+    return app
+
+
+@unittest.skipIf(flask is None, "flask is not installed")
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        datalogger = DataLogger("testdata")
+        datalogger.setup("mysql", "performance", "2018-04-01")
+        datalogger.generate_caches()
+        self.app = load_app("testdata")
+        self.client = self.app.app.test_client()
+
+    def test_index_streamed(self):
+        resp = self.client.get("/index/mysql/performance/2018-04-01")
+        # cached day, validated and streamed anyway
+        assert resp.status_code == 200
+        assert resp.is_streamed
+        assert resp.headers.get("ETag") is not None
+        assert resp.headers["Cache-Control"] == "no-cache"
+        assert len(resp.get_json()["results"]) > 0
+        resp = self.client.get("/index/mysql/performance/2018-04-01", headers={"If-None-Match" : resp.headers["ETag"]})
+        assert resp.status_code == 304
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
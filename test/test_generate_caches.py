@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+
+import unittest
+import logging
+import os
+import gzip
+import json
+import shutil
+import signal
+import tempfile
+import importlib.util
+
+spec = importlib.util.spec_from_file_location("generate_caches", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin", "generate_caches.py"))
+generate_caches = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(generate_caches)
+
+
+def succeed(basedir, job, force, parse_workers, fmt, fused):
+    return 0.0
+
+def fail(basedir, job, force, parse_workers, fmt, fused):
+    if job[1] == "fail":
+        raise ValueError("job failed")
+    return 0.0
+
+def die(basedir, job, force, parse_workers, fmt, fused):
+    if job[1] == "die":
+        os.kill(os.getpid(), signal.SIGKILL) # like the OOM killer
+    return 0.0
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.basedir = tempfile.mkdtemp()
+        with open(os.path.join("testdata", "datalogger.json"), "rt") as infile:
+            config = json.load(infile)
+        config["projects"] = {"mysql" : {"performance" : "", "performance2" : ""}}
+        with open(os.path.join(self.basedir, "datalogger.json"), "wt") as outfile:
+            json.dump(config, outfile)
+        os.makedirs(os.path.join(self.basedir, "mysql", "raw"))
+        os.mkdir(os.path.join(self.basedir, config["cachedir"]))
+        shutil.copytree(os.path.join("testdata", "mysql", "meta"), os.path.join(self.basedir, "mysql", "meta"))
+        for ending in ("yaml", "json"):
+            shutil.copy(os.path.join(self.basedir, "mysql", "meta", "performance.%s" % ending), os.path.join(self.basedir, "mysql", "meta", "performance2.%s" % ending))
+        with gzip.open(os.path.join("testdata", "mysql", "raw", "performance_2018-04-01.csv.gz"), "rb") as infile:
+            self.raw = infile.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.basedir)
+
+    def write_raw(self, tablename, datestring, size):
+        with open(os.path.join(self.basedir, "mysql", "raw", "%s_%s.csv" % (tablename, datestring)), "wb") as outfile:
+            outfile.write(self.raw[:size])
+
+    def test_get_jobs(self):
+        self.write_raw("performance", "2018-03-30", 1000)
+        self.write_raw("performance2", "2018-03-31", 5000)
+        self.write_raw("performance", "2018-04-01", 1000)
+        self.write_raw("performance2", "2018-04-01", 3000)
+        self.write_raw("performance", "2018-04-02", 2000)
+        jobs = generate_caches.get_jobs(self.basedir, "2018-03-29", "2018-04-03")
+        # newest day first, then largest first
+        assert [job[:3] for job in jobs] == [
+            ("2018-04-02", "mysql", "performance"),
+            ("2018-04-01", "mysql", "performance2"),
+            ("2018-04-01", "mysql", "performance"),
+            ("2018-03-31", "mysql", "performance2"),
+            ("2018-03-30", "mysql", "performance"),
+        ]
+        assert jobs[0][3] == 2000 * generate_caches.MEMORY_FACTOR
+        assert generate_caches.get_jobs(self.basedir, "2018-03-29", "2018-04-03", tablename="performance2")[0][:3] == ("2018-04-01", "mysql", "performance2")
+
+    def test_pick_job(self):
+        pending = [("2018-04-02", "a", "a", 400), ("2018-04-01", "b", "b", 300), ("2018-04-01", "c", "c", 100)]
+        assert generate_caches.pick_job(pending, 0, 0, 50) == 0 # larger than budget, but nothing running
+        assert generate_caches.pick_job(pending, 1, 700, 1000) == 1 # next smaller one fits
+        assert generate_caches.pick_job(pending, 1, 850, 1000) == 2
+        assert generate_caches.pick_job(pending, 1, 950, 1000) is None
+        # parsing processes are part of the estimation
+        memory = generate_caches.get_job_memory(pending[2], 4)
+        assert memory == 2 * 100 + 4 * generate_caches.PARSE_WORKER_MEMORY
+        assert generate_caches.pick_job(pending[2:], 1, 0, memory - 1, parse_workers=4) is None
+        assert generate_caches.pick_job(pending[2:], 1, 0, memory, parse_workers=4) == 0
+
+    def test_schedule(self):
+        jobs = [("2018-04-01", name, "table", 100) for name in ("a", "fail", "b", "c")]
+        assert generate_caches.schedule(self.basedir, jobs, 2, 1000, func=succeed) == []
+        assert generate_caches.schedule(self.basedir, jobs, 2, 1000, func=fail) == [jobs[1]]
+
+    def test_schedule_broken_pool(self):
+        jobs = [("2018-04-01", name, "table", 100) for name in ("die", "a", "b", "c", "d")]
+        failed = generate_caches.schedule(self.basedir, jobs, 1, 1000, func=die)
+        # the killed job fails, remaining jobs run in a new pool
+        assert failed == [jobs[0]]
+        # jobs running in the same pool fail too, but the run is not aborted
+        failed = generate_caches.schedule(self.basedir, jobs, 2, 1000, func=die)
+        assert jobs[0] in failed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()